@@ -25,7 +25,17 @@ class Config:
             },
             'graphics': {
                 'fullscreen': False,
-                'resolution': (640, 480)
+                'resolution': (640, 480),  # Window size
+                'internal_resolution': (640, 480),  # Size the game renders at
+                'scaling': 'auto',  # 'auto', 'scaled' or 'software' (see display.Display)
+                'vsync': True
+            },
+            'game': {
+                'players': 1  # 2 for split-screen co-op (see utils.viewport)
+            },
+            'diagnostics': {
+                'telemetry': True,  # Per-frame timings to telemetry/frames.mktl (see utils.telemetry)
+                'heatmap': False  # Frame cost per level tile from the start (F9 toggles, see utils.heatmap)
             }
         }
         
@@ -57,6 +67,18 @@ class Config:
         """Get the current control settings."""
         return self.settings['controls']
     
+    def get_graphics(self):
+        """Get the current graphics settings."""
+        return self.settings['graphics']
+    
+    def get_game(self):
+        """Get the current game settings."""
+        return self.settings['game']
+    
+    def get_diagnostics(self):
+        """Get the current diagnostics settings."""
+        return self.settings['diagnostics']
+    
     def update_controls(self, controls_dict):
         """Update control settings."""
         self.settings['controls'].update(controls_dict)
@@ -0,0 +1,108 @@
+import pygame
+
+class Display:
+    """
+    Fixed internal resolution back buffer presented with integer nearest-neighbour scaling.
+
+    The game always draws into `surface` at the internal resolution, so fill cost does not
+    depend on the window or monitor size. Two presentation modes:
+    - 'scaled': pygame.SCALED (with vsync when available); SDL scales the back buffer on the GPU
+    - 'software': a regular (resizable) window; the back buffer is scaled by the largest integer
+      factor that fits and centred, with black borders
+    'auto' tries 'scaled' first and falls back to 'software' if the driver can't do it.
+    """
+    def __init__(self, internal_size, window_size=None, fullscreen=False, vsync=True, scaling='auto',
+                 caption=None):
+        """
+        Open the window
+
+        Args:
+            internal_size (tuple): Resolution the game renders at
+            window_size (tuple, optional): Window size for software scaling. Defaults to internal_size.
+            fullscreen (bool, optional): Use the whole screen. Defaults to False.
+            vsync (bool, optional): Request vsync (scaled mode only). Defaults to True.
+            scaling (str, optional): 'auto', 'scaled' or 'software'. Defaults to 'auto'.
+            caption (str, optional): Window title. Defaults to None.
+        """
+        self.internal_size = tuple(internal_size)
+        self.window_size = tuple(window_size) if window_size else self.internal_size
+        self.fullscreen = fullscreen
+        if caption:
+            pygame.display.set_caption(caption)
+
+        self.mode = None
+        if scaling in ('auto', 'scaled'):
+            self._open_scaled(vsync)
+        if self.mode is None:
+            self._open_software()
+        print(f"Display: {self.mode} mode, internal {self.internal_size[0]}x{self.internal_size[1]}, "
+              f"window {self.window.get_width()}x{self.window.get_height()}")
+
+    @classmethod
+    def from_config(cls, config, internal_size, caption=None):
+        """Create the display from the 'graphics' section of a Config"""
+        graphics = config.get_graphics()
+        return cls(graphics.get('internal_resolution') or internal_size,
+                   window_size=graphics.get('resolution'),
+                   fullscreen=graphics.get('fullscreen', False),
+                   vsync=graphics.get('vsync', True),
+                   scaling=graphics.get('scaling', 'auto'),
+                   caption=caption)
+
+    def _open_scaled(self, vsync):
+        flags = pygame.SCALED | (pygame.FULLSCREEN if self.fullscreen else 0)
+        for use_vsync in ((1, 0) if vsync else (0,)):
+            try:
+                self.window = pygame.display.set_mode(self.internal_size, flags, vsync=use_vsync)
+            except pygame.error:
+                continue
+            if self.window.get_size() != self.internal_size:
+                continue
+            # The display surface itself is the back buffer; SDL does the scaling
+            self.surface = self.window
+            self.mode = 'scaled'
+            self.vsync = bool(use_vsync)
+            return
+
+    def _open_software(self):
+        if self.fullscreen:
+            self.window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            self.window = pygame.display.set_mode(self.window_size, pygame.RESIZABLE)
+        self.surface = pygame.Surface(self.internal_size).convert()
+        self.mode = 'software'
+        self.vsync = False
+        self.scaled = None  # Reused destination for the scaled back buffer
+        self._layout()
+
+    def _layout(self):
+        """Pick the integer scale factor and the centred destination rect for the current window"""
+        window_w, window_h = self.window.get_size()
+        internal_w, internal_h = self.internal_size
+        self.factor = max(1, min(window_w // internal_w, window_h // internal_h))
+        size = (internal_w * self.factor, internal_h * self.factor)
+        self.dest = pygame.Rect((0, 0), size)
+        self.dest.center = (window_w // 2, window_h // 2)
+        if self.factor > 1 and (self.scaled is None or self.scaled.get_size() != size):
+            self.scaled = pygame.Surface(size).convert()
+        self.window.fill((0, 0, 0))
+        self.layout_size = (window_w, window_h)
+
+    def present(self):
+        """Show the back buffer"""
+        if self.mode == 'software':
+            if self.window.get_size() != self.layout_size:
+                self._layout()
+            if self.factor == 1:
+                self.window.blit(self.surface, self.dest)
+            else:
+                # Nearest-neighbour, into a preallocated surface
+                pygame.transform.scale(self.surface, self.dest.size, self.scaled)
+                self.window.blit(self.scaled, self.dest)
+        pygame.display.flip()
+
+    def to_internal(self, position):
+        """Convert a window position (e.g. the mouse) to back buffer coordinates"""
+        if self.mode == 'scaled':
+            return position  # SDL already reports logical coordinates
+        return ((position[0] - self.dest.x) // self.factor, (position[1] - self.dest.y) // self.factor)
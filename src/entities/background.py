@@ -7,6 +7,13 @@ class Background:
         self.screen_height = screen_height
         # Load background image
         self.image = load_image('background.jpeg', use_alpha=False)
+        # Scale it up if it does not cover the screen (large internal resolutions)
+        if self.image:
+            width, height = self.image.get_size()
+            scale = max(screen_width / width, screen_height / height)
+            if scale > 1:
+                self.image = pygame.transform.smoothscale(
+                    self.image, (int(width * scale + 0.5), int(height * scale + 0.5)))
         
         # Default background color
         self.bg_color = (30, 30, 30)  # Dark gray
@@ -11,15 +11,33 @@ else:
     from utils.utils import load_image, get_file_path, FILETYPE
 
 from utils.animationplayer import AnimationPlayer
+from utils.navigation import JUMP
 
 class Enemy:
     """
     Enemy class for creating patrolling enemies that walk back and forth
     along a set path. Enemies will reverse direction when they hit obstacles
-    or reach the end of their patrol path.
+    or reach the end of their patrol path: the platform they spawned on,
+    limited to patrol_distance around the spawn point.
     """
-    def __init__(self, x, y, width=64, height=64, patrol_distance=200):
-        """Initialize a new enemy"""
+    # Number of values written by snapshot_state
+    SNAPSHOT_SIZE = 14
+    # Enemy states, indexed by their snapshot code
+    STATES = ("walking", "attacking", "chasing")
+
+    def __init__(self, x, y, width=64, height=64, patrol_distance=200, platform=None):
+        """
+        Initialize a new enemy
+
+        Args:
+            x (int): Spawn x position
+            y (int): Spawn y position
+            width (int, optional): Width. Defaults to 64.
+            height (int, optional): Height. Defaults to 64.
+            patrol_distance (int, optional): How far the enemy walks from its spawn point. Defaults to 200.
+            platform (tuple, optional): (left, right, top) platform segment the enemy patrols
+                (see utils.levelgeometry.platform_segments). Defaults to None (patrol distance only).
+        """
         # Position and dimensions
         self.rect = pygame.Rect(x, y, width, height)
         self.spawn_x = x
@@ -29,12 +47,14 @@ class Enemy:
         self.direction = 1  # 1 for right, -1 for left
         self.speed = 1
         self.patrol_distance = patrol_distance
+        self.set_patrol_bounds(platform)
         self.is_facing_right = self.direction > 0
         
         # Physics variables
         self.vx = self.speed * self.direction
         self.vy = 0
         self.gravity = 0.5
+        self.jump_speed = 10  # Initial upward speed of a jump (only used while chasing)
         self.on_ground = False
         
         # Debug property
@@ -68,8 +88,12 @@ class Enemy:
         self.animation_player.play("walking")
         
         # State and attack properties
-        self.state = "walking"  # Can be "walking" or "attacking"
+        self.state = "walking"  # Can be "walking", "attacking" or "chasing"
         self.detection_range = 200  # Range to detect the player (in pixels)
+        self.chase_range = 400  # Range to follow the player across platforms (in pixels)
+        self.chase_speed = 2
+        # utils.navigation.PathService shared by the enemies of the level; None disables chasing
+        self.navigator = None
         self.attack_speed = 3  # Speed multiplier during attack
         self.attack_duration = 45  # Frames that the attack lasts
         self.attack_cooldown = 0  # Frames until next attack is allowed
@@ -77,10 +101,113 @@ class Enemy:
         self.attack_timer = 0  # Current frame in attack sequence
         # ===============================================================================
     
-    def update(self, tiles, player=None):
-        """Update enemy position, animation, and handle collisions"""
+    def reset(self, x, y, width=None, height=None, patrol_distance=200, platform=None):
+        """Reuse this enemy for a new spawn without reloading its animations"""
+        if width is not None and height is not None and (width, height) != self.rect.size:
+            self.rect.size = (width, height)
+            self.animation_player.set_scale(width / 72, height / 88)
+        self.rect.topleft = (x, y)
+        self.spawn_x = x
+        self.spawn_y = y
+
+        self.direction = 1
+        self.is_facing_right = True
+        self.patrol_distance = patrol_distance
+        self.set_patrol_bounds(platform)
+        self.vx = self.speed * self.direction
+        self.vy = 0
+        self.on_ground = False
+
+        self.state = "walking"
+        self.attack_cooldown = 0
+        self.attack_timer = 0
+        self.animation_player.play("walking", force_restart=True)
+
+    def set_patrol_bounds(self, platform=None, anchor_x=None):
+        """
+        Work out the range the enemy walks in: its platform segment intersected with
+        patrol_distance around the spawn point. The enemy's rect stays within
+        [patrol_left, patrol_right], so turning around is two comparisons per tick.
+
+        Args:
+            platform (tuple, optional): (left, right, top) segment under the spawn point,
+                or None to only use the patrol distance
+            anchor_x (int, optional): Centre of the patrol instead of the spawn point
+        """
+        anchor_x = self.spawn_x if anchor_x is None else anchor_x
+        self.patrol_left = anchor_x - self.patrol_distance
+        self.patrol_right = anchor_x + self.rect.width + self.patrol_distance
+        if platform is not None:
+            self.patrol_left = max(self.patrol_left, platform[0])
+            self.patrol_right = min(self.patrol_right, platform[1])
+        # A platform narrower than the enemy: keep a range it fits in
+        self.patrol_right = max(self.patrol_right, self.patrol_left + self.rect.width)
+
+    def navigation_physics(self):
+        """(gravity, jump_speed, move_speed, width, height) to build a utils.navigation.PathService with"""
+        return self.gravity, self.jump_speed, self.chase_speed, self.rect.width, self.rect.height
+
+    def patrol_current_platform(self):
+        """Patrol around the current position on whatever platform the enemy is on now"""
+        index = self.navigator.locate(self.rect)
+        platform = self.navigator.graph.segments[index] if index != -1 else None
+        self.set_patrol_bounds(platform, anchor_x=self.rect.x)
+
+    @property
+    def sight_range(self):
+        """Furthest distance at which seeing the player matters (detection or chase)"""
+        return max(self.detection_range, self.chase_range)
+
+    def update_chase(self, player, player_visible=True):
+        """
+        Follow the navigation graph towards the player while they are in chase range.
+        The path comes from the shared PathService cache; only the first move is used.
+        A chase only starts when the player is in sight, but goes on around walls.
+        """
+        if not self.on_ground:
+            return  # Keep the takeoff direction until landing
+        if self.state != "chasing" and not player_visible:
+            return
+        dx = player.rect.centerx - self.rect.centerx
+        dy = player.rect.centery - self.rect.centery
+        edge, reachable = None, False
+        if dx * dx + dy * dy <= self.chase_range * self.chase_range:
+            edge, reachable = self.navigator.next_edge(self.rect, player.rect)
+        if not reachable:
+            if self.state == "chasing":
+                self.state = "walking"
+                self.patrol_current_platform()
+            return
+
+        self.state = "chasing"
+        if edge is None:
+            # Same platform: walk towards the player
+            if abs(dx) > self.chase_speed:
+                self.direction = 1 if dx > 0 else -1
+        else:
+            leading_side = self.rect.right if edge.direction > 0 else self.rect.left
+            ahead = (edge.takeoff_x - leading_side) * edge.direction  # Distance left to the takeoff
+            if edge.kind == JUMP and ahead < -self.chase_speed:
+                self.direction = -edge.direction  # Overshot (or under the target): back up
+            else:
+                self.direction = edge.direction
+                if edge.kind == JUMP and ahead <= self.chase_speed:
+                    self.vy = -self.jump_speed
+                    self.on_ground = False
+        self.is_facing_right = self.direction > 0
+
+    def update(self, tiles, player=None, player_visible=True):
+        """
+        Update enemy position, animation, and handle collisions
+
+        Args:
+            tiles (list): Level tiles
+            player (Player, optional): Player to detect and chase. Defaults to None.
+            player_visible (bool, optional): Whether no wall is between the enemy and the player
+                (see utils.lineofsight). Defaults to True.
+        """
         # Player detection and state management
-        if player and self.state != "attacking" and self.attack_cooldown <= 0:
+        if player and player_visible and self.state != "attacking" and self.attack_cooldown <= 0:
             dx = player.rect.centerx - self.rect.centerx
             dy = player.rect.centery - self.rect.centery
             distance = (dx**2 + dy**2)**0.5
@@ -91,6 +218,10 @@ class Enemy:
                 self.is_facing_right = dx > 0
                 self.direction = 1 if self.is_facing_right else -1
                 print(f"Enemy detected player at distance {distance:.1f}, initiating attack!")
+
+        # Chase the player across platforms while they are in range but not close enough to attack
+        if player and self.navigator is not None and self.state != "attacking":
+            self.update_chase(player, player_visible)
         
         # Handle attack cooldown
         if self.attack_cooldown > 0:
@@ -110,15 +241,17 @@ class Enemy:
                 self.state = "walking"
                 self.attack_cooldown = self.cooldown_duration
                 print("Attack finished, returning to patrol")
+                if self.navigator is not None:
+                    self.patrol_current_platform()
+        elif self.state == "chasing":
+            self.vx = self.chase_speed * self.direction
         else:
             self.vx = self.speed * self.direction
         
         # Move horizontally and handle collisions
         self.rect.x += self.vx
-        horizontal_collision = False
         for tile in tiles:
             if self.rect.colliderect(tile.rect):
-                horizontal_collision = True
                 if self.vx > 0:  # moving right
                     self.rect.right = tile.rect.left
                     self.direction = -1
@@ -145,29 +278,15 @@ class Enemy:
                     self.vy = 0
                     self.debug_info["last_collision"] = "vertical_top"
         
-        # Check for platform edges
-        if self.on_ground and not horizontal_collision:
-            look_ahead_dist = 10
-            check_x = self.rect.x + (look_ahead_dist * self.direction)
-            check_rect = pygame.Rect(check_x, self.rect.bottom, self.rect.width, 5)
-            
-            has_ground_ahead = False
-            for tile in tiles:
-                if check_rect.colliderect(tile.rect):
-                    has_ground_ahead = True
-                    break
-            
-            if not has_ground_ahead:
-                self.direction *= -1
-                self.is_facing_right = not self.is_facing_right
-        
-        # Check patrol distance limits
-        if self.rect.x > self.spawn_x + self.patrol_distance:
-            self.direction = -1
-            self.is_facing_right = False
-        elif self.rect.x < self.spawn_x - self.patrol_distance:
-            self.direction = 1
-            self.is_facing_right = True
+        # Turn around at the patrol bounds (platform edges and patrol distance);
+        # a chase leaves the patrol range on purpose
+        if self.state != "chasing":
+            if self.rect.right >= self.patrol_right and self.direction > 0:
+                self.direction = -1
+                self.is_facing_right = False
+            elif self.rect.left <= self.patrol_left and self.direction < 0:
+                self.direction = 1
+                self.is_facing_right = True
         
         # ======================= UPDATE ANIMATION STATE BASED ON ENEMY STATE =======================
         # Choose animation based on state
@@ -190,6 +309,38 @@ class Enemy:
             
         return True  # Enemy is still valid
     
+    def snapshot_state(self):
+        """Return the mutable enemy state as a flat tuple of numbers (see utils.snapshot)."""
+        return (
+            self.rect.x, self.rect.y, self.spawn_x, self.spawn_y,
+            self.direction, self.vx, self.vy, self.on_ground,
+            self.STATES.index(self.state), self.attack_timer, self.attack_cooldown,
+            self.patrol_distance, self.patrol_left, self.patrol_right,
+        )
+
+    def restore_state(self, values):
+        """Restore the state produced by snapshot_state, keeping the loaded animations."""
+        self.rect.x = int(values[0])
+        self.rect.y = int(values[1])
+        self.spawn_x = int(values[2])
+        self.spawn_y = int(values[3])
+        self.direction = int(values[4])
+        self.is_facing_right = self.direction > 0
+        self.vx = values[5]
+        self.vy = values[6]
+        self.on_ground = bool(values[7])
+        self.state = self.STATES[int(values[8])]
+        self.attack_timer = int(values[9])
+        self.attack_cooldown = int(values[10])
+        self.patrol_distance = values[11]
+        self.patrol_left = values[12]
+        self.patrol_right = values[13]
+
+        # The animation is not part of the state: it only switches clips, so frequent
+        # restores (network rollbacks) do not keep restarting it
+        self.animation_player.play("attack" if self.state == "attacking" else "walking")
+        self.animation_player.set_flip(flip_x=self.is_facing_right)
+
     def check_player_collision(self, player):
         """Check if enemy collides with player"""
         return self.rect.colliderect(player.rect)
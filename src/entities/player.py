@@ -5,10 +5,13 @@ from pygame import Rect
 from utils.controls import Controls
 
 from utils.audioplayer import play_audio_clip
-from utils.utils import FILETYPE, load_image,get_file_path
+from utils.utils import FILETYPE, get_file_path
 
 from camera import Camera
 from utils.animationplayer import AnimationPlayer
+from utils.atlas import get_atlas
+from utils.orientation import mirror_frames, facing
+from utils.renderqueue import circle_sprite
 
 class Particle:
     def __init__(self, pos):
@@ -25,7 +28,9 @@ class Particle:
         self.size -= 0.1
 
     def draw(self, surface):
-        pygame.draw.circle(surface, self.color, (int(self.x), int(self.y)), int(self.size))
+        radius = int(self.size)
+        if radius > 0:
+            surface.blit(circle_sprite(self.color, radius), (int(self.x) - radius, int(self.y) - radius))
 
 
 class FootStepAudioPlayer:
@@ -52,26 +57,18 @@ class FootStepAudioPlayer:
 class Sword:
     def __init__(self, x, y, x_offset, y_offset, camera: Camera):
 
-        self.sword_idle = load_image('images/sword/Sword-Idle.png')
-        self.sword_attack = load_image('images/sword/Sword-Attack.png')
-
         self.x = x
         self.y = y
         self.x_offset = x_offset
         self.y_offset = y_offset
 
-        self.sword_idle_frames = []
-        for i in range(6):
-            frame = self.sword_idle.subsurface(pygame.Rect(i * 16, 0, 16, 16))
-            frame = pygame.transform.scale(frame, (16 * 2, 16 * 2))
-            self.sword_idle_frames.append(frame)
-        
-        self.sword_attack_frames = []
-        for i in range(6):
-            frame = self.sword_attack.subsurface(pygame.Rect(i * 16, 0, 16, 16))
-            frame = pygame.transform.scale(frame, (16 * 2, 16 * 2))
-            self.sword_attack_frames.append(frame)
-        
+        # Frames are packed into the shared texture atlas (the sheets are not kept)
+        atlas = get_atlas()
+        self.sword_idle_frames = atlas.load_strip('sword/idle', 'images/sword/Sword-Idle.png', (16, 16), 6, scale=2)
+        self.sword_attack_frames = atlas.load_strip('sword/attack', 'images/sword/Sword-Attack.png', (16, 16), 6, scale=2)
+        # Left facing frames are built once here; draw only looks them up
+        mirror_frames('sword/idle', self.sword_idle_frames)
+        mirror_frames('sword/attack', self.sword_attack_frames)
 
         self.current_frame = 0
         self.image = self.sword_idle_frames[self.current_frame]
@@ -82,14 +79,21 @@ class Sword:
         self.animation_timer = 0
         self.animation_interval = 1000 / 15
         self.last_update_time = 0
+        # Milliseconds source of the animation (the attack ends with its animation)
+        self.clock = pygame.time.get_ticks
 
         self.camera = camera
+
+    def follow(self, player_rect, is_looking_right):
+        """Place the sword beside the player without advancing the animation"""
+        self.rect.center = (player_rect.centerx + (self.x_offset if is_looking_right else -self.x_offset), player_rect.centery + self.y_offset)
     
     def update(self, player_rect, is_looking_right):
-        self.rect.center = (player_rect.centerx + (self.x_offset if is_looking_right else -self.x_offset), player_rect.centery + self.y_offset)
+        self.follow(player_rect, is_looking_right)
 
-        self.animation_timer += pygame.time.get_ticks() - self.last_update_time
-        self.last_update_time = pygame.time.get_ticks()
+        now = self.clock()
+        self.animation_timer += now - self.last_update_time
+        self.last_update_time = now
         if self.is_attacking and self.animation_timer >= self.animation_interval:
             self.animation_timer = 0
             self.current_frame = (self.current_frame + 1) % len(self.sword_attack_frames)
@@ -105,11 +109,14 @@ class Sword:
             self.current_frame = 0
             play_audio_clip(get_file_path("sword.wav", FILETYPE.AUDIO), 2)
 
-    def draw(self, surface, is_looking_right):
-        render_rect = self.camera.apply(self)
-        surface.blit(pygame.transform.flip(self.image, not is_looking_right, False), render_rect.topleft)
+    def draw(self, surface, is_looking_right, camera=None):
+        render_rect = (camera or self.camera).apply(self)
+        surface.blit(facing(self.image, is_looking_right), render_rect.topleft)
 
 class Player:
+    # Number of values written by snapshot_state
+    SNAPSHOT_SIZE = 16
+
     def __init__(self, x, y, controls, camera: Camera):
         # Store initial position as spawn point
         self.spawn_x = x
@@ -117,50 +124,18 @@ class Player:
         
         # Load the player sprite from assets folder
         self.footstep_particles = []
-        self.normal_idle = load_image('images/player/Normal-Idle.png')
-        self.normal_moving = load_image('images/player/Normal-Moving.png')
-        self.demon_idle = load_image('images/player/Demon-Idle.png')
-        self.demon_moving = load_image('images/player/Demon-Moving.png')
-
-        if self.normal_idle is None:
-            self.normal_idle = pygame.Surface((16 * 6, 16))
-            self.normal_idle.fill((255, 255, 255))
-
-        if self.normal_moving is None:
-            self.normal_moving = pygame.Surface((16 * 6, 16))
-            self.normal_moving.fill((255, 255, 255))
-        
-        if self.demon_idle is None:
-            self.demon_idle = pygame.Surface((16 * 6, 16))
-            self.demon_idle.fill((255, 255, 255))
-        
-        if self.demon_moving is None:
-            self.demon_moving = pygame.Surface((16 * 6, 16))
-            self.demon_moving.fill((255, 255, 255))
-        
-        self.normal_idle_frames = []
-        for i in range(6):
-            frame = self.normal_idle.subsurface(pygame.Rect(i * 16, 0, 16, 16))
-            frame = pygame.transform.scale(frame, (16 * 4, 16 * 4))
-            self.normal_idle_frames.append(frame)
-        
-        self.normal_moving_frames = []
-        for i in range(6):
-            frame = self.normal_moving.subsurface(pygame.Rect(i * 16, 0, 16, 16))
-            frame = pygame.transform.scale(frame, (16 * 4, 16 * 4))
-            self.normal_moving_frames.append(frame)
-        
-        self.demon_idle_frames = []
-        for i in range(6):
-            frame = self.demon_idle.subsurface(pygame.Rect(i * 16, 0, 16, 16))
-            frame = pygame.transform.scale(frame, (16 * 4, 16 * 4))
-            self.demon_idle_frames.append(frame)
-        
-        self.demon_moving_frames = []
-        for i in range(6):
-            frame = self.demon_moving.subsurface(pygame.Rect(i * 16, 0, 16, 16))
-            frame = pygame.transform.scale(frame, (16 * 4, 16 * 4))
-            self.demon_moving_frames.append(frame)
+
+        # Frames are packed into the shared texture atlas (the sheets are not kept)
+        atlas = get_atlas()
+        self.normal_idle_frames = atlas.load_strip('player/normal_idle', 'images/player/Normal-Idle.png', (16, 16), 6, scale=4)
+        self.normal_moving_frames = atlas.load_strip('player/normal_moving', 'images/player/Normal-Moving.png', (16, 16), 6, scale=4)
+        self.demon_idle_frames = atlas.load_strip('player/demon_idle', 'images/player/Demon-Idle.png', (16, 16), 6, scale=4)
+        self.demon_moving_frames = atlas.load_strip('player/demon_moving', 'images/player/Demon-Moving.png', (16, 16), 6, scale=4)
+        # Left facing frames are built once here; draw only looks them up
+        mirror_frames('player/normal_idle', self.normal_idle_frames)
+        mirror_frames('player/normal_moving', self.normal_moving_frames)
+        mirror_frames('player/demon_idle', self.demon_idle_frames)
+        mirror_frames('player/demon_moving', self.demon_moving_frames)
         
         self.current_frame = 0
         self.image = self.normal_idle_frames[self.current_frame]
@@ -187,6 +162,8 @@ class Player:
         self.last_update_time = 0
         self.animation_timer = 0
         self.animation_interval = 1000 / 6  # 6 FPS
+        # Milliseconds source of the animations; a tick based simulation replaces it (see set_clock)
+        self.clock = pygame.time.get_ticks
         self.is_facing_right = True
         self.is_moving = False
         self.current_frames = self.normal_idle_frames
@@ -360,7 +337,57 @@ class Player:
         self.is_dead = False
         self.health = self.max_health  # Reset health upon respawn
         # You could add spawn animation or invulnerability frames here
-    
+
+    def set_clock(self, clock):
+        """
+        Drive the player and sword animations from another millisecond source, e.g. the
+        tick count of a deterministic simulation (see net.simulation)
+
+        Args:
+            clock (callable): Returns the current time in milliseconds
+        """
+        self.clock = clock
+        self.sword.clock = clock
+
+    def snapshot_state(self):
+        """Return the mutable player state as a flat tuple of numbers (see utils.snapshot)."""
+        return (
+            self.rect.x, self.rect.y, self.vx, self.vy,
+            self.on_ground, self.is_facing_right, self.health, self.is_dead,
+            self.respawn_timer, self.current_frame,
+            self.sword.is_attacking, self.sword.current_frame,
+            self.animation_timer, self.last_update_time,
+            self.sword.animation_timer, self.sword.last_update_time,
+        )
+
+    def restore_state(self, values):
+        """Restore the state produced by snapshot_state without reloading any frames."""
+        self.rect.x = int(values[0])
+        self.rect.y = int(values[1])
+        self.vx = values[2]
+        self.vy = values[3]
+        self.on_ground = bool(values[4])
+        self.is_facing_right = bool(values[5])
+        self.health = int(values[6])
+        self.is_dead = bool(values[7])
+        self.respawn_timer = int(values[8])
+        self.current_frame = int(values[9])
+        self.current_frames = self.normal_idle_frames
+        self.image = self.current_frames[self.current_frame]
+        self.footstep_particles.clear()
+
+        self.sword.is_attacking = bool(values[10])
+        self.sword.current_frame = int(values[11])
+        frames = self.sword.sword_attack_frames if self.sword.is_attacking else self.sword.sword_idle_frames
+        self.sword.image = frames[self.sword.current_frame]
+        self.sword.follow(self.rect, self.is_facing_right)
+
+        # The animation timers decide when the frame (and the sword attack) advances next
+        self.animation_timer = values[12]
+        self.last_update_time = values[13]
+        self.sword.animation_timer = values[14]
+        self.sword.last_update_time = values[15]
+
     def update(self, tiles):
             
         if self.is_dead:
@@ -378,8 +405,9 @@ class Player:
             self.move_and_collide(tiles)
 
             # 4. Update animation frame
-            self.animation_timer += pygame.time.get_ticks() - self.last_update_time
-            self.last_update_time = pygame.time.get_ticks()
+            now = self.clock()
+            self.animation_timer += now - self.last_update_time
+            self.last_update_time = now
             if self.animation_timer >= self.animation_interval:
                 self.animation_timer = 0
                 self.current_frame = (self.current_frame + 1) % len(self.normal_idle_frames)
@@ -391,38 +419,17 @@ class Player:
             self.sword.update(self.rect, self.is_facing_right)
         
 
-    def draw_health_bar(self, surface):
-        """Draw the player's health bar."""
-        bar_width = 100
-        bar_height = 10
-        bar_x = 10
-        bar_y = 10
-        border_thickness = 2
-
-        # Draw the border
-        pygame.draw.rect(surface, (0, 0, 0), (bar_x - border_thickness, bar_y - border_thickness, bar_width + 2 * border_thickness, bar_height + 2 * border_thickness))
-
-        # Draw the background
-        pygame.draw.rect(surface, (100, 100, 100), (bar_x, bar_y, bar_width, bar_height))
-
-        # Draw the health bar
-        health_ratio = self.health / self.max_health
-        pygame.draw.rect(surface, (255, 0, 0), (bar_x, bar_y, bar_width, bar_height))
-        pygame.draw.rect(surface, (0, 255, 0), (bar_x, bar_y, bar_width * health_ratio, bar_height))
-
-        # Draw the health text below the health bar
-        font = pygame.font.Font(None, 24)
-        health_text = font.render(f'Health: {self.health}/{self.max_health}', True, (255, 255, 255))
-        text_rect = health_text.get_rect()
-        text_rect.topleft = (bar_x, bar_y + bar_height + 5)
-        surface.blit(health_text, text_rect)
+    def draw(self, surface, camera=None):
+        """
+        Draw the player and the sword (the footstep particles are drawn by the game loop)
 
-    def draw(self, surface):
-        render_rect = self.camera.apply(self)
-        surface.blit(pygame.transform.flip(self.image, not self.is_facing_right, False), render_rect.topleft)
-        self.sword.draw(surface, self.is_facing_right)
-        for particle in self.footstep_particles:
-            particle.update()
-            particle.draw(surface)
-        self.draw_health_bar(surface)
+        Args:
+            surface (pygame.Surface): Target, or a render layer
+            camera (Camera, optional): Camera of the view being drawn, e.g. a split-screen
+                viewport's. Defaults to the player's camera.
+        """
+        camera = camera or self.camera
+        render_rect = camera.apply(self)
+        surface.blit(facing(self.image, self.is_facing_right), render_rect.topleft)
+        self.sword.draw(surface, self.is_facing_right, camera)
 
@@ -1,19 +1,26 @@
 import pygame
 from utils.utils import load_image
+from utils.atlas import get_atlas
+
+def load_tile_frames(width, height):
+    """Load the tile image scaled to the tile size (empty list if loading failed)"""
+    image = load_image('stile.png')
+    if image is None:
+        return []
+    # If image loaded successfully, scale it to match the tile size
+    return [pygame.transform.scale(image, (width, height))]
 
 class Tile:
     def __init__(self, x, y, width, height):
         self.rect = pygame.Rect(x, y, width, height)
-        # Load tile image
-        self.image = load_image('stile.png')
+        # Load tile image once per tile size; every tile shares the packed atlas frame
+        frames = get_atlas().get_or_add_group(f'tile/stile.png@{width}x{height}',
+                                              lambda: load_tile_frames(width, height))
+        self.image = frames[0] if frames else None
         
         # Default tile color as fallback
         self.color = (100, 100, 100)  # Gray
         
-        # If image loaded successfully, scale it to match the tile size
-        if self.image:
-            self.image = pygame.transform.scale(self.image, (width, height))
-        
     def draw(self, surface, camera_x=0, camera_y=0):
         """Draw the tile with camera offset applied."""
         draw_rect = pygame.Rect(
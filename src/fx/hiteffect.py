@@ -1,12 +1,16 @@
-import pygame
 import random
 import math
 
+from utils.renderqueue import circle_sprite
+
 class HitEffect:
     """
     Class that represents a hit effect animation displayed when the player takes damage.
     The effect creates multiple particles that expand outward from the hit point.
     """
+    # Number of values written by snapshot_state
+    SNAPSHOT_SIZE = 6
+
     def __init__(self, x, y, color=(255, 0, 0)):
         self.x = x
         self.y = y
@@ -17,10 +21,28 @@ class HitEffect:
         
         # Create particles
         self.create_particles()
+
+    def reset(self, x, y, color=(255, 0, 0)):
+        """Restart the effect at a new position, reusing the existing particle dicts"""
+        self.x = x
+        self.y = y
+        self.current_frame = 0
+        self.color = color
+        self.create_particles(len(self.particles) or 15)
+
+    def snapshot_state(self):
+        """Return the effect state as a flat tuple of numbers (see utils.snapshot)"""
+        return (self.x, self.y, self.current_frame, *self.color)
+
+    def restore_state(self, values):
+        """Restart the effect and replay it up to the captured frame"""
+        self.reset(values[0], values[1], (int(values[3]), int(values[4]), int(values[5])))
+        for _ in range(int(values[2])):
+            self.update()
     
     def create_particles(self, count=15):
-        """Create particles for the hit effect"""
-        for _ in range(count):
+        """Create particles for the hit effect, reusing particle dicts that already exist"""
+        for i in range(count):
             # Random angle and speed for each particle
             angle = random.uniform(0, 2 * math.pi)
             speed = random.uniform(1, 3)
@@ -31,16 +53,20 @@ class HitEffect:
             vx = math.cos(angle) * speed
             vy = math.sin(angle) * speed
             
-            # Add particle to list
-            self.particles.append({
-                'x': self.x,
-                'y': self.y,
-                'vx': vx,
-                'vy': vy,
-                'size': size,
-                'lifetime': lifetime,
-                'max_lifetime': lifetime
-            })
+            if i < len(self.particles):
+                particle = self.particles[i]
+            else:
+                # Add particle to list
+                particle = {}
+                self.particles.append(particle)
+
+            particle['x'] = self.x
+            particle['y'] = self.y
+            particle['vx'] = vx
+            particle['vy'] = vy
+            particle['size'] = size
+            particle['lifetime'] = lifetime
+            particle['max_lifetime'] = lifetime
     
     def update(self):
         """Update the hit effect animation"""
@@ -73,19 +99,15 @@ class HitEffect:
                 x -= camera.x
                 y -= camera.y
                 
-            # Create a surface for the particle with alpha
-            particle_surface = pygame.Surface((particle['size'] * 2, particle['size'] * 2), pygame.SRCALPHA)
-            
-            # Draw the particle
-            pygame.draw.circle(
-                particle_surface, 
-                (*self.color, alpha),  # Color with alpha
-                (particle['size'], particle['size']), 
-                particle['size']
-            )
+            # Cached dot sprite (alpha quantized to 16 steps so the cache stays small)
+            radius = int(particle['size'])
+            alpha &= 0xF0
+            if radius < 1 or alpha == 0:
+                continue
+            particle_surface = circle_sprite((*self.color, alpha), radius)
             
             # Draw the particle on the main surface
-            surface.blit(particle_surface, (x - particle['size'], y - particle['size']))
+            surface.blit(particle_surface, (x - radius, y - radius))
     
     def is_finished(self):
         """Check if the effect has completed its animation"""
@@ -0,0 +1,343 @@
+"""
+2D lighting with shadows.
+The screen is darkened by a light map: an ambient darkness from which every
+point light subtracts its radial gradient, and the result is subtracted from the
+frame (the same BLEND_RGB_SUB idea as the old draw_overlay mask).
+
+Costs are kept independent of the level size:
+- occluder edges (tile sides facing empty cells, merged into runs) are extracted
+  per chunk of the map on first use and cached; a light only looks at the chunks
+  its radius touches
+- a light's visibility polygon and its shadowed sprite are rebuilt only when the
+  light moves into another map cell; in between the cached sprite follows the
+  light (shadows may lag by less than a cell)
+- the light map is rendered at a fraction of the screen resolution and scaled up
+"""
+
+import math
+
+import pygame
+
+from utils.levelgeometry import SOLID, cell_at
+
+# Chunk size in cells for the occluder cache
+CHUNK_CELLS = 16
+
+# Gradient sprites by (radius, color), shared by every light
+_gradients = {}
+GRADIENT_CACHE_LIMIT = 128
+
+
+def light_gradient(radius, color):
+    """
+    Radial gradient from color at the centre to black at the radius (the falloff
+    of the old overlay mask: 20 rings, linear).
+
+    Returns:
+        pygame.Surface: Opaque (2 * radius) square sprite; do not draw on it, it is shared
+    """
+    key = (radius, color)
+    sprite = _gradients.get(key)
+    if sprite is None:
+        if len(_gradients) >= GRADIENT_CACHE_LIMIT:
+            _gradients.clear()
+        sprite = pygame.Surface((radius * 2, radius * 2)).convert()
+        sprite.fill((0, 0, 0))
+        rings = 20
+        for ring in range(rings):
+            # Outer rings first, each one brighter and smaller
+            fraction = (ring + 1) / rings
+            ring_color = [int(channel * fraction) for channel in color]
+            pygame.draw.circle(sprite, ring_color, (radius, radius), max(1, round(radius * (1 - ring / rings))))
+        sprite = _gradients[key] = sprite
+    return sprite
+
+
+class OccluderCache:
+    """
+    Edges between solid and empty cells, per chunk of the map, extracted on first use.
+    Edges are (x1, y1, x2, y2) in pixels, horizontal or vertical.
+    """
+    def __init__(self, level_map, tile_size, chunk_cells=CHUNK_CELLS):
+        self.tile_size = tile_size
+        self.chunk_cells = chunk_cells
+        self.chunks = {}
+        self.extracted = 0  # Chunks extracted so far (for reports)
+        self.set_level(level_map)
+
+    def set_level(self, level_map):
+        """Use a new or edited map; every chunk is extracted again when next needed"""
+        self.level_map = level_map
+        self.chunks.clear()
+
+    def _extract(self, chunk_x, chunk_y):
+        size = self.tile_size
+        level_map = self.level_map
+        first_column = chunk_x * self.chunk_cells
+        first_row = chunk_y * self.chunk_cells
+        columns = range(first_column, first_column + self.chunk_cells)
+        rows = range(first_row, first_row + self.chunk_cells)
+        edges = []
+
+        # Horizontal edges: top and bottom sides of solid cells, merged along each row
+        for row in rows:
+            for neighbour_row, y in ((row - 1, row * size), (row + 1, (row + 1) * size)):
+                start = None
+                for column in range(first_column, first_column + self.chunk_cells + 1):
+                    exposed = (column in columns and cell_at(level_map, column, row) == SOLID
+                               and cell_at(level_map, column, neighbour_row) != SOLID)
+                    if exposed and start is None:
+                        start = column
+                    elif not exposed and start is not None:
+                        edges.append((start * size, y, column * size, y))
+                        start = None
+
+        # Vertical edges: left and right sides, merged along each column
+        for column in columns:
+            for neighbour_column, x in ((column - 1, column * size), (column + 1, (column + 1) * size)):
+                start = None
+                for row in range(first_row, first_row + self.chunk_cells + 1):
+                    exposed = (row in rows and cell_at(level_map, column, row) == SOLID
+                               and cell_at(level_map, neighbour_column, row) != SOLID)
+                    if exposed and start is None:
+                        start = row
+                    elif not exposed and start is not None:
+                        edges.append((x, start * size, x, row * size))
+                        start = None
+        self.extracted += 1
+        return edges
+
+    def edges_in(self, rect):
+        """Every cached edge of the chunks overlapping a pixel rect"""
+        chunk_size = self.tile_size * self.chunk_cells
+        edges = []
+        for chunk_y in range(rect.top // chunk_size, (rect.bottom - 1) // chunk_size + 1):
+            for chunk_x in range(rect.left // chunk_size, (rect.right - 1) // chunk_size + 1):
+                key = (chunk_x, chunk_y)
+                chunk = self.chunks.get(key)
+                if chunk is None:
+                    chunk = self.chunks[key] = self._extract(chunk_x, chunk_y)
+                edges.extend(chunk)
+        return edges
+
+
+def _clip_edges(edges, bounds):
+    """Clip axis-aligned edges to a rect (left, top, right, bottom), dropping the ones outside"""
+    left, top, right, bottom = bounds
+    clipped = []
+    for x1, y1, x2, y2 in edges:
+        if y1 == y2:
+            if not top <= y1 <= bottom:
+                continue
+            x1, x2 = max(x1, left), min(x2, right)
+            if x1 < x2:
+                clipped.append((x1, y1, x2, y2))
+        else:
+            if not left <= x1 <= right:
+                continue
+            y1, y2 = max(y1, top), min(y2, bottom)
+            if y1 < y2:
+                clipped.append((x1, y1, x2, y2))
+    return clipped
+
+
+def visibility_polygon(origin_x, origin_y, radius, edges):
+    """
+    Area lit by a point light, by casting rays at every edge end point (and just
+    beside it) and keeping the closest hit. The light's bounding square closes
+    the polygon.
+
+    Args:
+        origin_x (float): Light position
+        origin_y (float): Light position
+        radius (int): Light radius
+        edges (list): Occluder edges (see OccluderCache)
+
+    Returns:
+        list: Polygon points in pixels, ordered by angle
+    """
+    bounds = (origin_x - radius, origin_y - radius, origin_x + radius, origin_y + radius)
+    left, top, right, bottom = bounds
+    segments = _clip_edges(edges, bounds)
+    segments += [(left, top, right, top), (right, top, right, bottom),
+                 (right, bottom, left, bottom), (left, bottom, left, top)]
+
+    angles = []
+    for x1, y1, x2, y2 in segments:
+        for x, y in ((x1, y1), (x2, y2)):
+            angle = math.atan2(y - origin_y, x - origin_x)
+            angles += (angle - 0.0001, angle, angle + 0.0001)
+    angles.sort()
+
+    points = []
+    for angle in angles:
+        dx = math.cos(angle)
+        dy = math.sin(angle)
+        closest = math.inf
+        for x1, y1, x2, y2 in segments:
+            sx = x2 - x1
+            sy = y2 - y1
+            denominator = dx * sy - dy * sx
+            if denominator == 0:
+                continue
+            ax = x1 - origin_x
+            ay = y1 - origin_y
+            t = (ax * sy - ay * sx) / denominator
+            u = (ax * dy - ay * dx) / denominator
+            if 0 <= t < closest and 0 <= u <= 1:
+                closest = t
+        if closest != math.inf:
+            points.append((origin_x + dx * closest, origin_y + dy * closest))
+    return points
+
+
+class PointLight:
+    """
+    Light at a world position. Shadow casting lights keep a cached sprite of their
+    gradient clipped to their visibility polygon.
+    """
+    def __init__(self, x, y, radius, color=(255, 255, 255), casts_shadows=True):
+        """
+        Initialize a light
+
+        Args:
+            x (float): World position
+            y (float): World position
+            radius (int): Reach in pixels
+            color (tuple, optional): RGB amount removed from the darkness at the centre.
+                Defaults to (255, 255, 255).
+            casts_shadows (bool, optional): False for small lights like fireflies. Defaults to True.
+        """
+        self.x = x
+        self.y = y
+        self.radius = radius
+        self.color = color
+        self.casts_shadows = casts_shadows
+        self.enabled = True
+        self.sprite = None
+        self.sprite_key = None  # (cell, radius, color, scale) the sprite was built for
+        self.rebuild_count = 0
+
+    def move_to(self, x, y):
+        self.x = x
+        self.y = y
+
+    def get_sprite(self, occluders, scale):
+        """
+        Light map sprite for the current position (scale: light map pixels per screen pixel divisor).
+
+        Returns:
+            pygame.Surface: Opaque sprite centred on the light
+        """
+        radius = max(1, self.radius // scale)
+        color = tuple(self.color)
+        if not self.casts_shadows:
+            return light_gradient(radius, color)
+
+        cell = (int(self.x) // occluders.tile_size, int(self.y) // occluders.tile_size)
+        key = (cell, radius, color, scale)
+        if key != self.sprite_key:
+            bounds = pygame.Rect(int(self.x) - self.radius, int(self.y) - self.radius,
+                                 self.radius * 2, self.radius * 2)
+            polygon = visibility_polygon(self.x, self.y, self.radius, occluders.edges_in(bounds))
+            if self.sprite is None or self.sprite.get_width() != radius * 2:
+                self.sprite = pygame.Surface((radius * 2, radius * 2)).convert()
+            self.sprite.fill((0, 0, 0))
+            if len(polygon) >= 3:
+                # Lit area in white, then the gradient multiplied in
+                local = [((x - self.x) / scale + radius, (y - self.y) / scale + radius) for x, y in polygon]
+                pygame.draw.polygon(self.sprite, (255, 255, 255), local)
+                self.sprite.blit(light_gradient(radius, color), (0, 0), special_flags=pygame.BLEND_RGB_MULT)
+            self.sprite_key = key
+            self.rebuild_count += 1
+        return self.sprite
+
+
+class LightMap:
+    """
+    Low resolution darkness map with point lights subtracted, applied to the frame.
+    """
+    def __init__(self, screen_size, level_map, tile_size, scale=4, ambient=(150, 150, 150)):
+        """
+        Initialize the light map
+
+        Args:
+            screen_size (tuple): Size of the frame the light map covers
+            level_map (list): Rows of the map (solid cells cast shadows)
+            tile_size (int): Size of a map cell in pixels
+            scale (int, optional): Screen pixels per light map pixel. Defaults to 4.
+            ambient (tuple, optional): Darkness subtracted where no light reaches. Defaults to (150, 150, 150).
+        """
+        self.screen_size = screen_size
+        self.scale = scale
+        self.ambient = ambient
+        self.occluders = OccluderCache(level_map, tile_size)
+        self.lights = []
+        # (low resolution map, preallocated upscaled destination) per view size, so
+        # split-screen viewports share the lights and their shadow sprites
+        self.buffers = {}
+        self.map, self.scaled = self._buffers(screen_size)
+
+    def _buffers(self, size):
+        size = tuple(size)
+        buffers = self.buffers.get(size)
+        if buffers is None:
+            buffers = self.buffers[size] = (
+                pygame.Surface((math.ceil(size[0] / self.scale), math.ceil(size[1] / self.scale))).convert(),
+                pygame.Surface(size).convert())
+        return buffers
+
+    def set_level(self, level_map):
+        self.occluders.set_level(level_map)
+        for light in self.lights:
+            light.sprite_key = None
+
+    def add(self, light):
+        """Add a light and return it"""
+        self.lights.append(light)
+        return light
+
+    def remove(self, light):
+        self.lights.remove(light)
+
+    def render(self, camera_x, camera_y, size=None):
+        """
+        Rebuild the light map for a view.
+
+        Args:
+            camera_x (int): Left of the view in level pixels
+            camera_y (int): Top of the view in level pixels
+            size (tuple, optional): View size, e.g. a split-screen viewport's. Defaults to the screen size.
+
+        Returns:
+            pygame.Surface: View sized darkness to subtract from the frame
+        """
+        scale = self.scale
+        size = size or self.screen_size
+        light_map, scaled = self._buffers(size)
+        view = pygame.Rect(camera_x, camera_y, *size)
+        light_map.fill(self.ambient)
+        light_blits = []
+        for light in self.lights:
+            if not light.enabled:
+                continue
+            reach = pygame.Rect(int(light.x) - light.radius, int(light.y) - light.radius,
+                                light.radius * 2, light.radius * 2)
+            if not view.colliderect(reach):
+                continue
+            sprite = light.get_sprite(self.occluders, scale)
+            half = sprite.get_width() // 2
+            position = (int((light.x - camera_x) / scale) - half, int((light.y - camera_y) / scale) - half)
+            light_blits.append((sprite, position, None, pygame.BLEND_RGB_SUB))
+        light_map.blits(light_blits, doreturn=False)
+        pygame.transform.smoothscale(light_map, tuple(size), scaled)
+        return scaled
+
+    def draw(self, surface, camera_x, camera_y, size=None):
+        """Darken a frame (or a render layer) with the light map of a view (see render)"""
+        surface.blit(self.render(camera_x, camera_y, size), (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+
+    def report(self):
+        rebuilds = sum(light.rebuild_count for light in self.lights)
+        return (f"Lighting: {len(self.lights)} lights, {len(self.occluders.chunks)} occluder chunks cached, "
+                f"{rebuilds} shadow rebuilds")
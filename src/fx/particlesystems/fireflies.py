@@ -1,7 +1,8 @@
-import pygame
 import random
 import math
 
+from utils.renderqueue import circle_sprite
+
 
 class Firefly:
     def __init__(self, WIDTH, HEIGHT):
@@ -40,9 +41,9 @@ class Firefly:
 
     def draw(self, screen):
         if self.brightness > 0:
-            color = (200, 200, 200, int(self.brightness))  # Yellow color with alpha for brightness
-            surface = pygame.Surface((self.size * 2, self.size * 2), pygame.SRCALPHA)
-            pygame.draw.circle(surface, color, (self.size, self.size), self.size)
+            # Brightness is quantized to 16 steps so every firefly shares a few cached sprites
+            color = (200, 200, 200, int(self.brightness) & 0xF0)  # Yellow color with alpha for brightness
+            surface = circle_sprite(color, self.size)
             screen.blit(surface, (int(self.x - self.size), int(self.y - self.size)))
 
 
@@ -1,58 +1,110 @@
 import pygame
 from utils.utils import load_image
+from utils.atlas import get_atlas
 import random
 
-class Fog:
+def load_fog_frames():
+    """Load the fog image (empty list if loading failed)"""
+    image = load_image('images/fog/fog.png', use_alpha=True)
+    return [image] if image is not None else []
+
+def prepare_fog_sprite(alpha):
     """
-    Continuously generate slow moving fog that moves across the screen
+    Get the fog image with its opacity baked in, premultiplied for compositing.
+
+    Args:
+        alpha (int): Opacity of one fog sprite (0-255)
+
+    Returns:
+        pygame.Surface: Premultiplied fog sprite
     """
-    def __init__(self, screen_width, screen_height, x=0, y=0):
-        # Load fog image
-        self.image = load_image('images/fog/fog.png', use_alpha=True)
-        self.image.set_alpha(40)
-
-         # Fallback if loading failed
-        if self.image is None:
-            self.image = pygame.Surface((32, 32))
-            self.image.fill((255, 255, 255))  # White color
-        
-        self.rect = self.image.get_rect(topleft=(x, y))
-        self.x_float = self.rect.x
-        self.screen_width = screen_width
-        # Set initial speed
-        self.speed = 0.2
-    
-    def update(self):
-        self.x_float = self.x_float + self.speed
-        self.rect.x = int(self.x_float)
-        if(self.rect.x > self.screen_width):
-            self.rect.x = 0
-            self.x_float = -200
-
-    def draw(self, screen):
-        # Draw the fog image
-        screen.blit(self.image, self.rect, special_flags=pygame.BLEND_ALPHA_SDL2)
-        # Set the alpha value for the fog image
+    # Decoded once and shared through the texture atlas
+    frames = get_atlas().get_or_add_group('fog/fog.png', load_fog_frames)
+    if frames:
+        sprite = frames[0].copy()
+    else:
+        # Fallback if loading failed
+        sprite = pygame.Surface((32, 32), pygame.SRCALPHA)
+        sprite.fill((255, 255, 255))
+    sprite.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+    # Premultiplied alpha composites correctly onto a transparent layer; straight alpha
+    # would darken the edges of every sprite (dark fringe)
+    return sprite.premul_alpha()
+
+class FogLayer:
+    """
+    One seamlessly tileable strip of pre-composited fog sprites that scrolls horizontally
+    """
+    def __init__(self, sprite, screen_width, screen_height, count, speed, parallax):
+        """
+        Composite the fog sprites into the layer
+
+        Args:
+            sprite (pygame.Surface): Premultiplied fog sprite (see prepare_fog_sprite)
+            screen_width (int): Screen width, also the period of the layer
+            screen_height (int): Screen height
+            count (int): Number of fog sprites composited into the layer (density)
+            speed (float): Drift in pixels per frame
+            parallax (float): Fraction of the camera movement applied to the layer
+        """
+        self.width = screen_width
+        height = min(sprite.get_height(), screen_height)
+        self.image = pygame.Surface((self.width, height), pygame.SRCALPHA).convert_alpha()
+        self.image.fill((0, 0, 0, 0))
+        for i in range(count):
+            x = random.randint(0, self.width - 1)
+            # Draw every copy that overlaps the strip so the wrap has no seam
+            offset = x - self.width * ((x + sprite.get_width()) // self.width)
+            while offset < self.width:
+                self.image.blit(sprite, (offset, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
+                offset += self.width
+
+        self.speed = speed
+        self.parallax = parallax
+        self.drift = 0.0
+        self.offset = 0
+
+    def update(self, camera_x=0):
+        self.drift = (self.drift + self.speed) % self.width
+        self.offset = int(self.drift - camera_x * self.parallax) % self.width
+
+    def draw(self, screen, camera_x=None):
+        # A split-screen viewport passes its own camera for its parallax
+        offset = self.offset if camera_x is None else int(self.drift - camera_x * self.parallax) % self.width
+        # Two blits cover the screen whatever the scroll position
+        screen.blit(self.image, (offset - self.width, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
+        screen.blit(self.image, (offset, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
 
 class FogManager:
     """
-    manage all of the fog sprites
-    there will be around 20 fog sprites
+    manage the fog layers
+    the fog sprites (around 20) are split between a slower back layer and a faster
+    front layer and composited into them once, instead of being drawn one by one
     """
-    def __init__(self, screen_width, screen_height, num_fog_sprites):
-        self.fog_sprites = []
-        for i in range(num_fog_sprites):
-            x = random.randint(0, screen_width - 1)
-            y = 0 
-            fog = Fog(screen_width, screen_height, x, y)
-            self.fog_sprites.append(fog)
-    
-    def draw(self, screen):
-        for fog in self.fog_sprites:
-            fog.draw(screen)
-    
-    def update(self):
-        i = 0
-        for fog in self.fog_sprites:
-            i = i + 1
-            fog.update()
\ No newline at end of file
+    def __init__(self, screen_width, screen_height, num_fog_sprites, alpha=40,
+                 layers=((0.15, 0.1), (0.25, 0.3))):
+        """
+        Build the fog layers
+
+        Args:
+            screen_width (int): Screen width
+            screen_height (int): Screen height
+            num_fog_sprites (int): Fog density: total number of fog sprites over all layers
+            alpha (int, optional): Opacity of one fog sprite. Defaults to 40.
+            layers (tuple, optional): (speed, parallax) per layer, back to front.
+                Defaults to ((0.15, 0.1), (0.25, 0.3)).
+        """
+        sprite = prepare_fog_sprite(alpha)
+        self.layers = []
+        for index, (speed, parallax) in enumerate(layers):
+            # Spread the sprites as evenly as possible over the layers
+            count = num_fog_sprites // len(layers) + (index < num_fog_sprites % len(layers))
+            self.layers.append(FogLayer(sprite, screen_width, screen_height, count, speed, parallax))
+
+    def draw(self, screen, camera_x=None):
+        for layer in self.layers:
+            layer.draw(screen, camera_x)
+
+    def update(self, camera_x=0):
+        for layer in self.layers:
+            layer.update(camera_x)
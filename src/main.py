@@ -1,18 +1,20 @@
 import pygame
 import sys
 import os
+import time
 
 # Fix import to use relative imports within the same package
 from entities.player import Player
 from fx.particlesystems.fog import FogManager
 from utils.controls import Controls
-from entities.background import Background, draw_overlay
+from entities.background import Background
 from entities.tile import Tile
 # ======================= IMPROVED MAP GENERATION IMPORT =======================
 from utils.utils import parse_map, get_file_path, FILETYPE
 from utils.audioplayer import play_background_music
 from fx.particlesystems.fireflies import FireflyParticleSystem
-from camera import Camera  # Add camera import
+from config import Config
+from display import Display
 
 # ======================= PLAYER KNOCKBACK IMPLEMENTATION - NEW IMPORT =======================
 # Import the player extension to add the knockback method
@@ -27,8 +29,29 @@ from entities.enemy import Enemy  # Import from entities package without src pre
 # ======================= HIT EFFECT IMPLEMENTATION - NEW IMPORT =======================
 # Import the HitEffect class
 from fx.hiteffect import HitEffect
+from fx.lighting import LightMap, PointLight
 # ===============================================================================
 
+from utils.snapshot import WorldSnapshot
+from utils.registry import EntityRegistry
+from utils.atlas import get_atlas
+from utils.renderqueue import RenderQueue, circle_sprite
+from utils.loader import AssetLoader, run_loading_screen
+from utils.assetbake import BAKE_MANIFEST
+from utils.hud import HUD, BarWidget, TextWidget
+from utils.displayformat import BlitAudit
+from utils.levelgeometry import platform_segments, segment_under
+from utils.navigation import PathService
+from utils.lineofsight import LineOfSight
+from utils.spatialgrid import SpatialGrid
+from utils.tilechunks import TileChunkCache
+from utils.viewport import split_screen
+from utils.capture import FrameCapture
+from utils.telemetry import (TelemetryWriter, TELEMETRY_FILE, PHASE_EVENTS, PHASE_PLAYERS, PHASE_ENEMIES,
+                             PHASE_EFFECTS, PHASE_DRAW, PHASE_HUD, PHASE_PRESENT, EVENT_PLAYER_HIT,
+                             EVENT_PLAYER_DIED, EVENT_RESPAWN, EVENT_ENEMY_REMOVED, EVENT_CAPTURING)
+from utils.heatmap import PerfHeatmap
+
 # ======================= ASSET VALIDATION IMPORTS =======================
 from utils.utils import get_file_path, FILETYPE
 # ===============================================================================
@@ -70,6 +93,22 @@ LEVEL_MAP = [
 LEVEL_WIDTH = len(LEVEL_MAP[0]) * TILE_SIZE
 LEVEL_HEIGHT = len(LEVEL_MAP) * TILE_SIZE
 
+# ======================= LEVEL ASSETS =======================
+# Everything the level needs, decoded on worker threads behind the loading screen
+LEVEL_IMAGES = [('background.jpeg', False), ('stile.png', True), ('images/fog/fog.png', True)]
+LEVEL_SOUNDS = ['background.mp3', 'jump.wav', 'sword.wav'] + \
+    [f'footsteps/footstep-{side}{index}.ogg' for side in 'lr' for index in range(3)]
+
+def queue_level_assets(loader):
+    """Submit every asset of the level to the asset loader"""
+    for use_alpha in (True, False):
+        loader.load_images([filename for filename, alpha in LEVEL_IMAGES if alpha == use_alpha], use_alpha)
+    for spec in BAKE_MANIFEST:
+        loader.load_baked(spec)
+    for filename in LEVEL_SOUNDS:
+        loader.load_sound(filename)
+# ===============================================================================
+
 # --------------------------------------------------------------------------------
 # MAIN GAME LOOP
 # --------------------------------------------------------------------------------
@@ -80,98 +119,196 @@ def main():
     pygame.mixer.init()
     pygame.mixer.set_num_channels(16)
 
-    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("MAGE-KNIGHT")
+    # The game renders at SCREEN_WIDTH x SCREEN_HEIGHT whatever the window size;
+    # the display scales the back buffer up by an integer factor when presenting
+    config = Config()
+    display = Display.from_config(config, (SCREEN_WIDTH, SCREEN_HEIGHT), caption="MAGE-KNIGHT")
+    screen = display.surface
     clock = pygame.time.Clock()
 
-    # Initialize camera
-    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, LEVEL_WIDTH, LEVEL_HEIGHT)
+    # Decode the level's assets in the background while a loading screen is shown
+    loader = AssetLoader()
+    queue_level_assets(loader)
+    if not run_loading_screen(screen, clock, loader, present=display.present):
+        pygame.quit()
+        sys.exit()
+    loader.shutdown()
+    # Clear the loading screen from the gaps between split-screen viewports
+    screen.fill((0, 0, 0))
 
-    # Initialize controls system
+    # Debug: F12 records every frame, F10 captures the frames that hitch (utils.capture)
+    frame_capture = FrameCapture(screen.get_size())
+    # Per-frame timings and counts, cheap enough to leave on (python -m utils.telemetry to analyze)
+    telemetry = TelemetryWriter(TELEMETRY_FILE if config.get_diagnostics()['telemetry'] else None)
+    # F9 adds each frame's cost to the tiles of the players and cameras (exported on exit for the map editor)
+    heatmap = PerfHeatmap(LEVEL_MAP, TILE_SIZE)
+    heatmap.enabled = config.get_diagnostics()['heatmap']
+
+    # ======================= SPLIT-SCREEN VIEWPORTS =======================
+    # One viewport with its own camera per player ("game": {"players": 2} in config.json).
+    # One keyboard has two binding sets, so at most two players
+    player_count = max(1, min(2, config.get_game()['players']))
+    viewports = split_screen(screen, player_count, (LEVEL_WIDTH, LEVEL_HEIGHT))
+    # Initialize camera (the first player's; each viewport has its own)
+    camera = viewports[0].camera
+
+    # Initialize controls system; the second player plays with the alternate bindings (arrows + Z)
     controls = Controls()
+    player_controls = [controls]
+    if player_count > 1:
+        second_controls = Controls()
+        second_controls.switch_to_alternate_controls()
+        player_controls.append(second_controls)
+    # ===============================================================================
 
-    firefly_particle_system = FireflyParticleSystem(SCREEN_WIDTH, SCREEN_HEIGHT, 10)
-    fog_manager = FogManager(SCREEN_WIDTH, SCREEN_HEIGHT, 20)
+    # Layers drawn into a viewport are sized to it (the viewports of a split all have the same size)
+    view_width, view_height = viewports[0].size
+    firefly_particle_system = FireflyParticleSystem(view_width, view_height, 10)
+    fog_manager = FogManager(view_width, view_height, 20)
     # Create background
-    background = Background(SCREEN_WIDTH, SCREEN_HEIGHT)
+    background = Background(view_width, view_height)
 
     # ======================= IMPROVED MAP LOADING =======================
     # Parse level map to get tiles, spawn positions, and death zones
     tiles, player_spawn, enemy_spawns, death_zones = parse_map(LEVEL_MAP, TILE_SIZE, Tile)
 
     # Create player at spawn position or default position if no spawn point defined
-    if player_spawn:
-        player = Player(player_spawn[0], player_spawn[1], controls, camera)
-    else:
+    if not player_spawn:
         # Default spawn position if no 'S' marker in map
-        player = Player(50, 50, controls, camera)
+        player_spawn = (50, 50)
+    # Further players spawn one tile to the right of the previous one
+    players = [Player(player_spawn[0] + index * TILE_SIZE, player_spawn[1], player_controls[index],
+                      viewports[index].camera)
+               for index in range(player_count)]
     
     # ======================= FIXED ENEMY CREATION AND POSITIONING =======================
     # Create enemies at spawn positions with varying patrol distances
-    enemies = []
+    # The registry pools despawned enemies so later spawns reuse them
+    enemies = EntityRegistry(Enemy)
     patrol_distances = [150, 200, 250]  # Different patrol distances for variety
     
     # Calculate proper Y offset to ensure enemies are properly placed on the platforms
     enemy_height = 64  # Default enemy height
     enemy_y_offset = -enemy_height  # Place enemies so their feet touch the platform
     
+    # Walkable platform segments; each enemy patrols the one under its spawn point
+    platforms = platform_segments(LEVEL_MAP, TILE_SIZE)
+
     for i, spawn in enumerate(enemy_spawns):
         patrol = patrol_distances[i % len(patrol_distances)]  # Cycle through patrol distances
+        platform = segment_under(platforms, spawn[0] + TILE_SIZE // 2, spawn[1])
         # Position the enemy on top of the platform by offsetting y position
-        enemies.append(Enemy(spawn[0], spawn[1] + enemy_y_offset, patrol_distance=patrol))
+        enemies.spawn(spawn[0], spawn[1] + enemy_y_offset, patrol_distance=patrol, platform=platform)
         print(f"Created enemy at ({spawn[0]}, {spawn[1] + enemy_y_offset})")
+
+    # Navigation graph for the enemies' physics; path searches are cached and shared by every enemy
+    if len(enemies):
+        navigator = PathService(LEVEL_MAP, TILE_SIZE, *next(iter(enemies)).navigation_physics())
+        for enemy in enemies:
+            enemy.navigator = navigator
+        print(navigator.report())
+
+    # Wall-aware detection: one batched line of sight query per tick and player for every enemy
+    sight = LineOfSight(LEVEL_MAP, TILE_SIZE)
+    sight_range = max((enemy.sight_range for enemy in enemies), default=0)
+
+    # Lighting: the players' lights cast shadows from the tiles; fireflies glow without shadows.
+    # The shadow sprites are cached per light and shared by every viewport
+    light_map = LightMap(viewports[0].size, LEVEL_MAP, TILE_SIZE)
+    player_lights = [light_map.add(PointLight(*each.rect.center, radius=120, color=(135, 135, 135)))
+                     for each in players]
+    firefly_lights = [light_map.add(PointLight(0, 0, radius=firefly.size * 6, casts_shadows=False))
+                      for firefly in firefly_particle_system.fireflies]
     # ===============================================================================
     
-    # ======================= IMPROVED ENEMY RESPAWN TRACKING =======================
-    # Store initial enemy positions and properties for respawning
-    enemy_spawns_info = []
-    for i, spawn in enumerate(enemy_spawns):
-        patrol = patrol_distances[i % len(patrol_distances)]
-        enemy_spawns_info.append({
-            'x': spawn[0],
-            'y': spawn[1] + enemy_y_offset,  # Using the adjusted Y position
-            'patrol': patrol
-        })
-    # ===============================================================================
-    
+    # Report how the level's frames were packed into the texture atlas
+    print(get_atlas().report())
+
     # Load and play background music
     play_background_music(get_file_path("background.mp3", FILETYPE.AUDIO))
 
     # ======================= KNOCKBACK IMPLEMENTATION - NEW VARIABLE =======================
-    # Variable to track player invulnerability after being hit
-    invulnerable_timer = 0
+    # Variable to track player invulnerability after being hit (one timer per player)
+    invulnerable_timers = [0] * player_count
     invulnerable_duration = 60  # Frames of invulnerability after being hit (1 second at 60 FPS)
+    invulnerable_names = [f"invulnerable_{index}" for index in range(player_count)]
     # ===============================================================================
 
     # ======================= HIT EFFECT IMPLEMENTATION - NEW VARIABLE =======================
-    # List to store active hit effects
-    hit_effects = []
+    # Registry of active hit effects (finished effects are pooled and reused)
+    hit_effects = EntityRegistry(HitEffect)
+    # ===============================================================================
+
+    # ======================= WORLD SNAPSHOT - SPAWN CHECKPOINT =======================
+    # Capture the freshly spawned world once; death respawns restore it in place
+    # instead of rebuilding (and reloading the assets of) every enemy
+    checkpoint = WorldSnapshot(Player, Enemy, HitEffect, timer_names=invulnerable_names,
+                               max_enemies=max(256, len(enemies)), player_count=player_count)
+    checkpoint.capture(players, enemies, hit_effects, dict(zip(invulnerable_names, invulnerable_timers)))
+    # ===============================================================================
+
+    # ======================= RENDER QUEUE =======================
+    # Each layer goes to the screen with a single Surface.blits call per frame and viewport.
+    # The player layer keeps painter's order (sword over body)
+    render_queue = RenderQueue(["tiles", "enemies", "fog", "overlay", ("player", False),
+                                "particles", "effects", "fireflies"])
+    # Debug: F3 toggles a per-frame count of blits by (source format, target format, flags)
+    blit_audit = BlitAudit()
+    render_queue.audit = blit_audit
+    # Static tiles are baked into chunks once and shared by every viewport
+    tile_chunks = TileChunkCache(tiles)
+    # Enemies are bucketed once per tick; every viewport culls against the same grid
+    enemy_grid = SpatialGrid()
+    # ===============================================================================
+
+    # ======================= HUD =======================
+    # Widgets re-render only when the player's health changes; each player's in their viewport
+    hud = HUD(screen.get_size())
+    for viewport, each in zip(viewports, players):
+        player_health = lambda each=each: (each.health, each.max_health)
+        hud.add(BarWidget((viewport.rect.x + 10, viewport.rect.y + 10), player_health, size=(100, 10)))
+        hud.add(TextWidget((viewport.rect.x + 10, viewport.rect.y + 25), player_health, "Health: {}/{}"))
     # ===============================================================================
 
     running = True
+    tick = 0
     while running:
+        telemetry.begin_frame()
+        frame_start = time.perf_counter()
         # 1. Process events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_TAB:
+                if event.key == pygame.K_TAB and player_count == 1:
                     controls.toggle_control_scheme()  # Allow toggling controls with Tab key
+                elif event.key == pygame.K_F3:
+                    blit_audit.enabled = not blit_audit.enabled
+                    print(f"Blit audit {'on' if blit_audit.enabled else 'off'}")
+                elif event.key == pygame.K_F12:
+                    frame_capture.toggle_recording()
+                elif event.key == pygame.K_F10:
+                    frame_capture.toggle_hitches()
+                elif event.key == pygame.K_F9:
+                    heatmap.toggle()
         
         # Update control states
-        controls.update()
+        for each_controls in player_controls:
+            each_controls.update()
+        telemetry.end_phase(PHASE_EVENTS)
         
         # 2. Update game objects
-        player.update(tiles)
-        # Update camera to follow player
-        camera.update(player)
+        for viewport, each in zip(viewports, players):
+            each.update(tiles)
+            # Update camera to follow player
+            viewport.follow(each)
         
         # ======================= IMPROVED DEATH ZONE COLLISION DETECTION =======================
-        # Check if player is in a death zone
-        player_rect = player.rect
+        # Check if a player is in a death zone
         player_died = False
         
-        for death_zone in death_zones:
+        for each in players:
+            player_rect = each.rect
             # Check if player's feet touch the death zone
             # This is more lenient and makes more sense for platformers
             feet_rect = pygame.Rect(
@@ -181,14 +318,15 @@ def main():
                 player_rect.height * 0.2   # Only check the bottom 20% of the player height
             )
             
-            if feet_rect.colliderect(death_zone):
-                player.health = 0
+            if feet_rect.collidelist(death_zones) != -1:
+                each.health = 0
                 player_died = True
+                telemetry.event(EVENT_PLAYER_DIED)
                 print("Player hit a death zone!")
                 break  # Exit loop once death is detected
                 
         # Check if enemies are in death zones and remove them if they are
-        for enemy in enemies[:]:  # Create a copy of the list for safe removal
+        for enemy in enemies:  # Despawns are deferred, so no copy is needed
             for death_zone in death_zones:
                 # Create a feet rect for the enemy similar to the player
                 enemy_feet_rect = pygame.Rect(
@@ -199,74 +337,86 @@ def main():
                 )
                 
                 if enemy_feet_rect.colliderect(death_zone):
-                    enemies.remove(enemy)
+                    enemies.despawn(enemy.handle)
+                    telemetry.event(EVENT_ENEMY_REMOVED)
                     print(f"Enemy fell into death zone at ({enemy.rect.x}, {enemy.rect.y})")
                     break  # Exit inner loop once this enemy is removed
         # ===============================================================================
         
-        # Reset player and enemies if player died
+        # Reset players and enemies if a player died (co-op players respawn together)
         if player_died:
-            # Reset player to spawn position
-            if player_spawn:
-                player.rect.x = player_spawn[0]
-                player.rect.y = player_spawn[1]
-            
-            # Reset player velocity
-            player.vx = 0
-            player.vy = 0
-            
-            # Respawn all enemies to their original positions
-            enemies = []
-            for spawn_info in enemy_spawns_info:
-                enemies.append(Enemy(
-                    spawn_info['x'],
-                    spawn_info['y'],
-                    patrol_distance=spawn_info['patrol']
-                ))
+            # Restore players, enemies, effects and timers from the last checkpoint
+            timers = checkpoint.restore(players, enemies, hit_effects)
+            invulnerable_timers = [timers[name] for name in invulnerable_names]
+            telemetry.event(EVENT_RESPAWN)
             print("Respawned all enemies!")
         # ===============================================================================
         
         # ======================= KNOCKBACK IMPLEMENTATION - UPDATED COLLISION =======================
-        # Update invulnerability timer
-        if invulnerable_timer > 0:
-            invulnerable_timer -= 1
+        # Update invulnerability timers
+        for index in range(player_count):
+            if invulnerable_timers[index] > 0:
+                invulnerable_timers[index] -= 1
+        telemetry.end_phase(PHASE_PLAYERS)
         
         # ======================= UPDATED ENEMY PROCESSING =======================
-        # Update all enemies and pass the player parameter for detection
-        for enemy in enemies[:]:  # Use copy to allow safe removal
+        # Update all enemies and pass the player they go after for detection
+        sight.begin_tick()
+        enemy_centers = [enemy.rect.center for enemy in enemies]
+        in_sight = [sight.visible_from(enemy_centers, each.rect.center, max_distance=sight_range)
+                    for each in players]
+        for enemy_index, enemy in enumerate(enemies):
+            # Skip enemies already scheduled for removal this tick
+            if not enemies.is_alive(enemy.handle):
+                continue
+
+            # Go after the closest player in sight, or the closest one if none is
+            distances = [((each.rect.centerx - enemy.rect.centerx) ** 2
+                          + (each.rect.centery - enemy.rect.centery) ** 2, index)
+                         for index, each in enumerate(players)]
+            visible_distances = [entry for entry in distances if in_sight[entry[1]][enemy_index]]
+            target_index = min(visible_distances or distances)[1]
+            target = players[target_index]
+
             # Update returns False if enemy should be removed (fell out of bounds)
-            if not enemy.update(tiles, player):
-                enemies.remove(enemy)
+            if not enemy.update(tiles, target, in_sight[target_index][enemy_index]):
+                enemies.despawn(enemy.handle)
+                telemetry.event(EVENT_ENEMY_REMOVED)
+                continue
                 
-            # Check for player-enemy collision only if player is not invulnerable
-            if invulnerable_timer <= 0 and enemy.check_player_collision(player):
+            for index, hit_player in enumerate(players):
+                # Check for player-enemy collision only if player is not invulnerable
+                if invulnerable_timers[index] > 0 or not enemy.check_player_collision(hit_player):
+                    continue
+
                 # Calculate knockback direction (away from enemy)
-                knockback_dir = 1 if player.rect.centerx > enemy.rect.centerx else -1
+                knockback_dir = 1 if hit_player.rect.centerx > enemy.rect.centerx else -1
                 
                 # Apply stronger knockback if enemy is attacking
                 knockback_force = 15 if enemy.state == "attacking" else 10
                 vertical_force = -10 if enemy.state == "attacking" else -8
                 
                 # Apply knockback to player
-                player.apply_knockback(knockback_dir, knockback_force, vertical_force)
+                hit_player.apply_knockback(knockback_dir, knockback_force, vertical_force)
                 
                 # Start invulnerability period
-                invulnerable_timer = invulnerable_duration
+                invulnerable_timers[index] = invulnerable_duration
+                telemetry.event(EVENT_PLAYER_HIT)
                 
                 # Decrease player health (more damage if enemy is charging)
                 damage = 2 if enemy.state == "attacking" else 1
-                player.health -= damage
+                hit_player.health -= damage
                 
                 # ======================= HIT EFFECT IMPLEMENTATION - CREATE EFFECT =======================
                 # Create hit effect at the point of collision
-                hit_x = (player.rect.centerx + enemy.rect.centerx) / 2
-                hit_y = (player.rect.centery + enemy.rect.centery) / 2
+                hit_x = (hit_player.rect.centerx + enemy.rect.centerx) / 2
+                hit_y = (hit_player.rect.centery + enemy.rect.centery) / 2
                 
                 # Different colors based on attack strength
                 hit_color = (255, 50, 50) if enemy.state == "attacking" else (255, 100, 100)
                 
                 # Add new hit effect
-                hit_effects.append(HitEffect(hit_x, hit_y, hit_color))
+                hit_effects.spawn(hit_x, hit_y, hit_color)
                 
                 # Try to play hit sound if the function exists
                 try:
@@ -277,71 +427,118 @@ def main():
                     pass
                 # ===============================================================================
                 
-                if player.health <= 0:
-                    player.die()
+                if hit_player.health <= 0:
+                    hit_player.die()
                 
                 # Optional: Display hit effect or play sound
                 print(f"Player knocked back by enemy! Damage: {damage}")
         # ===============================================================================
+        telemetry.end_phase(PHASE_ENEMIES)
         
         # ======================= HIT EFFECT IMPLEMENTATION - UPDATE EFFECTS =======================
         # Update and remove finished hit effects
-        for effect in hit_effects[:]:
+        for effect in hit_effects:
             effect.update()
             if effect.is_finished():
-                hit_effects.remove(effect)
+                hit_effects.despawn(effect.handle)
         # ===============================================================================
+
+        # Apply the deferred despawns at the end of the simulation tick
+        enemies.flush()
+        hit_effects.flush()
+
+        # Rebuild the enemies' spatial index for this frame's viewports
+        enemy_grid.clear()
+        for enemy in enemies:
+            enemy_grid.insert(enemy, enemy.rect)
+
+        # Footstep particles move once per tick (not once per viewport) and expire
+        for each in players:
+            for particle in each.footstep_particles:
+                particle.update()
+            each.footstep_particles[:] = [particle for particle in each.footstep_particles if particle.lifetime > 0]
         
-        fog_manager.update()
+        fog_manager.update(camera.x)
         firefly_particle_system.update()
+        for light, each in zip(player_lights, players):
+            light.move_to(*each.rect.center)
+        telemetry.end_phase(PHASE_EFFECTS)
 
-        # 3. Draw everything
-        # Draw background
-        background.draw(screen, player_rect=player.rect)
+        # 3. Draw everything, once per viewport
+        draw_start = time.perf_counter()
+        for viewport, viewport_player in zip(viewports, players):
+            surface = viewport.surface
+            view_camera = viewport.camera
+            view = viewport.view
 
-        # Draw the level tiles with camera offset
-        for tile in tiles:
-            # Apply camera offset to each tile
-            tile_rect = camera.apply(tile)
-            screen.blit(tile.image, tile_rect)
+            # Draw background
+            background.draw(surface, player_rect=viewport_player.rect)
+            if background.image:
+                blit_audit.record(background.image, surface)
 
-        # ======================= ENEMY IMPLEMENTATION - NEW CODE =======================
-        # Draw all enemies with camera offset
-        for enemy in enemies:
-            enemy.draw(screen, camera)
-        # ===============================================================================
+            # Draw the level tiles with camera offset (only the cached chunks inside the view)
+            tile_chunks.draw(render_queue.layer("tiles"), view)
+
+            # ======================= ENEMY IMPLEMENTATION - NEW CODE =======================
+            # Draw the enemies inside the view with camera offset
+            enemy_layer = render_queue.layer("enemies")
+            for enemy in enemy_grid.query(view):
+                enemy.draw(enemy_layer, view_camera)
+            # ===============================================================================
+                
+            fog_manager.draw(render_queue.layer("fog"), view_camera.x)
+            for light, firefly in zip(firefly_lights, firefly_particle_system.fireflies):
+                # Fireflies live in screen space; their glow follows their (quantized) brightness
+                light.move_to(firefly.x + view_camera.x, firefly.y + view_camera.y)
+                glow = (int(firefly.brightness) & 0xF0) // 2
+                light.color = (glow, glow, glow)
+                light.enabled = glow > 0
+            light_map.draw(render_queue.layer("overlay"), view_camera.x, view_camera.y, viewport.size)
             
-        fog_manager.draw(screen)
-        player_render_rect = camera.apply(player)
-        draw_overlay(SCREEN_WIDTH, SCREEN_HEIGHT, screen, player_rect=player_render_rect)
-        
-        # ======================= KNOCKBACK IMPLEMENTATION - VISUAL INDICATOR =======================
-        # Optional: Flash the player sprite when invulnerable
-        visible = True
-        if invulnerable_timer > 0:
-            # Make player flash by alternating visibility every 5 frames
-            visible = (invulnerable_timer // 5) % 2 == 0
-        
-        # Draw the player only if visible
-        if visible:
-            player.draw(screen)
-        # ===============================================================================
-        
-        # Draw any footstep particles with camera offset
-        for particle in player.footstep_particles:
-            particle.update()
-            # Draw at camera-adjusted position
-            adjusted_x = particle.x - camera.x
-            adjusted_y = particle.y - camera.y
-            pygame.draw.circle(screen, particle.color, (int(adjusted_x), int(adjusted_y)), int(particle.size))
-        
-        # ======================= HIT EFFECT IMPLEMENTATION - DRAW EFFECTS =======================
-        # Draw all active hit effects
-        for effect in hit_effects:
-            effect.draw(screen, camera)
-        # ===============================================================================
-        
-        firefly_particle_system.draw(screen)
+            # ======================= KNOCKBACK IMPLEMENTATION - VISUAL INDICATOR =======================
+            for index, each in enumerate(players):
+                # Optional: Flash the player sprite when invulnerable
+                visible = True
+                if invulnerable_timers[index] > 0:
+                    # Make player flash by alternating visibility every 5 frames
+                    visible = (invulnerable_timers[index] // 5) % 2 == 0
+                
+                # Draw the player only if visible
+                if visible and view.colliderect(each.rect):
+                    each.draw(render_queue.layer("player"), view_camera)
+            # ===============================================================================
+            
+            # Draw any footstep particles with camera offset
+            particle_layer = render_queue.layer("particles")
+            for each in players:
+                for particle in each.footstep_particles:
+                    # Draw at camera-adjusted position
+                    radius = int(particle.size)
+                    if radius > 0:
+                        adjusted_x = int(particle.x - view_camera.x)
+                        adjusted_y = int(particle.y - view_camera.y)
+                        particle_layer.blit(circle_sprite(particle.color, radius), (adjusted_x - radius, adjusted_y - radius))
+            
+            # ======================= HIT EFFECT IMPLEMENTATION - DRAW EFFECTS =======================
+            # Draw all active hit effects
+            effect_layer = render_queue.layer("effects")
+            for effect in hit_effects:
+                effect.draw(effect_layer, view_camera)
+            # ===============================================================================
+            
+            firefly_particle_system.draw(render_queue.layer("fireflies"))
+            render_queue.flush(surface)
+        render_queue.end_frame()
+        telemetry.end_phase(PHASE_DRAW)
+
+        # Draw the HUD on top of everything
+        hud.update()
+        hud.draw(screen)
+        blit_audit.record(hud.layer, screen)
+        blit_audit.end_frame()
+        if blit_audit.enabled and blit_audit.frame_count % 120 == 1:
+            print(blit_audit.report())
+        telemetry.end_phase(PHASE_HUD)
 
         # ======================= FIXED DEATH ZONE VISUALIZATION (DEBUG ONLY) =======================
         # Uncomment to visualize death zones during debugging
@@ -356,9 +553,35 @@ def main():
         #     pygame.draw.rect(screen, (255, 0, 0), adjusted_rect, 1)
         # ===============================================================================
         
-        pygame.display.flip()
+        # The heatmap's draw cost ends here: presenting waits for vsync wherever the players are
+        heatmap.record((draw_start - frame_start) * 1000, (time.perf_counter() - draw_start) * 1000,
+                       [each.rect.center for each in players], [viewport.view.center for viewport in viewports])
+
+        # Copy the finished frame for the capture writer thread (nothing is written here)
+        frame_capture.capture(screen)
+        if frame_capture.active:
+            telemetry.event(EVENT_CAPTURING)
+        display.present()
+        telemetry.end_phase(PHASE_PRESENT)
         clock.tick(60)
+
+        # The frame's record (its time includes the wait for the frame rate)
+        tick += 1
+        telemetry.end_frame(tick, enemies=len(enemies), effects=len(hit_effects),
+                            particles=sum(len(each.footstep_particles) for each in players)
+                            + len(firefly_particle_system.fireflies),
+                            blits=render_queue.last_frame['commands'])
     
+    # Write the frames still queued for the capture writer
+    frame_capture.close()
+    if frame_capture.captured:
+        print(frame_capture.report())
+    telemetry.close()
+    if telemetry.written:
+        print(telemetry.report())
+    if heatmap.frames:
+        heatmap.export()
+        print(heatmap.report())
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,6 @@
+"""
+Two-player network play: a deterministic tick based simulation (simulation),
+the inputs exchanged each tick (inputs), a UDP transport with a loopback relay
+for testing on one machine (transport) and the rollback session that keeps both
+peers in step (rollback). Run from the src folder with python -m net.play.
+"""
@@ -0,0 +1,57 @@
+"""
+Player inputs as bit masks.
+One byte per player per tick is all the peers exchange; the simulation turns
+it back into the is_pressed interface of utils.controls.Controls, so Player
+reads network inputs exactly like keyboard inputs.
+"""
+
+MOVE_LEFT = 1
+MOVE_RIGHT = 2
+JUMP = 4
+ATTACK = 8
+
+# Action name (as used by Controls and Player) -> bit
+ACTION_BITS = {
+    'move_left': MOVE_LEFT,
+    'move_right': MOVE_RIGHT,
+    'jump': JUMP,
+    'attack': ATTACK,
+}
+
+
+def encode_controls(controls):
+    """
+    Bit mask of the actions currently pressed
+
+    Args:
+        controls (Controls): Updated controls (Controls.update was called this frame)
+
+    Returns:
+        int: Input byte for the current tick
+    """
+    bits = 0
+    for action, bit in ACTION_BITS.items():
+        if controls.is_pressed(action):
+            bits |= bit
+    return bits
+
+
+class InputControls:
+    """
+    Stand-in for Controls that answers from an input byte set by the simulation.
+    """
+    def __init__(self):
+        self.bits = 0
+        self.previous_bits = 0
+
+    def set(self, bits):
+        """Use the input of the tick about to be simulated"""
+        self.previous_bits = self.bits
+        self.bits = bits
+
+    def is_pressed(self, action):
+        return bool(self.bits & ACTION_BITS.get(action, 0))
+
+    def is_just_pressed(self, action):
+        bit = ACTION_BITS.get(action, 0)
+        return bool(self.bits & bit and not self.previous_bits & bit)
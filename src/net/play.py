@@ -0,0 +1,170 @@
+"""
+Two-player network game.
+
+Run from the src folder:
+    python -m net.play loopback [--rtt MS] [--jitter MS] [--loss FRACTION]
+    python -m net.play host [--port PORT]
+    python -m net.play join HOST:PORT
+
+loopback runs both peers in this process, connected through a LoopbackRelay
+that adds latency, jitter and packet loss: player 1 plays with WASD + Q and
+player 2 with the arrow keys + Z, and the window shows player 1's peer.
+host and join play across the network, each machine with WASD + Q.
+"""
+
+import argparse
+import random
+import sys
+
+import pygame
+
+from main import LEVEL_MAP, TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, LEVEL_WIDTH, LEVEL_HEIGHT
+from camera import Camera
+from config import Config
+from display import Display
+from entities.background import Background
+from utils.controls import Controls
+from utils.hud import HUD, TextWidget
+from .inputs import encode_controls, MOVE_LEFT, MOVE_RIGHT, JUMP, ATTACK
+from .rollback import RollbackSession
+from .simulation import CoopSimulation, TICK_RATE
+from .transport import LoopbackRelay, UdpPeer
+
+DEFAULT_PORT = 7777
+
+
+class RandomInputs:
+    """Input source for soak tests: holds a random input for a random number of ticks"""
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+        self.bits = 0
+        self.hold = 0
+
+    def next(self):
+        if self.hold <= 0:
+            self.bits = self.random.choice((0, MOVE_LEFT, MOVE_RIGHT, MOVE_RIGHT | JUMP, MOVE_LEFT | JUMP, ATTACK))
+            self.hold = self.random.randint(5, 40)
+        self.hold -= 1
+        return self.bits
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def draw_world(screen, background, simulation, camera, local_player):
+    camera.update(simulation.players[local_player])
+    background.draw(screen, player_rect=simulation.players[local_player].rect)
+    view = pygame.Rect(camera.x, camera.y, SCREEN_WIDTH, SCREEN_HEIGHT)
+    screen.blits([(tile.image, (tile.rect.x - camera.x, tile.rect.y - camera.y))
+                  for tile in simulation.tiles if tile.image and view.colliderect(tile.rect)], doreturn=False)
+    for enemy in simulation.living_enemies():
+        if view.colliderect(enemy.rect):
+            enemy.draw(screen, camera)
+    for index, player in enumerate(simulation.players):
+        # Flash while invulnerable, like the single player game
+        if (simulation.invulnerable[index] // 5) % 2 == 0:
+            player.draw(screen)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Two-player game over UDP with rollback")
+    parser.add_argument('mode', choices=('loopback', 'host', 'join'))
+    parser.add_argument('address', nargs='?', help="HOST:PORT to join")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="port to host on")
+    parser.add_argument('--rtt', type=float, default=100, help="loopback round trip time in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="loopback jitter in ms")
+    parser.add_argument('--loss', type=float, default=0.0, help="loopback packet loss, 0 to 1")
+    parser.add_argument('--seed', type=int, help="seed of the loopback loss and jitter")
+    parser.add_argument('--delay', type=int, default=0, help="input delay in ticks")
+    parser.add_argument('--max-rollback', type=int, default=8, help="most ticks predicted ahead")
+    parser.add_argument('--random-inputs', type=int, metavar='SEED',
+                        help="play every player with random inputs (soak test)")
+    parser.add_argument('--frames', type=int, help="quit after this many frames")
+    options = parser.parse_args(args)
+    if options.mode == 'join' and not options.address:
+        parser.error("join needs HOST:PORT")
+
+    pygame.init()
+    pygame.mixer.init()
+    pygame.mixer.set_num_channels(16)
+    display = Display.from_config(Config(), (SCREEN_WIDTH, SCREEN_HEIGHT), caption="MAGE-KNIGHT (network)")
+    screen = display.surface
+    clock = pygame.time.Clock()
+    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, LEVEL_WIDTH, LEVEL_HEIGHT)
+    background = Background(SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    relay = None
+    if options.mode == 'loopback':
+        relay = LoopbackRelay(options.rtt, options.jitter, options.loss, options.seed)
+        peers = [UdpPeer(('127.0.0.1', 0), relay.address_a), UdpPeer(('127.0.0.1', 0), relay.address_b)]
+        local_players = [0, 1]
+    elif options.mode == 'host':
+        peers = [UdpPeer(('0.0.0.0', options.port))]
+        local_players = [0]
+    else:
+        peers = [UdpPeer(('0.0.0.0', 0), parse_address(options.address))]
+        local_players = [1]
+
+    # One session (and one copy of the world) per peer run by this process
+    sessions = [RollbackSession(CoopSimulation(LEVEL_MAP, TILE_SIZE, camera), local_player, peer,
+                                options.delay, options.max_rollback)
+                for local_player, peer in zip(local_players, peers)]
+
+    controls = []
+    for index in range(len(sessions)):
+        session_controls = Controls()
+        if index == 1:
+            session_controls.switch_to_alternate_controls()
+        controls.append(session_controls)
+    random_inputs = None
+    if options.random_inputs is not None:
+        random_inputs = [RandomInputs(options.random_inputs + index) for index in range(len(sessions))]
+
+    shown = sessions[0]
+    hud = HUD((SCREEN_WIDTH, SCREEN_HEIGHT))
+    hud.add(TextWidget((10, 10), lambda: (shown.local_player + 1, "connected" if shown.connected else "waiting"),
+                       "Player {} - {}", font_size=20))
+    hud.add(TextWidget((10, 28), lambda: (shown.rollbacks, shown.max_rollback_depth,
+                                          round(shown.rtt_ms) if shown.rtt_ms is not None else "-"),
+                       "Rollbacks {} (deepest {})  RTT {} ms", font_size=20))
+
+    frame = 0
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        for index, (session, session_controls) in enumerate(zip(sessions, controls)):
+            session_controls.update()
+            if random_inputs:
+                local_input = random_inputs[index].next()
+            else:
+                local_input = encode_controls(session_controls)
+            session.advance(local_input)
+
+        draw_world(screen, background, shown.simulation, camera, shown.local_player)
+        hud.update()
+        hud.draw(screen)
+        display.present()
+        clock.tick(TICK_RATE)
+
+        frame += 1
+        if options.frames is not None and frame >= options.frames:
+            running = False
+
+    for session in sessions:
+        print(session.report())
+    if relay is not None:
+        print(relay.report())
+        relay.close()
+    for peer in peers:
+        peer.close()
+    pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
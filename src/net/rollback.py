@@ -0,0 +1,218 @@
+"""
+Rollback session between two peers.
+The local input is simulated on the tick it is sampled (plus an optional input
+delay), so it shows up on the very next frame whatever the round trip time.
+The remote input of a tick that has not arrived yet is predicted: the peer is
+assumed to hold what it held last. When the real input arrives and differs, the
+simulation is restored to the state saved before that tick and every tick since
+is simulated again with the corrected inputs (sound and console output muted).
+
+The session never predicts more than max_rollback ticks ahead of the last
+remote input received; past that it stalls, which also keeps a peer that runs
+fast from drifting away from the other. Peers exchange a checksum of each
+confirmed tick to detect a desync.
+"""
+
+import contextlib
+import time
+
+from utils.audioplayer import muted
+from .transport import MAX_INPUTS_PER_PACKET, decode_packet, encode_packet, now_ms
+
+# Checksums kept for comparison with the peer's
+CHECKSUM_HISTORY = 120
+
+
+class RollbackSession:
+    """
+    Drives a CoopSimulation (see net.simulation) from local and remote inputs.
+    """
+    def __init__(self, simulation, local_player, peer, input_delay=0, max_rollback=8):
+        """
+        Start a session at the simulation's current state (tick 0)
+
+        Args:
+            simulation (CoopSimulation): The world, identical on both peers
+            local_player (int): 0 or 1, which player this machine controls
+            peer (UdpPeer): Connection to the other machine
+            input_delay (int, optional): Ticks between sampling and simulating a local input.
+                More delay means fewer, shorter rollbacks. Defaults to 0.
+            max_rollback (int, optional): Most ticks predicted ahead of the remote input. Defaults to 8.
+        """
+        self.simulation = simulation
+        self.local_player = local_player
+        self.peer = peer
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+
+        # States saved before each tick, by tick modulo the ring size
+        self.states = [None] * (max_rollback + 2)
+
+        # The first input_delay ticks have no sampled input: they are empty on both peers
+        self.local_inputs = {tick: 0 for tick in range(1, input_delay + 1)}
+        self.remote_inputs = {0: 0}
+        self.last_remote_tick = 0  # Every remote input up to here has arrived
+        self.predicted = {}  # Remote input assumed for ticks simulated before it arrived
+        self.acked = 0  # The peer has every local input up to here
+        self.pruned = 0  # Inputs up to here are neither resent nor needed for a rollback
+
+        self.checksums = {}
+        self.remote_checksums = {}
+        self.last_checksum_tick = 0
+        self.last_compared_tick = 0  # Every packet repeats the peer's latest checksum; compare it once
+        self.in_desync = False  # A divergence is counted once, not on every tick until it resolves
+        self.echo_ms = 0
+        self.rtt_ms = None
+        self.connected = False
+
+        # Statistics
+        self.ticks = 0
+        self.stalls = 0
+        self.rollbacks = 0
+        self.resimulated_ticks = 0
+        self.max_rollback_depth = 0
+        self.resimulation_time = 0.0
+        self.max_resimulation_time = 0.0
+        self.desyncs = 0
+
+    @property
+    def tick(self):
+        return self.simulation.tick
+
+    def _inputs(self, tick):
+        """Both players' inputs for a tick, predicting the remote one if it has not arrived"""
+        local = self.local_inputs.get(tick, 0)
+        if tick <= self.last_remote_tick:
+            remote = self.remote_inputs[tick]
+        else:
+            remote = self.remote_inputs[self.last_remote_tick]
+            self.predicted[tick] = remote
+        return (local, remote) if self.local_player == 0 else (remote, local)
+
+    def _step(self):
+        """Save the state and simulate the next tick"""
+        tick = self.simulation.tick + 1
+        self.states[tick % len(self.states)] = self.simulation.save_state()
+        self.simulation.step(self._inputs(tick))
+
+    def _receive(self):
+        """
+        Take in the peer's packets.
+
+        Returns:
+            int: First tick simulated with a wrong prediction, or None
+        """
+        first_wrong = None
+        for data in self.peer.receive():
+            packet = decode_packet(data)
+            if packet is None:
+                continue
+            self.connected = True
+            tick = packet.first_tick
+            for bits in packet.inputs:
+                # Inputs are consecutive from the first tick; older ones were received already
+                if tick == self.last_remote_tick + 1:
+                    self.remote_inputs[tick] = bits
+                    self.last_remote_tick = tick
+                    predicted = self.predicted.pop(tick, None)
+                    if predicted is not None and predicted != bits and first_wrong is None:
+                        first_wrong = tick
+                tick += 1
+            self.acked = max(self.acked, packet.ack)
+            if packet.checksum_tick > self.last_compared_tick:
+                self.remote_checksums[packet.checksum_tick] = packet.checksum
+            if packet.echo_ms:
+                sample = (now_ms() - packet.echo_ms) & 0xFFFFFFFF
+                self.rtt_ms = sample if self.rtt_ms is None else self.rtt_ms * 0.9 + sample * 0.1
+            self.echo_ms = packet.send_ms
+        return first_wrong
+
+    def _rollback(self, first_wrong):
+        """Restore the state before first_wrong and simulate up to the current tick again"""
+        current = self.simulation.tick
+        depth = current - first_wrong + 1
+        start = time.perf_counter()
+        with muted(), contextlib.redirect_stdout(None):
+            self.simulation.restore_state(self.states[first_wrong % len(self.states)])
+            for _ in range(depth):
+                self._step()
+        elapsed = time.perf_counter() - start
+        self.rollbacks += 1
+        self.resimulated_ticks += depth
+        self.max_rollback_depth = max(self.max_rollback_depth, depth)
+        self.resimulation_time += elapsed
+        self.max_resimulation_time = max(self.max_resimulation_time, elapsed)
+
+    def _update_checksums(self):
+        """Checksum the newest tick both players' inputs are known for and compare with the peer"""
+        confirmed = min(self.last_remote_tick, self.simulation.tick)
+        if confirmed > self.last_checksum_tick:
+            if confirmed == self.simulation.tick:
+                state = self.simulation.save_state()
+            else:
+                state = self.states[(confirmed + 1) % len(self.states)]
+            self.checksums[confirmed] = self.simulation.checksum(state)
+            self.last_checksum_tick = confirmed
+        for tick in sorted(tick for tick in self.remote_checksums if tick in self.checksums):
+            matches = self.remote_checksums.pop(tick) == self.checksums[tick]
+            if not matches and not self.in_desync:
+                self.desyncs += 1
+                print(f"Desync detected at tick {tick}")
+            self.in_desync = not matches
+            self.last_compared_tick = max(self.last_compared_tick, tick)
+        oldest = self.last_checksum_tick - CHECKSUM_HISTORY
+        for checksums in (self.checksums, self.remote_checksums):
+            for tick in [tick for tick in checksums if tick < oldest]:
+                del checksums[tick]
+
+    def _send(self):
+        """Send every local input the peer has not acknowledged"""
+        first = self.acked + 1
+        last = min(max(self.local_inputs, default=0), first + MAX_INPUTS_PER_PACKET - 1)
+        inputs = [self.local_inputs[tick] for tick in range(first, last + 1)]
+        checksum = self.checksums.get(self.last_checksum_tick, 0)
+        self.peer.send(encode_packet(first, inputs, self.last_remote_tick, self.last_checksum_tick,
+                                     checksum, now_ms(), self.echo_ms))
+
+    def _prune(self):
+        """Forget inputs that are acknowledged and older than any rollback can reach"""
+        oldest_needed = min(self.acked + 1, self.last_remote_tick, self.simulation.tick - self.max_rollback)
+        for tick in range(self.pruned + 1, oldest_needed):
+            self.local_inputs.pop(tick, None)
+            self.remote_inputs.pop(tick, None)
+        self.pruned = max(self.pruned, oldest_needed - 1)
+
+    def advance(self, local_input):
+        """
+        Run one frame: take in the peer's inputs (rolling back if a prediction was
+        wrong), then simulate the next tick with the local input unless too far ahead.
+
+        Args:
+            local_input (int): Input byte sampled this frame (see net.inputs)
+
+        Returns:
+            bool: True if a tick was simulated, False if the session stalled
+        """
+        first_wrong = self._receive()
+        if first_wrong is not None:
+            self._rollback(first_wrong)
+
+        advanced = self.simulation.tick + 1 - self.last_remote_tick <= self.max_rollback
+        if advanced:
+            self.local_inputs[self.simulation.tick + 1 + self.input_delay] = local_input
+            self._step()
+            self.ticks += 1
+        else:
+            self.stalls += 1
+        self._update_checksums()
+        self._send()
+        self._prune()
+        return advanced
+
+    def report(self):
+        average = self.resimulation_time / self.rollbacks * 1000 if self.rollbacks else 0.0
+        rtt = f"{self.rtt_ms:.0f} ms" if self.rtt_ms is not None else "unknown"
+        return (f"Rollback: {self.ticks} ticks, {self.stalls} stalls, input delay {self.input_delay} ticks, "
+                f"RTT {rtt}; {self.rollbacks} rollbacks ({self.resimulated_ticks} ticks resimulated, "
+                f"deepest {self.max_rollback_depth}), resimulation {average:.2f} ms average / "
+                f"{self.max_resimulation_time * 1000:.2f} ms max; {self.desyncs} desyncs")
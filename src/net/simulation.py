@@ -0,0 +1,171 @@
+"""
+Deterministic two-player simulation.
+The world advances one fixed tick at a time from nothing but the two players'
+input bytes: no wall clock (the animations run on the tick count), no random
+numbers and no order that depends on which peer is local. Two peers that
+simulate the same inputs from the same start therefore hold the same state,
+which is what lets the rollback session rewind and replay ticks.
+
+State saved for a rollback is a tuple of the entities' snapshot_state values
+(see utils.snapshot), so saving and restoring never rebuilds an entity.
+"""
+
+import zlib
+
+import pygame
+
+from entities.player import Player
+import entities.player_extension  # Adds Player.apply_knockback
+from entities.enemy import Enemy
+from entities.tile import Tile
+from utils.utils import parse_map
+from utils.levelgeometry import platform_segments, segment_under
+from utils.navigation import PathService
+from utils.lineofsight import LineOfSight
+from .inputs import InputControls
+
+TICK_RATE = 60
+TICK_MS = 1000 / TICK_RATE
+
+PLAYER_COUNT = 2
+
+# Same tuning as the single player loop in main.py
+INVULNERABLE_TICKS = 60
+PATROL_DISTANCES = (150, 200, 250)
+ENEMY_HEIGHT = 64
+
+
+class CoopSimulation:
+    """
+    Two players and the enemies of a level, stepped by input bytes.
+    """
+    def __init__(self, level_map, tile_size, camera):
+        """
+        Build the level and spawn both players and the enemies
+
+        Args:
+            level_map (list): Rows of the map
+            tile_size (int): Size of a map cell in pixels
+            camera (Camera): Camera the entities draw through
+        """
+        self.tick = 0
+        self.tiles, player_spawn, enemy_spawns, self.death_zones = parse_map(level_map, tile_size, Tile)
+        self.level_height = len(level_map) * tile_size
+        spawn_x, spawn_y = player_spawn or (50, 50)
+
+        # Player 2 spawns one cell to the right of player 1
+        self.controls = [InputControls() for _ in range(PLAYER_COUNT)]
+        self.players = []
+        for index, controls in enumerate(self.controls):
+            player = Player(spawn_x + index * tile_size, spawn_y, controls, camera)
+            player.set_clock(self.clock)
+            self.players.append(player)
+        self.invulnerable = [0] * PLAYER_COUNT
+
+        # A fixed list with alive flags instead of a registry: the slots never move,
+        # so a restored state always lines up with the same enemy objects
+        platforms = platform_segments(level_map, tile_size)
+        self.enemies = []
+        for index, (x, y) in enumerate(enemy_spawns):
+            platform = segment_under(platforms, x + tile_size // 2, y)
+            self.enemies.append(Enemy(x, y - ENEMY_HEIGHT, patrol_distance=PATROL_DISTANCES[index % len(PATROL_DISTANCES)],
+                                      platform=platform))
+        self.enemy_alive = [True] * len(self.enemies)
+        if self.enemies:
+            navigator = PathService(level_map, tile_size, *self.enemies[0].navigation_physics())
+            for enemy in self.enemies:
+                enemy.navigator = navigator
+        self.sight = LineOfSight(level_map, tile_size)
+
+    def clock(self):
+        """Simulation time in milliseconds, used by the player animations"""
+        return self.tick * TICK_MS
+
+    @staticmethod
+    def _feet(rect):
+        # Lower middle part of an entity, as in main.py's death zone checks
+        return pygame.Rect(rect.x + rect.width * 0.25, rect.y + rect.height * 0.8,
+                           rect.width * 0.5, rect.height * 0.2)
+
+    def _in_death_zone(self, rect):
+        return self._feet(rect).collidelist(self.death_zones) != -1
+
+    def step(self, inputs):
+        """
+        Advance one tick.
+
+        Args:
+            inputs (sequence): One input byte per player, in player order
+        """
+        self.tick += 1
+        self.sight.begin_tick()
+        for player, controls, bits in zip(self.players, self.controls, inputs):
+            controls.set(bits)
+            player.update(self.tiles)
+            if not player.is_dead and (player.rect.y > self.level_height or self._in_death_zone(player.rect)):
+                player.die()
+
+        for index in range(PLAYER_COUNT):
+            if self.invulnerable[index] > 0:
+                self.invulnerable[index] -= 1
+
+        for slot, enemy in enumerate(self.enemies):
+            if not self.enemy_alive[slot]:
+                continue
+            # Each enemy goes after the closest living player (player 1 on a tie)
+            living = [player for player in self.players if not player.is_dead]
+            target = min(living, key=lambda player: (player.rect.centerx - enemy.rect.centerx) ** 2
+                         + (player.rect.centery - enemy.rect.centery) ** 2, default=None)
+            visible = target is not None and self.sight.can_see(enemy.rect.center, target.rect.center)
+            if not enemy.update(self.tiles, target, visible) or self._in_death_zone(enemy.rect):
+                self.enemy_alive[slot] = False
+                continue
+
+            for index, player in enumerate(self.players):
+                if player.is_dead or self.invulnerable[index] > 0 or not enemy.check_player_collision(player):
+                    continue
+                attacking = enemy.state == "attacking"
+                direction = 1 if player.rect.centerx > enemy.rect.centerx else -1
+                player.apply_knockback(direction, 15 if attacking else 10, -10 if attacking else -8)
+                self.invulnerable[index] = INVULNERABLE_TICKS
+                player.health -= 2 if attacking else 1
+                if player.health <= 0:
+                    player.die()
+
+    def save_state(self):
+        """
+        Everything step reads and writes.
+
+        Returns:
+            tuple: State for restore_state
+        """
+        return (
+            self.tick,
+            tuple(self.invulnerable),
+            tuple(self.enemy_alive),
+            tuple((controls.bits, controls.previous_bits) for controls in self.controls),
+            tuple(player.snapshot_state() for player in self.players),
+            tuple(enemy.snapshot_state() for enemy in self.enemies),
+        )
+
+    def restore_state(self, state):
+        """Go back to a state returned by save_state, in place"""
+        tick, invulnerable, enemy_alive, controls_bits, player_states, enemy_states = state
+        self.tick = tick
+        self.invulnerable[:] = invulnerable
+        self.enemy_alive[:] = enemy_alive
+        for controls, (bits, previous_bits) in zip(self.controls, controls_bits):
+            controls.bits = bits
+            controls.previous_bits = previous_bits
+        for player, values in zip(self.players, player_states):
+            player.restore_state(values)
+        for enemy, values in zip(self.enemies, enemy_states):
+            enemy.restore_state(values)
+
+    @staticmethod
+    def checksum(state):
+        """CRC of a saved state, compared between peers to detect a desync"""
+        return zlib.crc32(repr(state).encode())
+
+    def living_enemies(self):
+        return [enemy for enemy, alive in zip(self.enemies, self.enemy_alive) if alive]
@@ -0,0 +1,222 @@
+"""
+UDP transport for the rollback session.
+Packets are small and self-contained: each one carries every input the peer has
+not acknowledged yet, so a lost packet is repaired by the next one and nothing
+is ever resent on a timer.
+
+LoopbackRelay forwards packets between two local ports with artificial latency,
+jitter and loss, so both peers can run on one machine under network conditions.
+"""
+
+import heapq
+import random
+import select
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+MAGIC = b'MK'
+PROTOCOL_VERSION = 1
+
+# magic, version, input count, first input tick, ack (last tick received from the peer),
+# checksum tick, checksum, send time, echoed peer send time (both in milliseconds)
+HEADER = struct.Struct('!2sBBIIIIII')
+MAX_INPUTS_PER_PACKET = 255
+MAX_PACKET_SIZE = HEADER.size + MAX_INPUTS_PER_PACKET
+
+InputPacket = namedtuple('InputPacket', 'first_tick inputs ack checksum_tick checksum send_ms echo_ms')
+
+
+def now_ms():
+    """Monotonic milliseconds, wrapped to 32 bits like the packet fields"""
+    return int(time.perf_counter() * 1000) & 0xFFFFFFFF
+
+
+def encode_packet(first_tick, inputs, ack, checksum_tick, checksum, send_ms, echo_ms):
+    """
+    Pack an input packet
+
+    Args:
+        first_tick (int): Tick of inputs[0]
+        inputs (sequence): Input bytes of consecutive ticks (at most MAX_INPUTS_PER_PACKET)
+        ack (int): Last consecutive tick received from the peer
+        checksum_tick (int): Confirmed tick the checksum belongs to (0 for none)
+        checksum (int): State checksum at the end of checksum_tick
+        send_ms (int): now_ms() when sending
+        echo_ms (int): send_ms of the last packet received from the peer, for the round trip time
+
+    Returns:
+        bytes: The datagram
+    """
+    return HEADER.pack(MAGIC, PROTOCOL_VERSION, len(inputs), first_tick, ack,
+                       checksum_tick, checksum, send_ms, echo_ms) + bytes(inputs)
+
+
+def decode_packet(data):
+    """
+    Unpack a datagram
+
+    Returns:
+        InputPacket: The packet, or None if the datagram is not a valid input packet
+    """
+    if len(data) < HEADER.size:
+        return None
+    magic, version, count, *fields = HEADER.unpack_from(data)
+    if magic != MAGIC or version != PROTOCOL_VERSION or len(data) != HEADER.size + count:
+        return None
+    first_tick, ack, checksum_tick, checksum, send_ms, echo_ms = fields
+    return InputPacket(first_tick, data[HEADER.size:], ack, checksum_tick, checksum, send_ms, echo_ms)
+
+
+class UdpPeer:
+    """
+    Non-blocking UDP socket talking to one remote address.
+    """
+    def __init__(self, local_address, remote_address=None):
+        """
+        Open the socket
+
+        Args:
+            local_address (tuple): (host, port) to bind, port 0 for any
+            remote_address (tuple, optional): Peer address. Defaults to None: the
+                first address a packet comes from (a host waiting for a peer to join).
+        """
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(local_address)
+        self.socket.setblocking(False)
+        self.remote_address = remote_address
+        self.sent = 0
+        self.received = 0
+
+    @property
+    def address(self):
+        return self.socket.getsockname()
+
+    def send(self, data):
+        if self.remote_address is None:
+            return
+        try:
+            self.socket.sendto(data, self.remote_address)
+            self.sent += 1
+        except OSError:
+            pass  # Full buffer or peer gone: the next packet repeats everything anyway
+
+    def receive(self):
+        """
+        Every datagram waiting from the peer
+
+        Returns:
+            list: Datagrams (bytes), oldest first
+        """
+        datagrams = []
+        while True:
+            try:
+                data, address = self.socket.recvfrom(MAX_PACKET_SIZE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                continue  # e.g. ICMP port unreachable reported for an earlier send
+            if self.remote_address is None:
+                self.remote_address = address
+            elif address != self.remote_address:
+                continue
+            self.received += 1
+            datagrams.append(data)
+        return datagrams
+
+    def close(self):
+        self.socket.close()
+
+
+class LoopbackRelay:
+    """
+    Two local UDP ports that forward to each other with a delay, on a thread.
+    A peer sending to address_a is heard by the peer sending to address_b and the other way round.
+    """
+    def __init__(self, rtt_ms=100, jitter_ms=0, loss=0.0, seed=None, host='127.0.0.1'):
+        """
+        Open the relay ports and start forwarding
+
+        Args:
+            rtt_ms (float, optional): Round trip time added between the peers. Defaults to 100.
+            jitter_ms (float, optional): Random extra delay per packet, 0 to jitter_ms
+                (packets may arrive out of order). Defaults to 0.
+            loss (float, optional): Probability of dropping each packet. Defaults to 0.0.
+            seed (int, optional): Seed of the loss and jitter. Defaults to None.
+            host (str, optional): Interface to bind. Defaults to '127.0.0.1'.
+        """
+        self.delay = rtt_ms / 2000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.sockets = []
+        for _ in range(2):
+            relay_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            relay_socket.bind((host, 0))
+            relay_socket.setblocking(False)
+            self.sockets.append(relay_socket)
+        # Address of the peer behind each port, learnt from its first packet
+        self.peers = [None, None]
+        self.queue = []  # (due time, sequence, outgoing side, data)
+        self.sequence = 0
+        self.forwarded = 0
+        self.dropped = 0
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="loopback-relay", daemon=True)
+        self.thread.start()
+
+    @property
+    def address_a(self):
+        return self.sockets[0].getsockname()
+
+    @property
+    def address_b(self):
+        return self.sockets[1].getsockname()
+
+    def _run(self):
+        while self.running:
+            timeout = 0.005
+            if self.queue:
+                timeout = max(0.0, min(timeout, self.queue[0][0] - time.perf_counter()))
+            readable, _, _ = select.select(self.sockets, [], [], timeout)
+            for side, relay_socket in enumerate(self.sockets):
+                if relay_socket not in readable:
+                    continue
+                while True:
+                    try:
+                        data, address = relay_socket.recvfrom(MAX_PACKET_SIZE)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        continue
+                    self.peers[side] = address
+                    if self.random.random() < self.loss:
+                        self.dropped += 1
+                        continue
+                    due = time.perf_counter() + self.delay + self.random.random() * self.jitter
+                    self.sequence += 1
+                    heapq.heappush(self.queue, (due, self.sequence, 1 - side, data))
+
+            now = time.perf_counter()
+            while self.queue and self.queue[0][0] <= now:
+                _, _, side, data = heapq.heappop(self.queue)
+                if self.peers[side] is None:
+                    self.dropped += 1  # That peer has not said anything yet
+                    continue
+                try:
+                    self.sockets[side].sendto(data, self.peers[side])
+                    self.forwarded += 1
+                except OSError:
+                    self.dropped += 1
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        for relay_socket in self.sockets:
+            relay_socket.close()
+
+    def report(self):
+        return (f"Relay: {self.delay * 2000:.0f} ms RTT, {self.jitter * 1000:.0f} ms jitter, "
+                f"{self.loss:.0%} loss; {self.forwarded} forwarded, {self.dropped} dropped")
@@ -10,6 +10,10 @@ import os
 # Allow running directly
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
+from utils.MAP.map_grid import MapGrid, GridEdit, EditHistory, EXPAND_AMOUNTS
+from utils.MAP.map_overview import MapOverview
+from utils.heatmap import HEATMAP_FILE, overlay_path
+
 class MapEditor:
     def __init__(self, map_data=None, tile_size=32):
         """
@@ -24,7 +28,7 @@ class MapEditor:
         
         # Default empty map if none provided
         if map_data is None:
-            self.map_data = [
+            map_data = [
                 "." * 100,  # Make default map wider
                 "." * 100,
                 "." * 100,
@@ -41,23 +45,36 @@ class MapEditor:
                 "." * 100,
                 "." * 100,
             ]
-        else:
-            self.map_data = map_data.copy()  # Make a copy to avoid modifying original
-            
-        # Calculate dimensions
-        self.map_width = len(self.map_data[0])
-        self.map_height = len(self.map_data)
+
+        # ======================= BYTE GRID STORAGE =======================
+        # Cells live in a mutable byte grid (the original rows are copied, never modified)
+        self.grid = MapGrid.from_rows(map_data)
+
+        # Undo/redo history of compact diffs, and the edit currently being recorded
+        self.history = EditHistory()
+        self.current_edit = None
+
+        # Editing tools: 'brush' paints while dragging, 'rect' fills the dragged
+        # rectangle, 'fill' flood-fills the clicked area
+        self.current_tool = 'brush'
+        self.rect_anchor = None
+        # ===============================================================================
         
         # ======================= IMPROVED SCREEN SETUP =======================
         # Set up display with reasonable window size
+        # The map area sits above the overview pane and a separate UI panel,
+        # so that neither ever covers cells
+        self.ui_height = 48
+        self.overview_height = 88
         self.screen_width = min(self.map_width * self.tile_size, 800)
-        self.screen_height = min(self.map_height * self.tile_size, 600)
+        self.map_area_height = min(self.map_height * self.tile_size, 600)
+        self.screen_height = self.map_area_height + self.overview_height + self.ui_height
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         pygame.display.set_caption("Mage Knight Map Editor")
         
         # Calculate visible dimensions
         self.visible_width = self.screen_width // self.tile_size
-        self.visible_height = self.screen_height // self.tile_size
+        self.visible_height = self.map_area_height // self.tile_size
         # ===============================================================================
         
         # Tile types and their colors
@@ -86,16 +103,73 @@ class MapEditor:
         
         # Font for info display
         self.font = pygame.font.SysFont(None, 24)
+
+        # ======================= DIRTY-REGION RENDERING =======================
+        # Pre-rendered cell surfaces (fill, border and label) per tile type
+        self.background_color = (30, 30, 30)
+        self.tile_glyphs = {}
+        self.build_tile_glyphs()
+
+        # The cell grid region of the screen; scrolling shifts its pixels in place
+        self.cell_area = pygame.Rect(0, 0, self.visible_width * self.tile_size,
+                                     self.visible_height * self.tile_size)
+        self.ui_rect = pygame.Rect(0, self.screen_height - self.ui_height, self.screen_width, self.ui_height)
+
+        # Whole-map overview; clicking it jumps the camera
+        self.overview = MapOverview(
+            pygame.Rect(0, self.map_area_height, self.screen_width, self.overview_height),
+            self.tile_types, self.background_color)
+        self.overview_camera = None  # Camera position the overview outline was drawn for
+
+        # What needs to be redrawn and pushed to the display on the next frame
+        self.full_redraw = True
+        self.dirty_cells = set()  # (map_x, map_y) cells
+        self.dirty_rects = []
+        self.info_text = None
+        self.info_surface = None
+        self.controls_surface = self.font.render(
+            "Arrow/WASD=Scroll | 1-5=Tile | B/R/F=Brush/Rect/Fill | Ctrl+Z/Y=Undo/Redo | +/-=Expand | H=Heat",
+            True, (200, 200, 200))
+        # ===============================================================================
+
+        # ======================= PERFORMANCE HEATMAP OVERLAY =======================
+        # Overlay image exported by the game (utils.heatmap), one pixel per cell
+        self.heatmap = None
+        self.show_heatmap = False
+        self.heatmap_origin = [0, 0]  # Map cell of the overlay's top-left pixel (moves when the map grows)
+        self.heat_glyphs = {}  # Overlay color -> translucent cell surface
+        # ===============================================================================
         
         # ======================= MAP EXPANSION FEATURE =======================
         # Features for expanding the map
         self.can_expand_map = True  # Allow map expansion
         # ===============================================================================
     
+    # ======================= BYTE GRID STORAGE =======================
+    @property
+    def map_data(self):
+        """The map as a list of row strings (built on demand from the grid)"""
+        return self.grid.to_rows()
+
+    @map_data.setter
+    def map_data(self, rows):
+        self.grid = MapGrid.from_rows(rows)
+        self.history.clear()
+        self.full_redraw = True
+
+    @property
+    def map_width(self):
+        return self.grid.width
+
+    @property
+    def map_height(self):
+        return self.grid.height
+    # ===============================================================================
+
     def save_map(self, filename="map.txt"):
         """Save the current map to a file"""
         with open(filename, 'w') as f:
-            for row in self.map_data:
+            for row in self.grid.to_rows():
                 f.write(row + "\n")
         print(f"Map saved to {filename}")
     
@@ -104,12 +178,12 @@ class MapEditor:
         try:
             with open(filename, 'r') as f:
                 self.map_data = [line.strip() for line in f.readlines()]
-            self.map_width = len(self.map_data[0])
-            self.map_height = len(self.map_data)
+            self.clamp_camera()
             
             # Recalculate visible dimensions
             self.visible_width = self.screen_width // self.tile_size
-            self.visible_height = self.screen_height // self.tile_size
+            self.visible_height = self.map_area_height // self.tile_size
+            self.full_redraw = True
             
             print(f"Map loaded from {filename}")
         except Exception as e:
@@ -125,80 +199,320 @@ class MapEditor:
         """
         if not self.can_expand_map:
             return
-            
-        if direction == 'right':
-            # Add 10 columns to the right
-            for i in range(len(self.map_data)):
-                self.map_data[i] = self.map_data[i] + '.' * 10
-        elif direction == 'left':
-            # Add 10 columns to the left
-            for i in range(len(self.map_data)):
-                self.map_data[i] = '.' * 10 + self.map_data[i]
-            # Adjust camera position
-            self.camera_x += 10
-        elif direction == 'down':
-            # Add 5 rows to the bottom
-            for _ in range(5):
-                self.map_data.append('.' * len(self.map_data[0]))
+
+        # Expansion is recorded as a structural edit so it can be undone like any other
+        edit = GridEdit(structure=(direction, EXPAND_AMOUNTS[direction]))
+        self.grid.expand(*edit.structure)
+        self.history.push(edit)
+
+        # Adjust camera position so the view stays on the same cells
+        if direction == 'left':
+            self.camera_x += EXPAND_AMOUNTS['left']
         elif direction == 'up':
-            # Add 5 rows to the top
-            for _ in range(5):
-                self.map_data.insert(0, '.' * len(self.map_data[0]))
-            # Adjust camera position
-            self.camera_y += 5
-            
-        # Update map dimensions
-        self.map_width = len(self.map_data[0])
-        self.map_height = len(self.map_data)
+            self.camera_y += EXPAND_AMOUNTS['up']
+        self.shift_heatmap(edit.structure)
+
+        self.full_redraw = True
         print(f"Map expanded {direction}. New size: {self.map_width}x{self.map_height}")
     # ===============================================================================
     
-    def draw(self):
-        """Draw the map and UI"""
-        self.screen.fill((30, 30, 30))  # Dark gray background
-        
-        # Draw the visible portion of the map
-        for y in range(self.visible_height):
-            map_y = y + self.camera_y
-            if map_y >= self.map_height:
+    # ======================= DIRTY-REGION RENDERING =======================
+    def build_tile_glyphs(self):
+        """Pre-render one cell surface per tile type, including its border and label"""
+        self.tile_glyphs = {}
+        for tile_type in self.tile_types:
+            self.tile_glyphs[tile_type] = self.render_tile_glyph(tile_type)
+
+    def render_tile_glyph(self, tile_type):
+        """Render the surface used for a single cell of the given type"""
+        glyph = pygame.Surface((self.tile_size, self.tile_size)).convert()
+        rect = glyph.get_rect()
+        glyph.fill(self.tile_types.get(tile_type, (50, 50, 50)))
+        pygame.draw.rect(glyph, (50, 50, 50), rect, 1)
+
+        # Draw letter for special tiles
+        if tile_type in ['S', 'E', 'X']:
+            text = self.font.render(tile_type, True, (255, 255, 255))
+            glyph.blit(text, text.get_rect(center=rect.center))
+        return glyph
+
+    def get_tile_glyph(self, tile_type):
+        """Get the cached surface for a tile type, rendering unknown types on first use"""
+        glyph = self.tile_glyphs.get(tile_type)
+        if glyph is None:
+            glyph = self.tile_glyphs[tile_type] = self.render_tile_glyph(tile_type)
+        return glyph
+
+    def mark_cell_dirty(self, map_x, map_y):
+        """Schedule a single map cell for redrawing"""
+        self.dirty_cells.add((map_x, map_y))
+
+    def mark_runs_dirty(self, runs):
+        """Mark (x, y, length) runs dirty, keeping only the part inside the view"""
+        for x, y, length in runs:
+            self.overview.invalidate(x, y, length)
+
+        if len(runs) > self.visible_height * 4:
+            self.full_redraw = True
+            return
+        view_left = self.camera_x
+        view_right = self.camera_x + self.visible_width
+        for x, y, length in runs:
+            if not self.camera_y <= y < self.camera_y + self.visible_height:
                 continue
-                
+            for map_x in range(max(x, view_left), min(x + length, view_right)):
+                self.mark_cell_dirty(map_x, y)
+
+    def set_cell(self, map_x, map_y, tile_type):
+        """Change one map cell (recording it into the current edit) and mark it dirty"""
+        if self.grid.set(map_x, map_y, tile_type, self.current_edit):
+            self.mark_cell_dirty(map_x, map_y)
+            self.overview.invalidate(map_x, map_y)
+
+    def set_camera(self, camera_x, camera_y):
+        """
+        Move the camera. Small moves shift the pixels already on screen and only
+        mark the newly exposed rows and columns dirty.
+        """
+        dx = camera_x - self.camera_x
+        dy = camera_y - self.camera_y
+        if dx == 0 and dy == 0:
+            return
+        self.camera_x = camera_x
+        self.camera_y = camera_y
+
+        if self.full_redraw or abs(dx) >= self.visible_width or abs(dy) >= self.visible_height:
+            self.full_redraw = True
+            return
+
+        # Shift the existing framebuffer instead of redrawing every cell
+        cell_surface = self.screen.subsurface(self.cell_area)
+        cell_surface.scroll(-dx * self.tile_size, -dy * self.tile_size)
+        self.dirty_rects.append(self.cell_area)
+
+        # Cells that scrolled in from the edges
+        exposed_cols = range(self.visible_width - dx, self.visible_width) if dx > 0 else range(0, -dx)
+        exposed_rows = range(self.visible_height - dy, self.visible_height) if dy > 0 else range(0, -dy)
+        for x in exposed_cols:
+            for y in range(self.visible_height):
+                self.mark_cell_dirty(x + camera_x, y + camera_y)
+        for y in exposed_rows:
             for x in range(self.visible_width):
-                map_x = x + self.camera_x
-                if map_x >= self.map_width:
-                    continue
-                    
-                tile_type = self.map_data[map_y][map_x]
-                color = self.tile_types.get(tile_type, (50, 50, 50))
-                
-                rect = pygame.Rect(
-                    x * self.tile_size, 
-                    y * self.tile_size,
-                    self.tile_size, 
-                    self.tile_size
-                )
-                pygame.draw.rect(self.screen, color, rect)
-                pygame.draw.rect(self.screen, (50, 50, 50), rect, 1)
-                
-                # Draw letter for special tiles
-                if tile_type in ['S', 'E', 'X']:
-                    text = self.font.render(tile_type, True, (255, 255, 255))
-                    text_rect = text.get_rect(center=rect.center)
-                    self.screen.blit(text, text_rect)
-        
+                self.mark_cell_dirty(x + camera_x, y + camera_y)
+
+    def draw_cell(self, x, y):
+        """Draw the cell at screen cell position (x, y) and return its screen rect"""
+        rect = pygame.Rect(x * self.tile_size, y * self.tile_size, self.tile_size, self.tile_size)
+        map_x = x + self.camera_x
+        map_y = y + self.camera_y
+        if map_x < self.map_width and map_y < self.map_height:
+            self.screen.blit(self.get_tile_glyph(self.grid.get(map_x, map_y)), rect)
+            if self.show_heatmap:
+                heat_glyph = self.get_heat_glyph(map_x, map_y)
+                if heat_glyph is not None:
+                    self.screen.blit(heat_glyph, rect)
+        else:
+            self.screen.fill(self.background_color, rect)
+        return rect
+
+    def draw(self):
+        """
+        Draw whatever changed since the last frame.
+
+        Returns:
+            list: Screen rects that must be pushed with pygame.display.update
+        """
+        dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+
+        if self.full_redraw:
+            self.screen.fill(self.background_color)  # Dark gray background
+            for y in range(self.visible_height):
+                for x in range(self.visible_width):
+                    self.draw_cell(x, y)
+            self.full_redraw = False
+            self.dirty_cells.clear()
+            self.info_text = None
+            self.overview_camera = None
+            dirty_rects = [self.screen.get_rect()]
+        elif self.dirty_cells:
+            # Redraw only the dirty cells that are currently visible
+            for map_x, map_y in self.dirty_cells:
+                x = map_x - self.camera_x
+                y = map_y - self.camera_y
+                if 0 <= x < self.visible_width and 0 <= y < self.visible_height:
+                    dirty_rects.append(self.draw_cell(x, y))
+            self.dirty_cells.clear()
+
+        # Overview pane: patch changed cells, redraw when cells or the camera moved
+        rebuilt = self.overview.sync(self.grid)
+        updated = self.overview.update()
+        if rebuilt or updated or self.overview_camera != (self.camera_x, self.camera_y):
+            self.overview.draw(self.screen, self.camera_x, self.camera_y,
+                               self.visible_width, self.visible_height)
+            self.overview_camera = (self.camera_x, self.camera_y)
+            dirty_rects.append(self.overview.rect)
+
         # ======================= IMPROVED UI INFORMATION =======================
-        # Draw UI information with more details
+        # Draw UI information with more details, re-rendering text only when it changes
         current_pos = f"Camera: ({self.camera_x}, {self.camera_y}) | "
         map_size = f"Map: {self.map_width}x{self.map_height} | "
-        controls = "Controls: Arrow=Scroll | WASD=Fast Scroll | 1-5=Tile | +/-=Expand Map"
-        
-        info_surface = self.font.render(current_pos + map_size + self.current_tile, True, (255, 255, 255))
-        controls_surface = self.font.render(controls, True, (200, 200, 200))
-        
-        self.screen.blit(info_surface, (10, self.screen_height - 48))
-        self.screen.blit(controls_surface, (10, self.screen_height - 24))
+        info_text = current_pos + map_size + self.current_tile + " | " + self.current_tool
+        if self.show_heatmap:
+            info_text += " | heatmap"
+
+        if info_text != self.info_text:
+            self.info_text = info_text
+            self.info_surface = self.font.render(info_text, True, (255, 255, 255))
+
+            self.screen.fill(self.background_color, self.ui_rect)
+            self.screen.blit(self.info_surface, (10, self.screen_height - 48))
+            self.screen.blit(self.controls_surface, (10, self.screen_height - 24))
+            dirty_rects.append(self.ui_rect)
         # ===============================================================================
+        return dirty_rects
+
+    # ======================= PERFORMANCE HEATMAP OVERLAY =======================
+    def load_heatmap(self, filename=None):
+        """
+        Load an overlay PNG exported by the game (see utils.heatmap)
+
+        Args:
+            filename (str, optional): Overlay image. Defaults to the players' frame cost overlay.
+
+        Returns:
+            bool: True if the overlay was loaded
+        """
+        filename = filename or overlay_path(HEATMAP_FILE)
+        try:
+            self.heatmap = pygame.image.load(filename).convert_alpha()
+        except (pygame.error, FileNotFoundError) as e:
+            print(f"Error loading heatmap: {e}")
+            return False
+        self.heatmap_origin = [0, 0]
+        self.heat_glyphs = {}
+        if self.heatmap.get_size() != (self.map_width, self.map_height):
+            print(f"Heatmap is {self.heatmap.get_width()}x{self.heatmap.get_height()} cells, "
+                  f"map is {self.map_width}x{self.map_height}: it may be for another level")
+        print(f"Heatmap loaded from {filename}")
+        return True
+
+    def toggle_heatmap(self):
+        """Show or hide the heatmap overlay, loading it the first time"""
+        if self.heatmap is None and not self.load_heatmap():
+            return
+        self.show_heatmap = not self.show_heatmap
+        self.full_redraw = True
+
+    def shift_heatmap(self, structure, sign=1):
+        """Keep the overlay on the same cells when the map grows (sign 1) or shrinks (-1) left or up"""
+        direction, amount = structure
+        if direction == 'left':
+            self.heatmap_origin[0] += sign * amount
+        elif direction == 'up':
+            self.heatmap_origin[1] += sign * amount
+
+    def get_heat_glyph(self, map_x, map_y):
+        """Translucent overlay surface for a map cell, or None where nothing was measured"""
+        x = map_x - self.heatmap_origin[0]
+        y = map_y - self.heatmap_origin[1]
+        if not (0 <= x < self.heatmap.get_width() and 0 <= y < self.heatmap.get_height()):
+            return None
+        color = tuple(self.heatmap.get_at((x, y)))
+        if color[3] == 0:
+            return None
+        glyph = self.heat_glyphs.get(color)
+        if glyph is None:
+            glyph = self.heat_glyphs[color] = pygame.Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+            glyph.fill(color)
+        return glyph
+    # ===============================================================================
+
+    def is_idle(self):
+        """Check if nothing can change until the next input event arrives"""
+        return (not any(self.scrolling.values())
+                and not pygame.mouse.get_pressed()[0]
+                and not self.full_redraw
+                and not self.dirty_cells
+                and not self.dirty_rects)
+    # ===============================================================================
     
+    # ======================= EDITING TOOLS AND UNDO =======================
+    def clamp_camera(self):
+        """Keep the camera inside the map after its size changed"""
+        self.set_camera(max(0, min(self.camera_x, self.map_width - self.visible_width)),
+                        max(0, min(self.camera_y, self.map_height - self.visible_height)))
+
+    def begin_edit(self):
+        """Start recording a new undoable edit"""
+        self.finish_edit()
+        self.current_edit = GridEdit()
+
+    def finish_edit(self):
+        """Push the edit being recorded onto the undo history"""
+        if self.current_edit is not None:
+            self.history.push(self.current_edit)
+            self.current_edit = None
+
+    def paint(self, tile_x, tile_y):
+        """Brush tool: paint a single cell"""
+        # Special handling for spawn points (only one allowed)
+        if self.current_tile == 'S' and self.grid.get(tile_x, tile_y) != 'S':
+            # Replace any existing spawn point with empty space
+            for x, y in self.grid.find_all('S'):
+                self.set_cell(x, y, '.')
+
+        # Update the map
+        self.set_cell(tile_x, tile_y, self.current_tile)
+
+    def fill_rect(self, x0, y0, x1, y1):
+        """Rectangle tool: fill every cell between two corners as one edit"""
+        self.begin_edit()
+        self.mark_runs_dirty(self.grid.fill_rect(x0, y0, x1, y1, self.current_tile, self.current_edit))
+        self.finish_edit()
+
+    def flood_fill(self, tile_x, tile_y):
+        """Fill tool: replace the connected area of same-type cells as one edit"""
+        self.begin_edit()
+        self.mark_runs_dirty(self.grid.flood_fill(tile_x, tile_y, self.current_tile, self.current_edit))
+        self.finish_edit()
+
+    def apply_history(self, undo=True):
+        """Undo or redo one edit and redraw what it touched"""
+        self.finish_edit()
+        edit = self.history.undo(self.grid) if undo else self.history.redo(self.grid)
+        if edit is None:
+            return
+        if edit.structure is not None:
+            self.shift_heatmap(edit.structure, -1 if undo else 1)
+            self.clamp_camera()
+            self.full_redraw = True
+        else:
+            width = self.grid.width
+            self.mark_runs_dirty([(index % width, index // width, len(old)) for index, old, _ in edit.runs])
+        print(f"{'Undo' if undo else 'Redo'}: {edit.cell_count()} cells")
+
+    def jump_to(self, map_x, map_y):
+        """Center the camera on a map cell"""
+        self.set_camera(max(0, min(self.map_width - self.visible_width, map_x - self.visible_width // 2)),
+                        max(0, min(self.map_height - self.visible_height, map_y - self.visible_height // 2)))
+
+    def mouse_cell(self, mouse_pos):
+        """
+        Convert a mouse position to map cell coordinates.
+
+        Returns:
+            tuple: (x, y) cell, or None if the position is outside the map
+        """
+        if not self.cell_area.collidepoint(mouse_pos):
+            return None
+        tile_x = mouse_pos[0] // self.tile_size + self.camera_x
+        tile_y = mouse_pos[1] // self.tile_size + self.camera_y
+        if 0 <= tile_x < self.map_width and 0 <= tile_y < self.map_height:
+            return (tile_x, tile_y)
+        return None
+    # ===============================================================================
+
     # ======================= IMPROVED MAP SCROLLING =======================
     def update_scroll(self):
         """Update map scrolling based on current scroll state"""
@@ -222,8 +536,7 @@ class MapEditor:
         
         # Update camera position if it changed
         if new_camera_x != self.camera_x or new_camera_y != self.camera_y:
-            self.camera_x = new_camera_x
-            self.camera_y = new_camera_y
+            self.set_camera(new_camera_x, new_camera_y)
             return True  # Map view changed
             
         return False  # No change
@@ -240,13 +553,22 @@ class MapEditor:
         print("- WASD keys: Scroll the map quickly")
         print("- 1-5: Select different tile types")
         print("- Click: Place selected tile")
+        print("- B/R/F: Brush, rectangle fill and flood fill tools")
+        print("- Ctrl+Z / Ctrl+Y: Undo / redo")
         print("- +/-: Expand map in different directions (Shift+=Right, -=Left, Ctrl+=Down, Ctrl+-=Up)")
         print("- P: Print map data for copy/paste")
         print("- S: Save map")
         print("- L: Load map")
+        print("- H: Show/hide the performance heatmap exported by the game")
         
         while running:
-            for event in pygame.event.get():
+            # Block until something happens when there is nothing to animate or redraw
+            if self.is_idle():
+                events = [pygame.event.wait()] + pygame.event.get()
+            else:
+                events = pygame.event.get()
+
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 
@@ -280,13 +602,13 @@ class MapEditor:
                         
                     # WASD key scrolling - faster scrolling (5 tiles at a time)
                     elif event.key == pygame.K_a:
-                        self.camera_x = max(0, self.camera_x - 5)
+                        self.set_camera(max(0, self.camera_x - 5), self.camera_y)
                     elif event.key == pygame.K_d:
-                        self.camera_x = min(self.map_width - self.visible_width, self.camera_x + 5)
+                        self.set_camera(max(0, min(self.map_width - self.visible_width, self.camera_x + 5)), self.camera_y)
                     elif event.key == pygame.K_w:
-                        self.camera_y = max(0, self.camera_y - 5)
+                        self.set_camera(self.camera_x, max(0, self.camera_y - 5))
                     elif event.key == pygame.K_s:
-                        self.camera_y = min(self.map_height - self.visible_height, self.camera_y + 5)
+                        self.set_camera(self.camera_x, max(0, min(self.map_height - self.visible_height, self.camera_y + 5)))
                     # ===============================================================================
                     
                     # ======================= MAP EXPANSION KEYS =======================
@@ -308,6 +630,21 @@ class MapEditor:
                             self.expand_map('left')  # Default is expand left
                     # ===============================================================================
                     
+                    # ======================= EDITING TOOLS AND UNDO =======================
+                    elif event.key == pygame.K_b:
+                        self.current_tool = 'brush'
+                    elif event.key == pygame.K_r:
+                        self.current_tool = 'rect'
+                    elif event.key == pygame.K_f:
+                        self.current_tool = 'fill'
+                    elif event.key == pygame.K_h:
+                        self.toggle_heatmap()
+                    elif event.key == pygame.K_z and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                        self.apply_history(undo=True)
+                    elif event.key == pygame.K_y and pygame.key.get_mods() & pygame.KMOD_CTRL:
+                        self.apply_history(undo=False)
+                    # ===============================================================================
+
                     # Save/Load
                     elif event.key == pygame.K_s and pygame.key.get_mods() & pygame.KMOD_CTRL:
                         self.save_map()
@@ -318,7 +655,7 @@ class MapEditor:
                     elif event.key == pygame.K_p and pygame.key.get_mods() & pygame.KMOD_CTRL:
                         print("Map data for copy/paste:")
                         print("LEVEL_MAP = [")
-                        for row in self.map_data:
+                        for row in self.grid.to_rows():
                             print(f'    "{row}",')
                         print("]")
                         
@@ -332,36 +669,53 @@ class MapEditor:
                         self.scrolling["up"] = False
                     elif event.key == pygame.K_DOWN:
                         self.scrolling["down"] = False
+
+                # ======================= EDITING TOOLS AND UNDO =======================
+                # Spawn points are always placed with the brush (only one is allowed)
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.overview.rect.collidepoint(event.pos):
+                    overview_cell = self.overview.cell_at(event.pos)
+                    if overview_cell:
+                        self.jump_to(*overview_cell)
+
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    cell = self.mouse_cell(event.pos)
+                    tool = 'brush' if self.current_tile == 'S' else self.current_tool
+                    if tool == 'brush':
+                        self.begin_edit()
+                    elif cell and tool == 'rect':
+                        self.rect_anchor = cell
+                    elif cell and tool == 'fill':
+                        self.flood_fill(*cell)
+
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                    cell = self.mouse_cell(event.pos)
+                    if self.rect_anchor and cell:
+                        self.fill_rect(*self.rect_anchor, *cell)
+                    self.rect_anchor = None
+                    self.finish_edit()
+                # ===============================================================================
             
             # ======================= IMPROVED MOUSE HANDLING =======================
             # Handle mouse input for placing tiles
             mouse_buttons = pygame.mouse.get_pressed()
-            if mouse_buttons[0]:  # Left mouse button
-                mouse_pos = pygame.mouse.get_pos()
-                tile_x = mouse_pos[0] // self.tile_size + self.camera_x
-                tile_y = mouse_pos[1] // self.tile_size + self.camera_y
-                
-                if 0 <= tile_x < self.map_width and 0 <= tile_y < self.map_height:
-                    # Special handling for spawn points (only one allowed)
-                    if self.current_tile == 'S':
-                        # Remove any existing spawn points
-                        for y in range(self.map_height):
-                            row = self.map_data[y]
-                            if 'S' in row:
-                                # Replace S with empty space
-                                index = row.index('S')
-                                self.map_data[y] = row[:index] + '.' + row[index+1:]
-                    
-                    # Update the map
-                    row = self.map_data[tile_y]
-                    self.map_data[tile_y] = row[:tile_x] + self.current_tile + row[tile_x+1:]
+            if mouse_buttons[0] and self.current_edit is not None:  # Left mouse button, brush stroke
+                cell = self.mouse_cell(pygame.mouse.get_pos())
+                if cell:
+                    self.paint(*cell)
+            elif mouse_buttons[0]:
+                # Dragging on the overview keeps moving the camera
+                overview_cell = self.overview.cell_at(pygame.mouse.get_pos())
+                if overview_cell:
+                    self.jump_to(*overview_cell)
             # ===============================================================================
                     
             # Update continuous scrolling
             self.update_scroll()
             
-            self.draw()
-            pygame.display.flip()
+            # Push only the regions that changed
+            dirty_rects = self.draw()
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
             clock.tick(60)
         
         pygame.quit()
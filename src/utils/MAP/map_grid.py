@@ -0,0 +1,308 @@
+"""
+Mutable cell storage for the map editor.
+The map is kept in a single row-major bytearray with one byte per cell, so
+single cell writes are O(1) and rectangle / flood fills run as slice operations.
+Edits can be recorded as compact diffs (runs of old bytes) for undo and redo.
+"""
+
+# How many cells +/- expansion adds in each direction
+EXPAND_AMOUNTS = {'left': 10, 'right': 10, 'up': 5, 'down': 5}
+
+
+class GridEdit:
+    """
+    One undoable change to a MapGrid.
+
+    Cell changes are stored as runs of (start index, old bytes, new byte).
+    Structural changes (map expansion) are stored as (direction, amount).
+    """
+    __slots__ = ('runs', 'structure')
+
+    def __init__(self, structure=None):
+        self.runs = []
+        self.structure = structure
+
+    def __bool__(self):
+        return bool(self.runs) or self.structure is not None
+
+    def add_run(self, index, old, new_value):
+        """Record that cells[index:index+len(old)] changed from old to new_value"""
+        self.runs.append((index, bytes(old), new_value))
+
+    def cell_count(self):
+        """Number of cells touched by this edit"""
+        return sum(len(old) for _, old, _ in self.runs)
+
+
+class MapGrid:
+    """
+    2D grid of single-character cells backed by a bytearray.
+    """
+    def __init__(self, width, height, fill='.'):
+        """
+        Create an empty grid
+
+        Args:
+            width (int): Number of columns
+            height (int): Number of rows
+            fill (str, optional): Character used for every cell. Defaults to '.'.
+        """
+        self.width = width
+        self.height = height
+        self.cells = bytearray(fill.encode('ascii') * (width * height))
+
+    @classmethod
+    def from_rows(cls, rows, fill='.'):
+        """
+        Build a grid from a list of strings, padding short rows with the fill character.
+
+        Args:
+            rows (list): Map rows as strings
+            fill (str, optional): Padding character. Defaults to '.'.
+
+        Returns:
+            MapGrid: The new grid
+        """
+        width = max((len(row) for row in rows), default=0)
+        grid = cls(0, 0, fill)
+        grid.width = width
+        grid.height = len(rows)
+        grid.cells = bytearray(b''.join(row.ljust(width, fill).encode('ascii') for row in rows))
+        return grid
+
+    def to_rows(self):
+        """Return the map as a list of strings (for saving and printing)"""
+        return [self.row(y) for y in range(self.height)]
+
+    def row(self, y):
+        """Return row y as a string"""
+        start = y * self.width
+        return self.cells[start:start + self.width].decode('ascii')
+
+    def index(self, x, y):
+        """Flat index of cell (x, y)"""
+        return y * self.width + x
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get(self, x, y):
+        """Get the character at (x, y)"""
+        return chr(self.cells[y * self.width + x])
+
+    def set(self, x, y, tile_type, edit=None):
+        """
+        Set a single cell in O(1).
+
+        Args:
+            x (int): Column
+            y (int): Row
+            tile_type (str): Single character tile type
+            edit (GridEdit, optional): Edit to record the change into. Defaults to None.
+
+        Returns:
+            bool: True if the cell actually changed
+        """
+        index = y * self.width + x
+        value = ord(tile_type)
+        old = self.cells[index]
+        if old == value:
+            return False
+        if edit is not None:
+            edit.add_run(index, bytes((old,)), value)
+        self.cells[index] = value
+        return True
+
+    def find_all(self, tile_type):
+        """
+        Find every cell of a type.
+
+        Returns:
+            list: (x, y) positions
+        """
+        positions = []
+        value = tile_type.encode('ascii')
+        index = self.cells.find(value)
+        while index != -1:
+            positions.append((index % self.width, index // self.width))
+            index = self.cells.find(value, index + 1)
+        return positions
+
+    def _fill_run(self, index, length, value, edit):
+        """Overwrite a horizontal run of cells with one slice assignment"""
+        if edit is not None:
+            edit.add_run(index, self.cells[index:index + length], value)
+        self.cells[index:index + length] = bytes((value,)) * length
+
+    def fill_rect(self, x0, y0, x1, y1, tile_type, edit=None):
+        """
+        Fill the rectangle between two corner cells (inclusive, any order).
+
+        Returns:
+            list: (x, y, length) runs that were written
+        """
+        left, right = max(0, min(x0, x1)), min(self.width - 1, max(x0, x1))
+        top, bottom = max(0, min(y0, y1)), min(self.height - 1, max(y0, y1))
+        if left > right or top > bottom:
+            return []
+        value = ord(tile_type)
+        length = right - left + 1
+
+        runs = []
+        for y in range(top, bottom + 1):
+            self._fill_run(y * self.width + left, length, value, edit)
+            runs.append((left, y, length))
+        return runs
+
+    def flood_fill(self, x, y, tile_type, edit=None):
+        """
+        Replace the 4-connected area of same-type cells around (x, y).
+
+        Uses a scanline fill over a byte mask of the target type, so every span
+        is found with bytearray.find/rfind and written with one slice assignment.
+
+        Returns:
+            list: (x, y, length) runs that were written
+        """
+        if not self.in_bounds(x, y):
+            return []
+        target = self.cells[self.index(x, y)]
+        value = ord(tile_type)
+        if target == value:
+            return []
+
+        # 1 where a cell can still be filled, 0 elsewhere
+        table = bytearray(256)
+        table[target] = 1
+        mask = bytearray(self.cells.translate(table))
+
+        width = self.width
+        runs = []
+        seeds = [(x, y)]
+        while seeds:
+            seed_x, seed_y = seeds.pop()
+            row_start = seed_y * width
+            index = row_start + seed_x
+            if not mask[index]:
+                continue
+
+            # Extend the span left and right to the nearest non-target cells
+            left = mask.rfind(b'\x00', row_start, index) + 1
+            if left == 0:
+                left = row_start
+            right = mask.find(b'\x00', index, row_start + width)
+            if right == -1:
+                right = row_start + width
+
+            length = right - left
+            mask[left:right] = bytes(length)
+            self._fill_run(left, length, value, edit)
+            runs.append((left - row_start, seed_y, length))
+
+            # Queue one seed per fillable span in the rows above and below
+            for next_y in (seed_y - 1, seed_y + 1):
+                if 0 <= next_y < self.height:
+                    offset = (next_y - seed_y) * width
+                    position = mask.find(b'\x01', left + offset, right + offset)
+                    while position != -1:
+                        seeds.append((position - next_y * width, next_y))
+                        end = mask.find(b'\x00', position, right + offset)
+                        if end == -1:
+                            break
+                        position = mask.find(b'\x01', end, right + offset)
+        return runs
+
+    def expand(self, direction, amount, fill='.'):
+        """
+        Add empty rows or columns on one side of the map.
+        A new bytearray is built so views held on the old one stay valid.
+        """
+        pad = fill.encode('ascii')
+        if direction in ('left', 'right'):
+            padding = pad * amount
+            rows = (self.cells[y * self.width:(y + 1) * self.width] for y in range(self.height))
+            if direction == 'right':
+                self.cells = bytearray(b''.join(row + padding for row in rows))
+            else:
+                self.cells = bytearray(b''.join(padding + row for row in rows))
+            self.width += amount
+        elif direction == 'down':
+            self.cells = self.cells + pad * (amount * self.width)
+            self.height += amount
+        elif direction == 'up':
+            self.cells = pad * (amount * self.width) + self.cells
+            self.height += amount
+
+    def shrink(self, direction, amount):
+        """Remove rows or columns from one side of the map (the inverse of expand)"""
+        if direction in ('left', 'right'):
+            new_width = self.width - amount
+            start = amount if direction == 'left' else 0
+            rows = (self.cells[y * self.width + start:y * self.width + start + new_width]
+                    for y in range(self.height))
+            self.cells = bytearray(b''.join(rows))
+            self.width = new_width
+        elif direction == 'down':
+            self.cells = self.cells[:(self.height - amount) * self.width]
+            self.height -= amount
+        elif direction == 'up':
+            self.cells = self.cells[amount * self.width:]
+            self.height -= amount
+
+
+class EditHistory:
+    """
+    Undo/redo stacks of GridEdit diffs.
+    """
+    def __init__(self, limit=500):
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def push(self, edit):
+        """Record a finished edit; empty edits are ignored"""
+        if not edit:
+            return
+        self.undo_stack.append(edit)
+        if len(self.undo_stack) > self.limit:
+            del self.undo_stack[0]
+        self.redo_stack.clear()
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def undo(self, grid):
+        """
+        Revert the most recent edit.
+
+        Returns:
+            GridEdit: The reverted edit, or None if there was nothing to undo
+        """
+        if not self.undo_stack:
+            return None
+        edit = self.undo_stack.pop()
+        if edit.structure is not None:
+            grid.shrink(*edit.structure)
+        for index, old, _ in reversed(edit.runs):
+            grid.cells[index:index + len(old)] = old
+        self.redo_stack.append(edit)
+        return edit
+
+    def redo(self, grid):
+        """
+        Re-apply the most recently undone edit.
+
+        Returns:
+            GridEdit: The re-applied edit, or None if there was nothing to redo
+        """
+        if not self.redo_stack:
+            return None
+        edit = self.redo_stack.pop()
+        if edit.structure is not None:
+            grid.expand(*edit.structure)
+        for index, old, new_value in edit.runs:
+            grid.cells[index:index + len(old)] = bytes((new_value,)) * len(old)
+        self.undo_stack.append(edit)
+        return edit
+
@@ -0,0 +1,146 @@
+"""
+Overview (minimap) pane for the map editor.
+The whole map is rendered straight from the MapGrid bytes: the cell buffer is
+wrapped as an 8-bit palettized surface whose palette maps each cell character
+to its tile color, so the cell type -> color lookup is done by SDL, not by a
+per-cell Python loop. That surface is then downscaled into the pane.
+"""
+
+import pygame
+
+
+class MapOverview:
+    """
+    Downsampled view of the entire map with the editor camera outlined on top.
+    """
+    def __init__(self, rect, tile_types, background_color=(30, 30, 30), unknown_color=(50, 50, 50)):
+        """
+        Initialize the overview pane
+
+        Args:
+            rect (pygame.Rect): Screen area reserved for the pane
+            tile_types (dict): Tile character -> color
+            background_color (tuple, optional): Pane background. Defaults to (30, 30, 30).
+            unknown_color (tuple, optional): Color for characters not in tile_types. Defaults to (50, 50, 50).
+        """
+        self.rect = pygame.Rect(rect)
+        self.background_color = background_color
+
+        # 256-entry palette indexed by the cell byte
+        self.palette = [unknown_color] * 256
+        for tile_type, color in tile_types.items():
+            self.palette[ord(tile_type)] = color
+
+        self.grid = None
+        self.buffer = None
+        self.source = None  # Full resolution palettized view of the grid bytes
+        self.image = None  # Downscaled overview
+        self.image_rect = pygame.Rect(0, 0, 0, 0)
+        self.dirty_bounds = None  # (left, top, right, bottom) in cells, exclusive
+
+    def sync(self, grid):
+        """
+        Rebuild the overview if the grid's buffer or size changed since the last build.
+
+        Returns:
+            bool: True if the overview was rebuilt
+        """
+        if grid is self.grid and grid.cells is self.buffer and self.source is not None \
+                and self.source.get_size() == (grid.width, grid.height):
+            return False
+        self.grid = grid
+        self.rebuild()
+        return True
+
+    def rebuild(self):
+        """Build the full overview from the current grid"""
+        grid = self.grid
+        self.buffer = grid.cells
+        self.dirty_bounds = None
+        if grid.width == 0 or grid.height == 0:
+            self.source = None
+            self.image = None
+            return
+
+        # Zero-copy: the surface reads the grid bytes directly
+        self.source = pygame.image.frombuffer(grid.cells, (grid.width, grid.height), 'P')
+        self.source.set_palette(self.palette)
+
+        # Fit the map into the pane, keeping its aspect ratio
+        scale = min((self.rect.width - 8) / grid.width, (self.rect.height - 8) / grid.height)
+        size = (max(1, int(grid.width * scale)), max(1, int(grid.height * scale)))
+        self.image = pygame.transform.scale(self.source, size)
+        self.image_rect = self.image.get_rect(center=self.rect.center)
+
+    def invalidate(self, x, y, length=1):
+        """Record that a horizontal run of cells changed"""
+        if self.dirty_bounds is None:
+            self.dirty_bounds = (x, y, x + length, y + 1)
+        else:
+            left, top, right, bottom = self.dirty_bounds
+            self.dirty_bounds = (min(left, x), min(top, y), max(right, x + length), max(bottom, y + 1))
+
+    def update(self):
+        """
+        Re-render only the overview pixels covering changed cells.
+
+        Returns:
+            bool: True if anything was updated
+        """
+        if self.dirty_bounds is None or self.image is None:
+            return False
+        left, top, right, bottom = self.dirty_bounds
+        self.dirty_bounds = None
+
+        grid_w, grid_h = self.grid.width, self.grid.height
+        image_w, image_h = self.image.get_size()
+
+        # Overview pixels whose cells intersect the dirty area
+        px_left = left * image_w // grid_w
+        px_top = top * image_h // grid_h
+        px_right = min(image_w, -(-right * image_w // grid_w))
+        px_bottom = min(image_h, -(-bottom * image_h // grid_h))
+        if px_right <= px_left or px_bottom <= px_top:
+            return False
+
+        # The cells those pixels were sampled from
+        cell_left = px_left * grid_w // image_w
+        cell_top = px_top * grid_h // image_h
+        cell_right = max(cell_left + 1, px_right * grid_w // image_w)
+        cell_bottom = max(cell_top + 1, px_bottom * grid_h // image_h)
+
+        region = self.source.subsurface((cell_left, cell_top, cell_right - cell_left, cell_bottom - cell_top))
+        patch = pygame.transform.scale(region, (px_right - px_left, px_bottom - px_top))
+        self.image.blit(patch, (px_left, px_top))
+        return True
+
+    def draw(self, surface, camera_x, camera_y, visible_width, visible_height):
+        """Draw the pane with the camera viewport outlined"""
+        surface.fill(self.background_color, self.rect)
+        if self.image is None:
+            return
+        surface.blit(self.image, self.image_rect)
+
+        grid_w, grid_h = self.grid.width, self.grid.height
+        image_w, image_h = self.image.get_size()
+        view = pygame.Rect(
+            self.image_rect.x + camera_x * image_w // grid_w,
+            self.image_rect.y + camera_y * image_h // grid_h,
+            max(2, visible_width * image_w // grid_w),
+            max(2, visible_height * image_h // grid_h),
+        )
+        pygame.draw.rect(surface, (255, 255, 0), view.clip(self.image_rect.inflate(2, 2)), 1)
+
+    def cell_at(self, pos):
+        """
+        Convert a screen position inside the overview to a map cell.
+
+        Returns:
+            tuple: (x, y) cell, or None if the position is outside the overview image
+        """
+        if self.image is None or not self.image_rect.collidepoint(pos):
+            return None
+        image_w, image_h = self.image.get_size()
+        x = (pos[0] - self.image_rect.x) * self.grid.width // image_w
+        y = (pos[1] - self.image_rect.y) * self.grid.height // image_h
+        return (x, y)
@@ -5,15 +5,15 @@ supporting variable frame counts, sizes, and timing information from JSON files.
 """
 
 import pygame
-import json
 import os
-from .utils import load_image
+from .atlas import get_atlas
+from .assetbake import frame_number, load_aseprite as load_baked_aseprite
 
 class Animation:
     """
     Represents a single animation with multiple frames and timing information.
     """
-    def __init__(self, name, frames, durations=None, loop=True):
+    def __init__(self, name, frames, durations=None, loop=True, source=None, metadata_source=None):
         """
         Initialize an animation
 
@@ -22,8 +22,12 @@ class Animation:
             frames (list): List of pygame surfaces representing animation frames
             durations (list, optional): List of frame durations in milliseconds. Defaults to None.
             loop (bool, optional): Whether the animation should loop. Defaults to True.
+            source (str, optional): Atlas group the frames came from. Defaults to None.
+            metadata_source (str, optional): Aseprite JSON the frames were sliced with. Defaults to None.
         """
         self.name = name
+        self.source = source
+        self.metadata_source = metadata_source
         self.frames = frames
         self.frame_count = len(frames)
         
@@ -52,9 +56,22 @@ class Animation:
         Returns:
             tuple: (frame surface, is_animation_complete)
         """
+        index, is_complete = self.get_frame_index_at_time(elapsed_time)
+        return self.frames[index], is_complete
+
+    def get_frame_index_at_time(self, elapsed_time):
+        """
+        Get the index of the frame to display at a given elapsed time.
+        
+        Args:
+            elapsed_time (float): Elapsed time in milliseconds
+            
+        Returns:
+            tuple: (frame index, is_animation_complete)
+        """
         # Handle completion for non-looping animations
         if not self.loop and elapsed_time >= self.total_duration:
-            return self.frames[-1], True
+            return self.frame_count - 1, True
         
         # For looping animations, wrap around the elapsed time
         if self.loop:
@@ -65,10 +82,10 @@ class Animation:
         for i, duration in enumerate(self.durations):
             current_time += duration
             if elapsed_time < current_time:
-                return self.frames[i], False
+                return i, False
         
         # Failsafe - return the last frame
-        return self.frames[-1], False
+        return self.frame_count - 1, False
 
 
 class AnimationPlayer:
@@ -84,7 +101,7 @@ class AnimationPlayer:
         self.is_playing = False
         self.flip_x = False
         self.flip_y = False
-        self.scaled_frames = {}  # Cache for scaled frames
+        self.scaled_frames = {}  # Scaled/flipped frame lists by (animation, scale, flip)
         self.scale_factor = (1.0, 1.0)  # (width_factor, height_factor)
     
     def load_aseprite_animation(self, image_path, json_path=None, animation_name=None):
@@ -101,16 +118,6 @@ class AnimationPlayer:
         Returns:
             bool: True if loaded successfully, False otherwise
         """
-        # ======================= IMPROVED IMAGE LOADING WITH DETAILED DEBUGGING =======================
-        # Load the sprite sheet image with better debug info
-        sprite_sheet = load_image(image_path)
-        if sprite_sheet is None:
-            print(f"Error: Failed to load sprite sheet: {image_path}")
-            return False
-        
-        # Print the image dimensions for debugging
-        img_width, img_height = sprite_sheet.get_size()
-        print(f"Loaded sprite sheet: {image_path} - Size: {img_width}x{img_height}")
         # If json_path is not provided, try to infer it from image_path
         if json_path is None:
             base_path = os.path.splitext(image_path)[0]
@@ -119,124 +126,49 @@ class AnimationPlayer:
         # If animation_name is not provided, use the filename without extension
         if animation_name is None:
             animation_name = os.path.basename(os.path.splitext(image_path)[0])
-        
-        # Try to load and parse the JSON metadata
-        frames = []
-        frame_durations = []
-        
-        try:
-            # Get the absolute path of the JSON file
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            json_path_abs = os.path.join(base_dir, '../assets', json_path)
-            
-            if not os.path.exists(json_path_abs):
-                # Try relative path as well
-                json_path_abs = json_path
-                
-            with open(json_path_abs, 'r') as f:
-                json_data = json.load(f)
-                
-            # Check if this is an Aseprite JSON file
-            if "frames" not in json_data or "meta" not in json_data:
-                raise ValueError("Not a valid Aseprite JSON file format")
-                
-            # Get frame data
-            frame_data = json_data["frames"]
-            meta_data = json_data["meta"]
-            
-            # Sort the frames by their number if they have numeric suffixes
-            sorted_frames = sorted(frame_data.items(), key=lambda x: self._extract_frame_number(x[0]))
-            
-            # Extract frames and durations with better error reporting
-            for name, data in sorted_frames:
-                try:
-                    # Extract frame rectangle
-                    frame_rect = pygame.Rect(
-                        data["frame"]["x"],
-                        data["frame"]["y"],
-                        data["frame"]["w"],
-                        data["frame"]["h"]
-                    )
-                    
-                    # Debug the frame rect
-                    print(f"Frame {name}: rect={frame_rect}, sprite_sheet={sprite_sheet.get_size()}")
-                    
-                    # Validate rectangle is within image bounds before extracting
-                    if (frame_rect.right <= sprite_sheet.get_width() and 
-                        frame_rect.bottom <= sprite_sheet.get_height()):
-                        # Extract the frame from the sprite sheet
-                        frame_surface = sprite_sheet.subsurface(frame_rect)
-                        frames.append(frame_surface)
-                        
-                        # Get frame duration
-                        duration = data.get("duration", 100)  # Default to 100ms if not specified
-                        frame_durations.append(duration)
-                    else:
-                        print(f"Warning: Frame rect {frame_rect} is outside the sprite sheet bounds {sprite_sheet.get_size()}")
-                except Exception as e:
-                    print(f"Error extracting frame '{name}': {e}")
-            
-            print(f"Loaded animation '{animation_name}' with {len(frames)} frames")
-            
-            # Create the animation object
-            self.animations[animation_name] = Animation(
-                name=animation_name,
-                frames=frames,
-                durations=frame_durations,
-                loop=True  # Default to looping, can be changed later
-            )
-            
-            return True
-            
-        except (FileNotFoundError, json.JSONDecodeError, ValueError) as e:
-            print(f"Error loading JSON metadata: {e}")
-            
-            # Fallback to creating a simple animation from the sprite sheet
-            # Try to determine if it's a horizontal or vertical sprite sheet
-            width, height = sprite_sheet.get_size()
-            frame_size = min(width, height)
-            
-            if width > height:
-                # Horizontal sprite sheet
-                num_frames = width // height
-                frame_height = height
-                frame_width = height
-                
-                for i in range(num_frames):
-                    frame_rect = pygame.Rect(i * frame_width, 0, frame_width, frame_height)
-                    try:
-                        frame = sprite_sheet.subsurface(frame_rect)
-                        frames.append(frame)
-                    except ValueError:
-                        break
-            else:
-                # Vertical sprite sheet or single frame
-                num_frames = height // width
-                frame_width = width
-                frame_height = width
-                
-                for i in range(num_frames):
-                    frame_rect = pygame.Rect(0, i * frame_height, frame_width, frame_height)
-                    try:
-                        frame = sprite_sheet.subsurface(frame_rect)
-                        frames.append(frame)
-                    except ValueError:
-                        break
-            
-            if len(frames) == 0:
-                # If we couldn't extract any frames, just use the whole image as a single frame
-                frames = [sprite_sheet]
-            
-            print(f"Created fallback animation '{animation_name}' with {len(frames)} frames")
-            
-            # Create a simple animation with default timing
+
+        # ======================= TEXTURE ATLAS =======================
+        # Sheets already packed by another instance are reused without touching the disk
+        atlas = get_atlas()
+        group_name = image_path
+        group = atlas.get_group(group_name)
+        if group is not None:
             self.animations[animation_name] = Animation(
                 name=animation_name,
-                frames=frames,
-                loop=True
+                frames=group.frames,
+                durations=list(group.meta) if group.meta else None,
+                loop=True,
+                source=group_name,
+                metadata_source=json_path
             )
-            
             return True
+        # ===============================================================================
+
+        # ======================= BAKED SHEET LOADING =======================
+        # Slicing (from the JSON, or square frames if it is missing or invalid) is done
+        # by the asset baker; an up to date bake is loaded without decoding the sheet
+        baked = load_baked_aseprite(image_path, json_path)
+        if baked is None:
+            print(f"Error: Failed to load sprite sheet: {image_path}")
+            return False
+
+        durations = baked.durations
+        print(f"Loaded animation '{animation_name}' with {len(baked.frames)} frames")
+
+        # Pack the frames into the atlas; the baked blob is dropped
+        frames = atlas.add_group(group_name, baked.frames, meta=tuple(durations) if durations else None)
+        
+        # Create the animation object
+        self.animations[animation_name] = Animation(
+            name=animation_name,
+            frames=frames,
+            durations=list(durations) if durations else None,
+            loop=True,  # Default to looping, can be changed later
+            source=group_name,
+            metadata_source=json_path
+        )
+        return True
+        # ===============================================================================
     
     def _extract_frame_number(self, frame_name):
         """
@@ -249,12 +181,7 @@ class AnimationPlayer:
         Returns:
             int: The extracted frame number, or 0 if none found
         """
-        import re
-        # Try to extract a number from the frame name
-        match = re.search(r'(\d+)', frame_name)
-        if match:
-            return int(match.group(1))
-        return 0
+        return frame_number(frame_name)
     
     def add_animation(self, name, frames, durations=None, loop=True):
         """
@@ -318,9 +245,7 @@ class AnimationPlayer:
             self.flip_x = flip_x
         if flip_y is not None:
             self.flip_y = flip_y
-            
-        # Clear scaled frames cache when flipping changes
-        self.scaled_frames = {}
+        # The frame cache is keyed by flip state, so nothing has to be cleared here
     
     def set_scale(self, width_factor, height_factor=None):
         """
@@ -332,11 +257,8 @@ class AnimationPlayer:
         """
         height_factor = height_factor if height_factor is not None else width_factor
         
-        # Only update and clear cache if scale actually changed
-        if self.scale_factor != (width_factor, height_factor):
-            self.scale_factor = (width_factor, height_factor)
-            # Clear cache when scale changes
-            self.scaled_frames = {}
+        # The frame cache is keyed by scale, so nothing has to be cleared here
+        self.scale_factor = (width_factor, height_factor)
     
     def update(self):
         """
@@ -368,42 +290,65 @@ class AnimationPlayer:
         elapsed = frame_time if frame_time is not None else (current_time - self.start_time)
         
         # Get the current frame
-        frame, is_complete = self.current_animation.get_frame_at_time(elapsed)
+        index, is_complete = self.current_animation.get_frame_index_at_time(elapsed)
         
         # Stop non-looping animations when complete
         if is_complete and not self.current_animation.loop:
             self.is_playing = False
         
         # ======================= FIXED FLIPPING AND SCALING =======================
-        # Apply scaling and flipping - create a unique key for caching
-        cache_key = (id(frame), self.scale_factor[0], self.scale_factor[1], self.flip_x, self.flip_y)
-        
-        # Check if we've already processed this frame
-        if cache_key not in self.scaled_frames:
-            # Process the frame
-            processed_frame = frame
-            
-            # Apply scaling if needed
-            if self.scale_factor != (1.0, 1.0):
-                width = int(frame.get_width() * self.scale_factor[0])
-                height = int(frame.get_height() * self.scale_factor[1])
-                processed_frame = pygame.transform.scale(frame, (width, height))
-            
-            # Apply flipping if needed - using explicit flags for clarity
-            if self.flip_x or self.flip_y:
-                processed_frame = pygame.transform.flip(processed_frame, self.flip_x, self.flip_y)
-            
-            # Cache the processed frame
-            self.scaled_frames[cache_key] = processed_frame
-        
-        # Get the processed frame from cache
-        processed_frame = self.scaled_frames[cache_key]
+        # Scaled and flipped frames are built once per animation and packed into the
+        # atlas, where every player of the same sheet shares them
+        cache_key = (self.current_animation_name, self.scale_factor, self.flip_x, self.flip_y)
+        frames = self.scaled_frames.get(cache_key)
+        if frames is None:
+            frames = self.scaled_frames[cache_key] = self._process_frames(self.current_animation)
+        processed_frame = frames[index]
         # ===============================================================================
         
         # Draw the frame
         surface.blit(processed_frame, position)
         return True
     
+    def _process_frames(self, animation):
+        """
+        Apply the current scale and flip to every frame of an animation.
+
+        Returns:
+            list: Processed frames (the original frames if nothing needs to change)
+        """
+        if self.scale_factor == (1.0, 1.0) and not self.flip_x and not self.flip_y:
+            return animation.frames
+
+        def build():
+            # Sheets loaded through the baker get their scaled (and flipped) frames baked too
+            if animation.metadata_source is not None and not self.flip_y:
+                baked = load_baked_aseprite(animation.source, animation.metadata_source, self.scale_factor)
+                if baked is not None and len(baked.frames) == animation.frame_count:
+                    return baked.variants['flip_x' if self.flip_x else 'normal']
+
+            processed = []
+            for frame in animation.frames:
+                processed_frame = frame
+                
+                # Apply scaling if needed
+                if self.scale_factor != (1.0, 1.0):
+                    width = int(frame.get_width() * self.scale_factor[0])
+                    height = int(frame.get_height() * self.scale_factor[1])
+                    processed_frame = pygame.transform.scale(frame, (width, height))
+                
+                # Apply flipping if needed - using explicit flags for clarity
+                if self.flip_x or self.flip_y:
+                    processed_frame = pygame.transform.flip(processed_frame, self.flip_x, self.flip_y)
+                processed.append(processed_frame)
+            return processed
+
+        if animation.source is None:
+            return build()
+        group_name = (f"{animation.source}@{self.scale_factor[0]:.4f}x{self.scale_factor[1]:.4f}"
+                      f"{'/flip_x' if self.flip_x else ''}{'/flip_y' if self.flip_y else ''}")
+        return get_atlas().get_or_add_group(group_name, build)
+    
     def get_size(self):
         """
         Get the size of the current animation frame.
@@ -0,0 +1,337 @@
+"""
+Offline asset baking.
+Sprite sheets (plain strips and Aseprite PNG + JSON pairs) are sliced, scaled and
+flipped once and written to a cache folder as raw RGBA pixel blobs with a small
+JSON index. Later launches read the blob and wrap every frame with
+pygame.image.frombuffer instead of decoding, slicing and scaling the sheet again.
+
+Bakes are keyed by a hash of the source files, so editing a sheet or its JSON
+rebakes it automatically on the next load and the stale bake is deleted.
+
+Run from the src folder to bake everything the game uses ahead of time:
+    python -m utils.assetbake [--force] [--clean]
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+
+import pygame
+
+from .utils import get_file_path, FILETYPE
+
+# Bump when the blob layout or the slicing rules change to invalidate every bake
+BAKE_VERSION = 1
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '../.bakecache')
+
+# Orientation variants stored in every bake
+VARIANTS = ('normal', 'flip_x')
+
+# Bakes already read this run, by spec
+_loaded_bakes = {}
+
+
+class BakedSheet:
+    """
+    Frames of one baked sheet, per orientation.
+    """
+    def __init__(self, variants, durations=None, key=None):
+        self.variants = variants  # 'normal' / 'flip_x' -> list of surfaces
+        self.durations = durations  # Frame durations in milliseconds (Aseprite sheets only)
+        self.key = key
+
+    @property
+    def frames(self):
+        return self.variants['normal']
+
+
+def frame_number(frame_name):
+    """
+    Extract the frame number from a frame name like "walk 0.ase" or "frame_001".
+
+    Returns:
+        int: The first number in the name, or 0 if there is none
+    """
+    match = re.search(r'(\d+)', frame_name)
+    if match:
+        return int(match.group(1))
+    return 0
+
+
+# ======================= SLICING =======================
+def strip_rects(sheet_size, frame_size, frame_count):
+    """Frame rects of a horizontal strip"""
+    frame_w, frame_h = frame_size
+    return [pygame.Rect(i * frame_w, 0, frame_w, frame_h) for i in range(frame_count)
+            if (i + 1) * frame_w <= sheet_size[0] and frame_h <= sheet_size[1]]
+
+
+def aseprite_rects(sheet_size, json_data):
+    """
+    Frame rects and durations from Aseprite JSON data.
+
+    Returns:
+        tuple: (rects, durations)
+
+    Raises:
+        ValueError: If the data is not in the Aseprite format
+    """
+    if "frames" not in json_data or "meta" not in json_data:
+        raise ValueError("Not a valid Aseprite JSON file format")
+
+    rects = []
+    durations = []
+    sheet_rect = pygame.Rect((0, 0), sheet_size)
+    for name, data in sorted(json_data["frames"].items(), key=lambda item: frame_number(item[0])):
+        frame = data["frame"]
+        rect = pygame.Rect(frame["x"], frame["y"], frame["w"], frame["h"])
+        if not sheet_rect.contains(rect):
+            print(f"Warning: Frame rect {rect} is outside the sprite sheet bounds {sheet_size}")
+            continue
+        rects.append(rect)
+        durations.append(data.get("duration", 100))  # Default to 100ms if not specified
+    return rects, durations
+
+
+def square_rects(sheet_size):
+    """Fallback slicing for sheets without JSON: square frames along the longer side"""
+    width, height = sheet_size
+    if width > height:
+        rects = [pygame.Rect(i * height, 0, height, height) for i in range(width // height)]
+    else:
+        rects = [pygame.Rect(0, i * width, width, width) for i in range(height // width)]
+    return rects or [pygame.Rect(0, 0, width, height)]
+# ===============================================================================
+
+
+# ======================= BAKING =======================
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _bake_name(spec, content):
+    """Cache file stem: readable source name, spec hash and source content hash"""
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', os.path.splitext(spec['image'])[0]).strip('_')
+    spec_id = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:10]
+    digest = hashlib.sha1(str(BAKE_VERSION).encode())
+    for data in content:
+        digest.update(b'\0' if data is None else data)
+    return f"{slug}.{spec_id}", digest.hexdigest()[:16]
+
+
+def _to_bytes(surface):
+    tobytes = getattr(pygame.image, 'tobytes', None) or pygame.image.tostring
+    return tobytes(surface, 'RGBA')
+
+
+def bake(spec, image_data, json_data):
+    """
+    Slice, scale and flip a sheet.
+
+    Works without a display, so it can run from the command line.
+
+    Args:
+        spec (dict): What to bake ('image', optional 'json', 'frame_size', 'frame_count', 'scale')
+        image_data (bytes): Contents of the sheet image
+        json_data (bytes): Contents of the Aseprite JSON, or None
+
+    Returns:
+        tuple: (blob bytes, index dict)
+    """
+    sheet = pygame.image.load(io.BytesIO(image_data), spec['image'])
+    sheet_size = sheet.get_size()
+
+    durations = None
+    if spec.get('frame_size'):
+        rects = strip_rects(sheet_size, spec['frame_size'], spec['frame_count'])
+    else:
+        try:
+            if json_data is None:
+                raise FileNotFoundError(spec.get('json'))
+            rects, durations = aseprite_rects(sheet_size, json.loads(json_data))
+        except (FileNotFoundError, ValueError, KeyError, TypeError) as e:
+            print(f"Error loading JSON metadata for {spec['image']}: {e}")
+            rects = square_rects(sheet_size)
+
+    scale_x, scale_y = spec.get('scale', (1, 1))
+    chunks = []
+    offset = 0
+    variants = {variant: [] for variant in VARIANTS}
+    for rect in rects:
+        frame = sheet.subsurface(rect)
+        if (scale_x, scale_y) != (1, 1):
+            frame = pygame.transform.scale(frame, (int(rect.width * scale_x), int(rect.height * scale_y)))
+        for variant in VARIANTS:
+            image = pygame.transform.flip(frame, True, False) if variant == 'flip_x' else frame
+            pixels = _to_bytes(image)
+            chunks.append(pixels)
+            variants[variant].append((offset, image.get_width(), image.get_height()))
+            offset += len(pixels)
+
+    index = {'version': BAKE_VERSION, 'spec': spec, 'variants': variants, 'durations': durations}
+    return b''.join(chunks), index
+
+
+def _write_atomic(path, data):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _remove_stale(stem, key):
+    """Delete bakes of the same spec made from older versions of the sources"""
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(stem + '.') and not name.startswith(f"{stem}.{key}."):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+
+
+def get_bake(spec, force=False):
+    """
+    Get the baked blob and index for a spec, baking it if there is no up to date bake.
+    Safe to call from a worker thread (see utils.loader); results are kept in memory
+    so the main thread does not read the files again.
+
+    Returns:
+        tuple: (blob bytes, index dict), or None if the source image does not exist
+    """
+    spec_key = json.dumps(spec, sort_keys=True)
+    if not force and spec_key in _loaded_bakes:
+        return _loaded_bakes[spec_key]
+    baked = _get_bake(spec, force)
+    _loaded_bakes[spec_key] = baked
+    return baked
+
+
+def _get_bake(spec, force):
+    image_data = _read(get_file_path(spec['image'], FILETYPE.IMAGE))
+    if image_data is None:
+        print(f"WARNING: Image file not found: {spec['image']}")
+        return None
+    json_data = _read(get_file_path(spec['json'], FILETYPE.IMAGE)) if spec.get('json') else None
+
+    stem, key = _bake_name(spec, (image_data, json_data))
+    blob_path = os.path.join(CACHE_DIR, f"{stem}.{key}.bin")
+    index_path = os.path.join(CACHE_DIR, f"{stem}.{key}.json")
+
+    if not force:
+        blob = _read(blob_path)
+        index_data = _read(index_path)
+        if blob is not None and index_data is not None:
+            try:
+                return blob, json.loads(index_data)
+            except ValueError:
+                pass  # Corrupt index: rebake
+
+    blob, index = bake(spec, image_data, json_data)
+    index['key'] = key
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _write_atomic(blob_path, blob)
+        _write_atomic(index_path, json.dumps(index, separators=(',', ':')).encode())
+        _remove_stale(stem, key)
+    except OSError as e:
+        print(f"Could not write baked sheet {stem}: {e}")
+    return blob, index
+
+
+def _load(spec):
+    baked = get_bake(spec)
+    if baked is None:
+        return None
+    blob, index = baked
+    view = memoryview(blob)
+    variants = {}
+    for variant, frames in index['variants'].items():
+        variants[variant] = [pygame.image.frombuffer(view[offset:offset + width * height * 4], (width, height), 'RGBA')
+                             for offset, width, height in frames]
+    return BakedSheet(variants, index.get('durations'), index.get('key'))
+# ===============================================================================
+
+
+# ======================= LOADING =======================
+def load_strip(image_path, frame_size, frame_count, scale=1):
+    """
+    Load a horizontal strip of equally sized frames, scaled by an integer factor.
+
+    Returns:
+        BakedSheet: The frames, or None if the image does not exist
+    """
+    return _load({'image': image_path, 'frame_size': list(frame_size),
+                  'frame_count': frame_count, 'scale': [scale, scale]})
+
+
+def load_aseprite(image_path, json_path=None, scale=(1.0, 1.0)):
+    """
+    Load an Aseprite sheet, falling back to square frames if the JSON is missing or invalid.
+
+    Returns:
+        BakedSheet: The frames and durations, or None if the image does not exist
+    """
+    return _load({'image': image_path, 'json': json_path, 'scale': list(scale)})
+# ===============================================================================
+
+
+# Sheets the game loads at startup, baked ahead of time by the command line tool
+BAKE_MANIFEST = [
+    {'image': 'images/player/Normal-Idle.png', 'frame_size': [16, 16], 'frame_count': 6, 'scale': [4, 4]},
+    {'image': 'images/player/Normal-Moving.png', 'frame_size': [16, 16], 'frame_count': 6, 'scale': [4, 4]},
+    {'image': 'images/player/Demon-Idle.png', 'frame_size': [16, 16], 'frame_count': 6, 'scale': [4, 4]},
+    {'image': 'images/player/Demon-Moving.png', 'frame_size': [16, 16], 'frame_count': 6, 'scale': [4, 4]},
+    {'image': 'images/sword/Sword-Idle.png', 'frame_size': [16, 16], 'frame_count': 6, 'scale': [2, 2]},
+    {'image': 'images/sword/Sword-Attack.png', 'frame_size': [16, 16], 'frame_count': 6, 'scale': [2, 2]},
+    {'image': 'images/Enemy/Enemy0/enemy0_walking.png', 'json': 'images/Enemy/Enemy0/enemy0_walking.json',
+     'scale': [1.0, 1.0]},
+    {'image': 'images/Enemy/Enemy0/enemy0_walking.png', 'json': 'images/Enemy/Enemy0/enemy0_walking.json',
+     'scale': [64 / 72, 64 / 88]},
+    {'image': 'images/Enemy/Enemy0/enemy0_attacking.png', 'json': 'images/Enemy/Enemy0/enemy0_attacking.json',
+     'scale': [1.0, 1.0]},
+    {'image': 'images/Enemy/Enemy0/enemy0_attacking.png', 'json': 'images/Enemy/Enemy0/enemy0_attacking.json',
+     'scale': [64 / 72, 64 / 88]},
+]
+
+
+def main(args):
+    """Bake every sheet in the manifest and report how long baking and loading take"""
+    if '--clean' in args and os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            os.remove(os.path.join(CACHE_DIR, name))
+        print(f"Cleared {os.path.abspath(CACHE_DIR)}")
+
+    force = '--force' in args
+    total_bake = total_load = 0.0
+    for spec in BAKE_MANIFEST:
+        start = time.perf_counter()
+        baked = get_bake(spec, force=force)
+        bake_time = time.perf_counter() - start
+        if baked is None:
+            continue
+        start = time.perf_counter()
+        _load(spec)
+        load_time = time.perf_counter() - start
+        total_bake += bake_time
+        total_load += load_time
+        blob, index = baked
+        print(f"{spec['image']} x{spec['scale'][0]:.3f}: {len(index['variants']['normal'])} frames, "
+              f"{len(blob) // 1024} KiB, bake/check {bake_time * 1000:.1f} ms, load {load_time * 1000:.1f} ms")
+    print(f"Total: bake/check {total_bake * 1000:.1f} ms, load {total_load * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,253 @@
+"""
+Runtime texture atlas.
+Sprite frames, tiles and effect images are packed into a few large display-format
+pages at load time. Pages come in three kinds (opaque, colorkey, per-pixel alpha,
+see utils.displayformat) so every frame is drawn with the cheapest blit that keeps
+its look. Every frame is addressed by an AtlasRegion (page index + rect)
+and handed out as a subsurface of its page, so drawing a frame reads from the
+shared page and the original sprite sheets can be dropped after packing.
+"""
+
+from collections import namedtuple
+
+import pygame
+
+from .assetbake import load_strip as load_baked_strip
+from .displayformat import alpha_kind, widest_kind, COLORKEY, COLORKEY_ALPHA, PER_PIXEL_ALPHA
+
+# Where a packed frame lives: index into TextureAtlas.pages and the rect on that page
+AtlasRegion = namedtuple('AtlasRegion', ['page', 'rect'])
+
+
+class AtlasGroup:
+    """
+    A named list of frames packed into the atlas (one animation, one tile, ...).
+    """
+    def __init__(self, name, frames, regions, meta=None):
+        self.name = name
+        self.frames = frames  # Subsurfaces of the atlas pages
+        self.regions = regions  # AtlasRegion per frame
+        self.meta = meta  # Optional data stored with the frames, e.g. frame durations
+
+
+class TextureAtlas:
+    """
+    Shelf packer that fills fixed-size pages with frames.
+    """
+    def __init__(self, page_size=(1024, 1024), padding=1):
+        """
+        Initialize an empty atlas
+
+        Args:
+            page_size (tuple, optional): Size of each page. Defaults to (1024, 1024).
+            padding (int, optional): Empty pixels kept around every frame. Defaults to 1.
+        """
+        self.page_size = page_size
+        self.padding = padding
+        self.pages = []
+        self.page_kinds = []  # Per page: alpha kind of the frames it holds
+        self.shelves = []  # Per page: list of [y, height, next_x]
+        self.page_heights = []  # Per page: y where the next shelf would start
+        self.groups = {}
+        self.used_area = 0
+        self.frame_count = 0
+
+    def _new_page(self, size, kind):
+        if kind == PER_PIXEL_ALPHA:
+            page = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+            page.fill((0, 0, 0, 0))
+        else:
+            page = pygame.Surface(size).convert()
+            if kind == COLORKEY_ALPHA:
+                page.fill(COLORKEY)
+        self.pages.append(page)
+        self.page_kinds.append(kind)
+        self.shelves.append([])
+        self.page_heights.append(0)
+        return len(self.pages) - 1
+
+    def _allocate(self, width, height, kind):
+        """
+        Find space for a width x height frame (padding included) on a page of the given kind.
+
+        Returns:
+            AtlasRegion: Where the frame goes
+        """
+        padded_w = width + self.padding * 2
+        padded_h = height + self.padding * 2
+        page_w, page_h = self.page_size
+
+        # Frames larger than a page get a page of their own
+        if padded_w > page_w or padded_h > page_h:
+            page = self._new_page((padded_w, padded_h), kind)
+            self.page_heights[page] = padded_h
+            return AtlasRegion(page, pygame.Rect(self.padding, self.padding, width, height))
+
+        # Best fitting existing shelf with room left
+        best = None
+        for page, shelves in enumerate(self.shelves):
+            if self.pages[page].get_size() != self.page_size or self.page_kinds[page] != kind:
+                continue
+            for shelf in shelves:
+                if shelf[1] >= padded_h and page_w - shelf[2] >= padded_w:
+                    if best is None or shelf[1] < best[1][1]:
+                        best = (page, shelf)
+        if best is None:
+            # Open a new shelf on the first page with enough height left
+            for page, shelves in enumerate(self.shelves):
+                if self.pages[page].get_size() == self.page_size and self.page_kinds[page] == kind \
+                        and page_h - self.page_heights[page] >= padded_h:
+                    break
+            else:
+                page = self._new_page(self.page_size, kind)
+            shelf = [self.page_heights[page], padded_h, 0]
+            self.shelves[page].append(shelf)
+            self.page_heights[page] += padded_h
+            best = (page, shelf)
+
+        page, shelf = best
+        rect = pygame.Rect(shelf[2] + self.padding, shelf[0] + self.padding, width, height)
+        shelf[2] += padded_w
+        return AtlasRegion(page, rect)
+
+    def add_group(self, name, surfaces, meta=None):
+        """
+        Pack a list of surfaces under a name. Adding an existing name returns the packed group.
+
+        Args:
+            name (str): Group name, e.g. the sprite sheet path
+            surfaces (list): Frames to copy into the atlas
+            meta (optional): Extra data to keep with the group. Defaults to None.
+
+        Returns:
+            list: The packed frames (subsurfaces of atlas pages), in the original order
+        """
+        if name in self.groups:
+            return self.groups[name].frames
+
+        # All frames of a group share one page kind, so animations never switch blit paths
+        kind = widest_kind(alpha_kind(surface) for surface in surfaces)
+
+        # Pack tallest first for tighter shelves, but keep the caller's order
+        regions = [None] * len(surfaces)
+        order = sorted(range(len(surfaces)), key=lambda i: surfaces[i].get_height(), reverse=True)
+        for i in order:
+            surface = surfaces[i]
+            region = self._allocate(*surface.get_size(), kind)
+            page = self.pages[region.page]
+            if kind == PER_PIXEL_ALPHA:
+                page.blit(surface, region.rect, special_flags=pygame.BLEND_RGBA_MAX)
+            else:
+                # Transparent pixels of binary alpha frames leave the colorkey behind
+                page.blit(surface, region.rect)
+            regions[i] = region
+            self.used_area += region.rect.width * region.rect.height
+        self.frame_count += len(surfaces)
+
+        frames = [self.pages[region.page].subsurface(region.rect) for region in regions]
+        if kind == COLORKEY_ALPHA:
+            for frame in frames:
+                frame.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        self.groups[name] = AtlasGroup(name, frames, regions, meta)
+        return frames
+
+    def get_group(self, name):
+        """
+        Look up a packed group.
+
+        Returns:
+            AtlasGroup: The group, or None if nothing was packed under that name
+        """
+        return self.groups.get(name)
+
+    def get_or_add_group(self, name, build, meta=None):
+        """
+        Return the frames of a group, building and packing them on first use.
+
+        Args:
+            name (str): Group name
+            build (callable): Returns the list of surfaces to pack; only called once
+            meta (optional): Extra data to keep with the group. Defaults to None.
+
+        Returns:
+            list: The packed frames
+        """
+        group = self.groups.get(name)
+        if group is not None:
+            return group.frames
+        return self.add_group(name, build(), meta)
+
+    def load_strip(self, name, image_path, frame_size, frame_count, scale=1):
+        """
+        Load a horizontal strip of equally sized frames, scale them and pack them.
+        The frames come from the asset bake cache, so the sheet is only decoded and
+        scaled when its bake is missing or stale. The horizontally flipped frames are
+        packed as well, under name + '/flip_x'.
+
+        Args:
+            name (str): Group name
+            image_path (str): Path of the strip image, relative to the assets folder
+            frame_size (tuple): (width, height) of one frame in the sheet
+            frame_count (int): Number of frames in the strip
+            scale (int, optional): Integer scale applied to every frame. Defaults to 1.
+
+        Returns:
+            list: The packed frames
+        """
+        group = self.groups.get(name)
+        if group is not None:
+            return group.frames
+
+        baked = load_baked_strip(image_path, frame_size, frame_count, scale)
+        if baked is None:
+            # Fallback: plain white frames
+            frame = pygame.Surface((frame_size[0] * scale, frame_size[1] * scale))
+            frame.fill((255, 255, 255))
+            return self.add_group(name, [frame] * frame_count)
+
+        self.add_group(name + '/flip_x', baked.variants['flip_x'])
+        return self.add_group(name, baked.frames)
+
+    def clear(self):
+        """Drop every page, e.g. before loading a different level"""
+        self.pages.clear()
+        self.page_kinds.clear()
+        self.shelves.clear()
+        self.page_heights.clear()
+        self.groups.clear()
+        self.used_area = 0
+        self.frame_count = 0
+
+    def occupancy(self):
+        """Fraction of the total page area covered by frames"""
+        total = sum(page.get_width() * page.get_height() for page in self.pages)
+        return self.used_area / total if total else 0.0
+
+    def report(self):
+        """
+        Describe the atlas layout.
+
+        Returns:
+            str: Pages, shelves and occupancy, one line per page
+        """
+        lines = [f"Texture atlas: {len(self.groups)} groups, {self.frame_count} frames, "
+                 f"{len(self.pages)} pages, {self.occupancy():.1%} occupied"]
+        for index, page in enumerate(self.pages):
+            used = sum(region.rect.width * region.rect.height
+                       for group in self.groups.values() for region in group.regions if region.page == index)
+            width, height = page.get_size()
+            lines.append(f"  page {index} ({self.page_kinds[index]}): {width}x{height}, {len(self.shelves[index])} shelves, "
+                         f"{self.page_heights[index]}px tall used, {used / (width * height):.1%} occupied")
+        return "\n".join(lines)
+
+
+# Atlas shared by every entity of the current level
+_atlas = None
+
+
+def get_atlas():
+    """Get the shared atlas, creating it on first use"""
+    global _atlas
+    if _atlas is None:
+        _atlas = TextureAtlas()
+    return _atlas
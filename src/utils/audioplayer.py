@@ -1,18 +1,42 @@
 import pygame
+from contextlib import contextmanager
+
+# Decoded sounds by file path, so each file is only decoded once
+_sounds = {}
+
+# While above zero, play_audio_clip does nothing (see muted)
+_mute_depth = 0
+
+@contextmanager
+def muted():
+    """Silence sound effects inside a with block, e.g. while a rollback replays past ticks"""
+    global _mute_depth
+    _mute_depth += 1
+    try:
+        yield
+    finally:
+        _mute_depth -= 1
+
+def preload_sound(file_path, sound):
+    """Register a sound decoded ahead of time (see utils.loader)"""
+    _sounds[file_path] = sound
+
+def get_sound(file_path):
+    """Get the decoded sound for a file, decoding it on first use"""
+    sound = _sounds.get(file_path)
+    if sound is None:
+        sound = _sounds[file_path] = pygame.mixer.Sound(file_path)
+    return sound
 
 def play_audio_clip(file_path, channel=1):
-    # Load the audio file
-    pygame.mixer.music.load(file_path)
-    
-    # Play the audio file
-    pygame.mixer.Channel(channel).play(pygame.mixer.Sound(file_path))
+    if _mute_depth:
+        return
+    # Play the (cached) audio file
+    pygame.mixer.Channel(channel).play(get_sound(file_path))
     
 def play_background_music(file_path):
-    # Load the audio file
-    pygame.mixer.music.load(file_path)
-    
-    # Play the audio file in an infinite loop
-    pygame.mixer.Channel(0).play(pygame.mixer.Sound(file_path), loops=-1)
+    # Play the (cached) audio file in an infinite loop
+    pygame.mixer.Channel(0).play(get_sound(file_path), loops=-1)
 
 
 # Example usage
@@ -0,0 +1,381 @@
+"""
+Non-blocking frame capture.
+A captured frame is copied into one of a few preallocated surfaces and handed
+to a writer thread; the game loop never encodes or writes anything itself. When
+the writer falls behind and every buffer is in use, frames are dropped rather
+than waiting for one.
+
+The writer encodes PNGs itself with zlib (see encode_png): pygame.image.save
+holds the GIL for the whole encode, which would stall the game loop anyway,
+while zlib compresses with the GIL released.
+
+Two modes, toggled from main.py:
+    recording   every frame, as a PNG sequence or one raw frame file
+                (RAW_EXTENSION, see write_raw_header / read_raw_frames)
+    hitches     the last frames are kept in a small ring; when a frame takes
+                longer than hitch_ms, it is written with its neighbours and a
+                frames.json of frame times, ready to attach to a bug report
+
+Captures go to the captures folder. Convert a raw recording to PNGs from the src folder:
+    python -m utils.capture convert RECORDING.mkraw [OUT_FOLDER]
+"""
+
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import pygame
+
+CAPTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '../captures')
+
+PNG = 'png'
+RAW = 'raw'
+
+# Raw recordings: a header, then per frame a record header and the RGB pixels
+RAW_EXTENSION = '.mkraw'
+RAW_MAGIC = b'MKRF'
+RAW_VERSION = 1
+RAW_HEADER = struct.Struct('<4sHHH')  # magic, version, width, height
+RAW_RECORD = struct.Struct('<Id')  # frame number, frame time in milliseconds
+
+# zlib level of captured PNGs: fast, frames are large and written continuously
+PNG_COMPRESSION = 1
+
+# Longest hitch clip in frames, for when every frame hitches
+MAX_CLIP_FRAMES = 60
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+def encode_png(surface, level=PNG_COMPRESSION):
+    """
+    Encode a surface as an RGB PNG. Only the pixel copy holds the GIL; the compression
+    (almost all of the time) runs in parallel with the game loop.
+
+    Returns:
+        bytes: The PNG file
+    """
+    width, height = surface.get_size()
+    pixels = pygame.image.tobytes(surface, 'RGB')
+    stride = width * 3
+    # Filter type 0 (none) in front of every row
+    rows = b''.join(b'\x00' + pixels[offset:offset + stride] for offset in range(0, len(pixels), stride))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)  # 8 bit RGB
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header)
+            + _png_chunk(b'IDAT', zlib.compress(rows, level)) + _png_chunk(b'IEND', b''))
+
+
+def write_raw_header(f, size):
+    f.write(RAW_HEADER.pack(RAW_MAGIC, RAW_VERSION, *size))
+
+
+def read_raw_frames(path):
+    """
+    Read a raw recording
+
+    Yields:
+        tuple: (frame number, frame time in ms, pygame.Surface)
+    """
+    with open(path, 'rb') as f:
+        magic, version, width, height = RAW_HEADER.unpack(f.read(RAW_HEADER.size))
+        if magic != RAW_MAGIC or version != RAW_VERSION:
+            raise ValueError(f"{path} is not a version {RAW_VERSION} raw recording")
+        frame_bytes = width * height * 3
+        while True:
+            record = f.read(RAW_RECORD.size)
+            pixels = f.read(frame_bytes)
+            if len(record) < RAW_RECORD.size or len(pixels) < frame_bytes:
+                return
+            frame, frame_ms = RAW_RECORD.unpack(record)
+            yield frame, frame_ms, pygame.image.frombytes(pixels, (width, height), 'RGB')
+
+
+class FramePool:
+    """
+    Preallocated frame surfaces shared by the game loop and the writer thread.
+    """
+    def __init__(self, size, count):
+        self.free = queue.SimpleQueue()
+        for _ in range(count):
+            self.free.put(pygame.Surface(size))
+        self.count = count
+
+    def acquire(self):
+        """A free surface, or None if the writer holds all of them"""
+        try:
+            return self.free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, surface):
+        self.free.put(surface)
+
+
+class FrameWriter(threading.Thread):
+    """
+    Background thread writing the frames and files it is handed, in order.
+    """
+    def __init__(self, pool):
+        super().__init__(name="frame-writer", daemon=True)
+        self.pool = pool
+        self.jobs = queue.SimpleQueue()
+        self.raw_files = {}
+        self.written = 0
+        self.write_time = 0.0
+        self.start()
+
+    def write_frame(self, surface, path, frame=0, frame_ms=0.0):
+        """Queue a pooled surface; it goes back to the pool once written"""
+        self.jobs.put(('frame', surface, path, frame, frame_ms))
+
+    def write_json(self, path, data):
+        self.jobs.put(('json', None, path, data, None))
+
+    def finish(self, path):
+        """Close a raw recording once every frame queued before has been written"""
+        self.jobs.put(('close', None, path, None, None))
+
+    def stop(self):
+        """Write everything queued, then end the thread"""
+        self.jobs.put(None)
+        self.join()
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            kind, surface, path, data, frame_ms = job
+            start = time.perf_counter()
+            try:
+                if kind == 'frame':
+                    self._write_frame(surface, path, data, frame_ms)
+                elif kind == 'json':
+                    with open(path, 'w') as f:
+                        json.dump(data, f, indent=1)
+                elif kind == 'close':
+                    raw_file = self.raw_files.pop(path, None)
+                    if raw_file is not None:
+                        raw_file.close()
+            except (OSError, pygame.error) as e:
+                print(f"Frame capture could not write {path}: {e}")
+            finally:
+                if surface is not None:
+                    self.pool.release(surface)
+            self.write_time += time.perf_counter() - start
+        for raw_file in self.raw_files.values():
+            raw_file.close()
+        self.raw_files.clear()
+
+    def _write_frame(self, surface, path, frame, frame_ms):
+        if path.endswith(RAW_EXTENSION):
+            raw_file = self.raw_files.get(path)
+            if raw_file is None:
+                raw_file = self.raw_files[path] = open(path, 'wb')
+                write_raw_header(raw_file, surface.get_size())
+            raw_file.write(RAW_RECORD.pack(frame, frame_ms))
+            raw_file.write(pygame.image.tobytes(surface, 'RGB'))
+        else:
+            with open(path, 'wb') as f:
+                f.write(encode_png(surface))
+        self.written += 1
+
+
+class FrameCapture:
+    """
+    Recording and hitch capture of the frames shown by the game.
+    """
+    def __init__(self, size, out_dir=CAPTURE_DIR, pool_size=8, frame_format=PNG,
+                 hitch_ms=1000 / 60 * 1.5, hitch_context=2):
+        """
+        Preallocate the buffers and start the writer thread
+
+        Args:
+            size (tuple): Size of the captured surface (the back buffer)
+            out_dir (str, optional): Folder for captures. Defaults to the captures folder.
+            pool_size (int, optional): Frames that can wait for the writer. Defaults to 8.
+            frame_format (str, optional): PNG or RAW for recordings (hitches are PNGs). Defaults to PNG.
+            hitch_ms (float, optional): Frame time counted as a hitch. Defaults to 1.5 frames at 60 FPS.
+            hitch_context (int, optional): Frames written before and after a hitch. Defaults to 2.
+        """
+        self.size = tuple(size)
+        self.out_dir = out_dir
+        self.frame_format = frame_format
+        self.hitch_ms = hitch_ms
+        self.hitch_context = hitch_context
+        self.pool = FramePool(self.size, pool_size)
+        self.writer = FrameWriter(self.pool)
+
+        self.frame = 0
+        self.last_time = None
+        self.recording = None  # Folder or raw file of the current recording
+        self.recording_frame = 0
+
+        # Hitch capture: the last frames (preallocated, not from the pool) and the clip being written
+        self.hitches_enabled = False
+        self.ring = [pygame.Surface(self.size) for _ in range(hitch_context + 1)]
+        self.ring_frames = [None] * len(self.ring)  # (frame number, frame time) per ring slot
+        self.clip = None  # {'folder', 'frames', 'remaining'} while frames after a hitch are still due
+
+        # Statistics
+        self.captured = 0
+        self.dropped = 0
+        self.hitches = 0
+        self.capture_time = 0.0
+        self.max_capture_time = 0.0
+        self.frames_timed = 0
+
+    def _folder(self, prefix):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        folder = os.path.join(self.out_dir, f"{prefix}-{stamp}-{self.frame}")
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def start_recording(self):
+        folder = self._folder("recording")
+        self.recording = os.path.join(folder, "recording" + RAW_EXTENSION) if self.frame_format == RAW else folder
+        self.recording_frame = 0
+        print(f"Recording to {self.recording}")
+
+    def stop_recording(self):
+        if self.recording is None:
+            return
+        if self.recording.endswith(RAW_EXTENSION):
+            self.writer.finish(self.recording)
+        print(f"Recording stopped after {self.recording_frame} frames")
+        self.recording = None
+
+    def toggle_recording(self):
+        if self.recording is None:
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def toggle_hitches(self):
+        self.hitches_enabled = not self.hitches_enabled
+        self.ring_frames = [None] * len(self.ring)
+        print(f"Hitch capture {'on' if self.hitches_enabled else 'off'} (frames over {self.hitch_ms:.1f} ms)")
+
+    @property
+    def active(self):
+        return self.recording is not None or self.hitches_enabled or self.clip is not None
+
+    def _queue(self, source, path, frame, frame_ms):
+        """Copy a surface into a pooled buffer for the writer, or drop the frame if none is free"""
+        buffer = self.pool.acquire()
+        if buffer is None:
+            self.dropped += 1
+            return False
+        buffer.blit(source, (0, 0))
+        self.writer.write_frame(buffer, path, frame, frame_ms)
+        self.captured += 1
+        return True
+
+    def capture(self, surface):
+        """
+        Capture a finished frame if a capture mode is on. Call once per frame, just
+        before presenting; the time between calls is the frame time.
+
+        Args:
+            surface (pygame.Surface): The finished back buffer
+        """
+        now = time.perf_counter()
+        frame_ms = (now - self.last_time) * 1000 if self.last_time is not None else 0.0
+        self.last_time = now
+        self.frame += 1
+        if not self.active:
+            return
+
+        if self.recording is not None:
+            self.recording_frame += 1
+            if self.recording.endswith(RAW_EXTENSION):
+                path = self.recording
+            else:
+                path = os.path.join(self.recording, f"frame_{self.recording_frame:06d}.png")
+            self._queue(surface, path, self.frame, frame_ms)
+
+        if self.clip is not None:
+            self._clip_frame(surface, self.frame, frame_ms, frame_ms >= self.hitch_ms)
+        elif self.hitches_enabled:
+            if frame_ms >= self.hitch_ms and self.frame > 1:
+                self._start_clip(surface, frame_ms)
+            else:
+                slot = self.frame % len(self.ring)
+                self.ring[slot].blit(surface, (0, 0))
+                self.ring_frames[slot] = (self.frame, frame_ms)
+
+        elapsed = time.perf_counter() - now
+        self.capture_time += elapsed
+        self.max_capture_time = max(self.max_capture_time, elapsed)
+        self.frames_timed += 1
+
+    def _start_clip(self, surface, frame_ms):
+        """A hitch: write the frames before it from the ring, then this one and the next few"""
+        self.hitches += 1
+        self.clip = {'folder': self._folder("hitch"), 'frames': [], 'remaining': self.hitch_context + 1}
+        for frame in range(self.frame - self.hitch_context, self.frame):
+            slot = frame % len(self.ring)
+            if self.ring_frames[slot] is not None and self.ring_frames[slot][0] == frame:
+                self._clip_frame(self.ring[slot], *self.ring_frames[slot], False, count=False)
+        self._clip_frame(surface, self.frame, frame_ms, True)
+
+    def _clip_frame(self, surface, frame, frame_ms, hitched, count=True):
+        clip = self.clip
+        path = os.path.join(clip['folder'], f"frame_{frame:06d}.png")
+        written = self._queue(surface, path, frame, frame_ms)
+        clip['frames'].append({'frame': frame, 'ms': round(frame_ms, 3), 'hitch': hitched,
+                               'image': os.path.basename(path) if written else None})
+        if count:
+            clip['remaining'] -= 1
+            if hitched:
+                clip['remaining'] = self.hitch_context  # A hitch right after a hitch extends the clip
+        if clip['remaining'] <= 0 or len(clip['frames']) >= MAX_CLIP_FRAMES:
+            self.writer.write_json(os.path.join(clip['folder'], 'frames.json'),
+                                   {'hitch_ms': self.hitch_ms, 'frames': clip['frames']})
+            print(f"Hitch captured in {clip['folder']}")
+            self.clip = None
+            # The ring restarts after the clip so a later clip does not reuse frames from before it
+            self.ring_frames = [None] * len(self.ring)
+
+    def close(self):
+        """Finish the recording and write every queued frame"""
+        self.stop_recording()
+        self.writer.stop()
+
+    def report(self):
+        average = self.capture_time / self.frames_timed * 1000 if self.frames_timed else 0.0
+        write = self.writer.write_time / self.writer.written * 1000 if self.writer.written else 0.0
+        return (f"Capture: {self.captured} frames captured, {self.writer.written} written, {self.dropped} dropped, "
+                f"{self.hitches} hitches; game loop overhead {average:.3f} ms average / "
+                f"{self.max_capture_time * 1000:.3f} ms max per frame while capturing, "
+                f"writer {write:.1f} ms per frame")
+
+
+def convert(path, out_dir=None):
+    """Write every frame of a raw recording as a PNG"""
+    out_dir = out_dir or os.path.splitext(path)[0]
+    os.makedirs(out_dir, exist_ok=True)
+    count = 0
+    for frame, frame_ms, surface in read_raw_frames(path):
+        pygame.image.save(surface, os.path.join(out_dir, f"frame_{frame:06d}.png"))
+        count += 1
+    print(f"{count} frames written to {out_dir}")
+
+
+def main(args):
+    if len(args) < 2 or args[0] != 'convert':
+        print("usage: python -m utils.capture convert RECORDING.mkraw [OUT_FOLDER]")
+        return 2
+    convert(args[1], args[2] if len(args) > 2 else None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
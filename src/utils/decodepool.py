@@ -0,0 +1,101 @@
+"""
+Multi-process image decoding.
+PNG decoding in a thread still holds the GIL for part of the work, so large asset
+sets end up on one core. Here worker processes decode images to raw RGBA pixels
+and hand them back through shared memory blocks; the main process wraps a block
+with pygame.image.frombuffer (no copy) and only converts it to the display format.
+
+Process startup is not free, so small batches are decoded in-process instead
+(see should_use_processes).
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import pygame
+
+# Below this many images, starting the worker processes costs more than it saves
+MIN_PROCESS_BATCH = 16
+
+
+def decode_to_shared_memory(path):
+    """
+    Worker side: decode an image into a new shared memory block.
+
+    Args:
+        path (str): Absolute image path
+
+    Returns:
+        tuple: (shared memory block name, (width, height))
+    """
+    surface = pygame.image.load(path)
+    tobytes = getattr(pygame.image, 'tobytes', None) or pygame.image.tostring
+    pixels = tobytes(surface, 'RGBA')
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(pixels)))
+    block.buf[:len(pixels)] = pixels
+    name = block.name
+    block.close()  # The main process unlinks it once the pixels are converted
+    return name, surface.get_size()
+
+
+def open_shared_image(result):
+    """
+    Main process side: wrap a decoded block as a surface without copying the pixels.
+
+    Args:
+        result (tuple): Return value of decode_to_shared_memory
+
+    Returns:
+        tuple: (RGBA surface reading the block, the block); pass the block to
+            release_shared_image once the surface is no longer used
+    """
+    name, size = result
+    block = shared_memory.SharedMemory(name=name)
+    surface = pygame.image.frombuffer(block.buf[:size[0] * size[1] * 4], size, 'RGBA')
+    return surface, block
+
+
+def release_shared_image(block):
+    """Free a block returned by open_shared_image (every surface wrapping it must be gone)"""
+    block.close()
+    block.unlink()
+
+
+def should_use_processes(image_count):
+    """Whether a batch is large enough (and the machine has enough cores) to decode in processes"""
+    return image_count >= MIN_PROCESS_BATCH and (os.cpu_count() or 1) > 1
+
+
+class DecodePool:
+    """
+    Lazily started process pool for decode_to_shared_memory.
+    """
+    def __init__(self, max_workers=None):
+        """
+        Initialize the pool (no process is started until the first submit)
+
+        Args:
+            max_workers (int, optional): Number of processes. Defaults to the core count.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+
+    def submit(self, path):
+        """
+        Decode an image in a worker process.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the decode_to_shared_memory result
+        """
+        if self.executor is None:
+            # Spawn instead of fork: the main process already runs SDL and loader threads
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return self.executor.submit(decode_to_shared_memory, path)
+
+    def shutdown(self, wait=False):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
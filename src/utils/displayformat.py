@@ -0,0 +1,153 @@
+"""
+Display-format normalization and blit auditing.
+Every surface the game draws should already be in the display's pixel format, with
+per-pixel alpha only where it is needed, so SDL can use its fast blitters:
+    opaque art           -> convert()                      (plain copy)
+    opaque with holes    -> convert() + RLE colorkey        (binary alpha, e.g. pixel art)
+    soft edges / fades   -> convert_alpha()                 (per-pixel alpha blend)
+
+BlitAudit counts blits per (source format, destination format, flags) each frame
+so surfaces that still go through a conversion blit show up.
+"""
+
+import pygame
+
+# Color used for transparent pixels of colorkeyed surfaces
+COLORKEY = (255, 0, 255)
+
+OPAQUE = 'opaque'
+COLORKEY_ALPHA = 'colorkey'
+PER_PIXEL_ALPHA = 'alpha'
+
+# Order of the kinds from cheapest to most general
+KIND_ORDER = (OPAQUE, COLORKEY_ALPHA, PER_PIXEL_ALPHA)
+
+
+def alpha_kind(surface):
+    """
+    Classify how a surface uses transparency.
+
+    Returns:
+        str: OPAQUE, COLORKEY_ALPHA (every pixel fully opaque or fully transparent) or PER_PIXEL_ALPHA
+    """
+    if surface.get_colorkey() is not None:
+        return COLORKEY_ALPHA
+    if not surface.get_flags() & pygame.SRCALPHA:
+        return OPAQUE
+    pixel_count = surface.get_width() * surface.get_height()
+    visible = pygame.mask.from_surface(surface, 0).count()  # alpha > 0
+    opaque = pygame.mask.from_surface(surface, 254).count()  # alpha == 255
+    if opaque == pixel_count:
+        return OPAQUE
+    if visible == opaque:
+        return COLORKEY_ALPHA
+    return PER_PIXEL_ALPHA
+
+
+def widest_kind(kinds):
+    """The most general kind among several (e.g. for frames packed together)"""
+    return max(kinds, key=KIND_ORDER.index, default=OPAQUE)
+
+
+def to_display_format(surface, kind):
+    """
+    Convert a surface to the display format for a given alpha kind (display mode must be set).
+
+    Returns:
+        pygame.Surface: A new surface
+    """
+    if kind == PER_PIXEL_ALPHA:
+        return surface.convert_alpha()
+    if kind == COLORKEY_ALPHA:
+        converted = pygame.Surface(surface.get_size()).convert()
+        converted.fill(COLORKEY)
+        converted.blit(surface, (0, 0))
+        converted.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        return converted
+    return surface.convert()
+
+
+def normalize_surface(surface, use_alpha=True):
+    """
+    Convert a freshly loaded surface to the cheapest display format that keeps its look.
+
+    Args:
+        surface (pygame.Surface): Decoded image
+        use_alpha (bool, optional): False to drop transparency entirely. Defaults to True.
+
+    Returns:
+        pygame.Surface: The converted surface
+    """
+    return to_display_format(surface, alpha_kind(surface) if use_alpha else OPAQUE)
+
+
+def format_name(surface):
+    """
+    Short description of a surface's pixel format, e.g. 'XRGB8888', 'ARGB8888 key RLE', 'P8'.
+    """
+    bits = surface.get_bitsize()
+    if bits == 8:
+        name = 'P8'
+    else:
+        masks = surface.get_masks()
+        channels = sorted(((mask, letter) for mask, letter in zip(masks, 'RGBA') if mask), reverse=True)
+        name = ''.join(letter for _, letter in channels)
+        if bits == 32 and not masks[3]:
+            name = 'X' + name
+        name += str(bits)
+    flags = surface.get_flags()
+    if surface.get_colorkey() is not None:
+        name += ' key'
+    if flags & pygame.RLEACCEL:
+        name += ' RLE'
+    alpha = surface.get_alpha()
+    if alpha is not None and alpha < 255 and not flags & pygame.SRCALPHA:
+        name += f' alpha{alpha}'
+    return name
+
+
+def is_slow_path(source, target):
+    """Whether blitting source onto target needs a per-pixel format conversion"""
+    return source.get_bitsize() != target.get_bitsize() or source.get_masks()[:3] != target.get_masks()[:3]
+
+
+class BlitAudit:
+    """
+    Per-frame blit counts by (source format, destination format, flags).
+    """
+    def __init__(self):
+        self.enabled = False
+        self.counts = {}
+        self.slow = set()  # Keys whose blits convert pixel formats
+        self.last_frame = {}
+        self.frame_count = 0
+
+    def record(self, source, target, special_flags=0):
+        """Count one blit (does nothing unless the audit is enabled)"""
+        if not self.enabled:
+            return
+        key = (format_name(source), format_name(target), special_flags)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if key not in self.slow and is_slow_path(source, target):
+            self.slow.add(key)
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.last_frame = self.counts
+        self.counts = {}
+        self.frame_count += 1
+
+    def report(self):
+        """
+        Describe the last audited frame.
+
+        Returns:
+            str: One line per (source, destination, flags), most frequent first, slow paths marked
+        """
+        lines = [f"Blit audit (frame {self.frame_count}): {sum(self.last_frame.values())} blits"]
+        for key, count in sorted(self.last_frame.items(), key=lambda item: -item[1]):
+            source, target, flags = key
+            marker = "  SLOW" if key in self.slow else ""
+            lines.append(f"  {count:5d}  {source:>18} -> {target:<10} flags={flags}{marker}")
+        return "\n".join(lines)
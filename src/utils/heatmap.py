@@ -0,0 +1,232 @@
+"""
+Spatial performance heatmap.
+While enabled, the cost of every frame (its update and draw time, and the sum
+of both) is added to two grids over the level's tiles: one keyed by the tile
+each player stands on, one keyed by the tile at the center of each camera
+view. Exported heatmaps accumulate across play sessions of the same level.
+
+The numbers are saved as JSON; from those an overlay PNG is rendered with one
+pixel per tile, green (cheap) to red (expensive), that the map editor draws on
+top of the level (H in utils.MAP.map_editor).
+
+Render another metric or grid from the src folder:
+    python -m utils.heatmap [JSON] [--key player|camera] [--metric frame|update|draw] [--scale MS]
+"""
+
+import argparse
+import json
+import os
+import sys
+import zlib
+from array import array
+
+import pygame
+
+HEATMAP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '../heatmaps')
+HEATMAP_FILE = os.path.join(HEATMAP_DIR, 'heatmap.json')
+
+KEYS = ('player', 'camera')
+METRICS = ('frame', 'update', 'draw')
+
+OVERLAY_ALPHA = 160
+# Cells need this many frames before their color is trusted fully
+CONFIDENT_SAMPLES = 30
+
+
+def level_id(level_map):
+    """Checksum of a level map, so heatmaps of different layouts are never merged"""
+    return zlib.crc32("\n".join(level_map).encode())
+
+
+def overlay_path(path, key='player', metric='frame'):
+    """Overlay PNG file for a heatmap JSON file"""
+    return os.path.splitext(path)[0] + f'_{key}_{metric}.png'
+
+
+class PerfHeatmap:
+    """
+    Frame costs summed per level tile.
+    """
+    def __init__(self, level_map, tile_size):
+        """
+        Initialize an empty heatmap
+
+        Args:
+            level_map (list): Level rows, one character per tile
+            tile_size (int): Size of a tile in pixels
+        """
+        self.level = level_id(level_map)
+        self.columns = max(len(row) for row in level_map)  # Rows may have different lengths
+        self.rows = len(level_map)
+        self.tile_size = tile_size
+        self.enabled = False
+        cells = self.columns * self.rows
+        # Per key: frame counts, then the summed milliseconds and the worst frame per cell
+        self.counts = {key: array('I', bytes(4 * cells)) for key in KEYS}
+        self.totals = {key: {metric: array('d', bytes(8 * cells)) for metric in METRICS} for key in KEYS}
+        self.worst = {key: array('d', bytes(8 * cells)) for key in KEYS}
+        self.frames = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        print(f"Performance heatmap {'on' if self.enabled else 'off'}")
+
+    def _cell(self, x, y):
+        column = min(self.columns - 1, max(0, int(x) // self.tile_size))
+        row = min(self.rows - 1, max(0, int(y) // self.tile_size))
+        return row * self.columns + column
+
+    def record(self, update_ms, draw_ms, player_positions, view_centers):
+        """
+        Add a frame's cost to the cells of the players and camera views
+
+        Args:
+            update_ms (float): Simulation time of the frame
+            draw_ms (float): Rendering time of the frame
+            player_positions (list): Level (x, y) of each player
+            view_centers (list): Level (x, y) of the center of each camera view
+        """
+        if not self.enabled:
+            return
+        frame_ms = update_ms + draw_ms
+        self.frames += 1
+        for key, positions in (('player', player_positions), ('camera', view_centers)):
+            counts = self.counts[key]
+            totals = self.totals[key]
+            worst = self.worst[key]
+            # Split-screen viewports often share a cell; count it once
+            for cell in {self._cell(x, y) for x, y in positions}:
+                counts[cell] += 1
+                totals['frame'][cell] += frame_ms
+                totals['update'][cell] += update_ms
+                totals['draw'][cell] += draw_ms
+                if frame_ms > worst[cell]:
+                    worst[cell] = frame_ms
+
+    def to_json(self):
+        """Sparse JSON form: the sampled cells of each grid"""
+        grids = {}
+        for key in KEYS:
+            cells = []
+            for cell, count in enumerate(self.counts[key]):
+                if count:
+                    cells.append([cell % self.columns, cell // self.columns, count]
+                                 + [round(self.totals[key][metric][cell], 3) for metric in METRICS]
+                                 + [round(self.worst[key][cell], 3)])
+            grids[key] = cells
+        return {'level': self.level, 'columns': self.columns, 'rows': self.rows, 'tile_size': self.tile_size,
+                'frames': self.frames, 'fields': ['column', 'row', 'frames'] + [f'{metric}_ms' for metric in METRICS]
+                + ['worst_ms'], 'grids': grids}
+
+    def merge_json(self, data):
+        """
+        Add a saved heatmap of the same level to this one
+
+        Returns:
+            bool: False if the saved heatmap is for another level layout (nothing merged)
+        """
+        if (data.get('level'), data.get('columns'), data.get('rows')) != (self.level, self.columns, self.rows):
+            return False
+        self.frames += data['frames']
+        for key in KEYS:
+            for column, row, count, *costs, worst in data['grids'].get(key, ()):
+                cell = row * self.columns + column
+                self.counts[key][cell] += count
+                for metric, cost in zip(METRICS, costs):
+                    self.totals[key][metric][cell] += cost
+                self.worst[key][cell] = max(self.worst[key][cell], worst)
+        return True
+
+    def export(self, path=HEATMAP_FILE):
+        """
+        Merge into the heatmap saved at path (if it is for this level) and write the
+        JSON and the overlay PNGs of frame cost for both grids
+
+        Returns:
+            dict: The JSON that was written
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    if not self.merge_json(json.load(f)):
+                        print(f"{path} is for another level layout; replacing it")
+            except (OSError, ValueError) as e:
+                print(f"Could not merge {path}: {e}")
+        data = self.to_json()
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        for key in KEYS:
+            pygame.image.save(render_overlay(data, key), overlay_path(path, key))
+        return data
+
+    def report(self):
+        sampled = sum(1 for count in self.counts['player'] if count)
+        return f"Heatmap: {self.frames} frames over {sampled} player tiles"
+
+
+def cell_means(data, key='player', metric='frame'):
+    """
+    Mean cost per sampled cell of a heatmap JSON
+
+    Returns:
+        dict: (column, row) -> (mean ms, frames)
+    """
+    index = 3 + METRICS.index(metric)
+    return {(cell[0], cell[1]): (cell[index] / cell[2], cell[2]) for cell in data['grids'][key] if cell[2]}
+
+
+def heat_color(value, scale):
+    """Green at 0 through yellow to red at scale and above"""
+    t = min(1.0, max(0.0, value / scale)) if scale > 0 else 0.0
+    if t < 0.5:
+        return int(510 * t), 220, 0
+    return 255, int(220 * (2 - 2 * t)), 0
+
+
+def render_overlay(data, key='player', metric='frame', scale_ms=None):
+    """
+    Overlay image of a heatmap JSON: one pixel per tile, transparent where nothing was sampled
+
+    Args:
+        data (dict): Heatmap JSON (see PerfHeatmap.to_json)
+        key (str, optional): 'player' or 'camera'. Defaults to 'player'.
+        metric (str, optional): 'frame', 'update' or 'draw'. Defaults to 'frame'.
+        scale_ms (float, optional): Cost shown fully red. Defaults to the most expensive cell.
+
+    Returns:
+        pygame.Surface: columns x rows RGBA image
+    """
+    means = cell_means(data, key, metric)
+    if scale_ms is None:
+        scale_ms = max((mean for mean, _ in means.values()), default=0.0)
+    image = pygame.Surface((data['columns'], data['rows']), pygame.SRCALPHA)
+    for (column, row), (mean, count) in means.items():
+        # Cells seen for only a few frames are fainter
+        alpha = int(OVERLAY_ALPHA * min(1.0, 0.25 + count / CONFIDENT_SAMPLES))
+        image.set_at((column, row), (*heat_color(mean, scale_ms), alpha))
+    return image
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Render a performance heatmap overlay")
+    parser.add_argument('file', nargs='?', default=HEATMAP_FILE)
+    parser.add_argument('--key', choices=KEYS, default='player', help="tiles of the players or the camera views")
+    parser.add_argument('--metric', choices=METRICS, default='frame')
+    parser.add_argument('--scale', type=float, help="cost in ms shown fully red (default: the worst tile)")
+    parser.add_argument('--top', type=int, default=5, help="most expensive tiles listed")
+    options = parser.parse_args(args)
+
+    with open(options.file) as f:
+        data = json.load(f)
+    path = overlay_path(options.file, options.key, options.metric)
+    pygame.image.save(render_overlay(data, options.key, options.metric, options.scale), path)
+    means = cell_means(data, options.key, options.metric)
+    print(f"{data['frames']} frames, {len(means)} tiles sampled; wrote {os.path.normpath(path)}")
+    for (column, row), (mean, count) in sorted(means.items(), key=lambda item: -item[1][0])[:options.top]:
+        print(f"  tile ({column}, {row}): {mean:.2f} ms over {count} frames")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
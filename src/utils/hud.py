@@ -0,0 +1,189 @@
+"""
+Retained-mode HUD.
+Widgets are bound to a value (a callable returning e.g. (health, max_health)) and
+only re-render their surface when that value changes. The HUD composites its
+widgets into one cached layer, which is rebuilt only when a widget changed and
+is drawn with a single blit per frame.
+
+Fonts and rendered strings are cached at module level, so no Font is ever
+constructed inside the frame loop.
+"""
+
+import pygame
+
+# Fonts by (name, size)
+_fonts = {}
+
+# Rendered strings by (font name, size, text, color); cleared when it grows too large
+_text_cache = {}
+TEXT_CACHE_LIMIT = 256
+
+
+def get_font(name=None, size=24):
+    """
+    Get a shared font, creating it on first use.
+
+    Args:
+        name (str, optional): Font file, or None for the default font. Defaults to None.
+        size (int, optional): Point size. Defaults to 24.
+
+    Returns:
+        pygame.font.Font: The font
+    """
+    key = (name, size)
+    font = _fonts.get(key)
+    if font is None:
+        font = _fonts[key] = pygame.font.Font(name, size)
+    return font
+
+
+def render_text(text, color=(255, 255, 255), name=None, size=24):
+    """
+    Render a string with a shared font, reusing the surface if it was rendered before.
+
+    Returns:
+        pygame.Surface: The rendered text (do not draw on it, it is shared)
+    """
+    key = (name, size, text, color)
+    surface = _text_cache.get(key)
+    if surface is None:
+        if len(_text_cache) >= TEXT_CACHE_LIMIT:
+            _text_cache.clear()
+        surface = _text_cache[key] = get_font(name, size).render(text, True, color)
+    return surface
+
+
+class Widget:
+    """
+    Base HUD element: re-renders its surface when its bound value changes.
+    """
+    def __init__(self, position, binding):
+        """
+        Initialize a widget
+
+        Args:
+            position (tuple): Top left corner on the screen
+            binding (callable): Returns the value to display
+        """
+        self.position = position
+        self.binding = binding
+        self.value = None
+        self.surface = None
+        self.visible = True
+
+    def refresh(self):
+        """
+        Re-render if the bound value changed.
+
+        Returns:
+            bool: True if the surface changed
+        """
+        value = self.binding()
+        if self.surface is not None and value == self.value:
+            return False
+        self.value = value
+        self.surface = self.render(value)
+        return True
+
+    def render(self, value):
+        """Build the widget surface for a value (implemented by subclasses)"""
+        raise NotImplementedError
+
+    @property
+    def rect(self):
+        return self.surface.get_rect(topleft=self.position) if self.surface else pygame.Rect(self.position, (0, 0))
+
+
+class TextWidget(Widget):
+    """
+    Formatted text, e.g. "Health: {}/{}" bound to (health, max_health).
+    """
+    def __init__(self, position, binding, text_format="{}", color=(255, 255, 255), font_name=None, font_size=24):
+        super().__init__(position, binding)
+        self.text_format = text_format
+        self.color = color
+        self.font_name = font_name
+        self.font_size = font_size
+
+    def render(self, value):
+        values = value if isinstance(value, tuple) else (value,)
+        return render_text(self.text_format.format(*values), self.color, self.font_name, self.font_size)
+
+
+class BarWidget(Widget):
+    """
+    Bordered bar bound to (current, maximum).
+    """
+    def __init__(self, position, binding, size=(100, 10), border=2,
+                 fill_color=(0, 255, 0), empty_color=(255, 0, 0), border_color=(0, 0, 0)):
+        super().__init__(position, binding)
+        self.size = size
+        self.border = border
+        self.fill_color = fill_color
+        self.empty_color = empty_color
+        self.border_color = border_color
+        # The surface includes the border, so it starts above and left of the bar
+        self.position = (position[0] - border, position[1] - border)
+
+    def render(self, value):
+        current, maximum = value
+        width, height = self.size
+        border = self.border
+        surface = pygame.Surface((width + 2 * border, height + 2 * border)).convert()
+        surface.fill(self.border_color)
+        surface.fill(self.empty_color, (border, border, width, height))
+        ratio = max(0.0, min(1.0, current / maximum)) if maximum else 0.0
+        surface.fill(self.fill_color, (border, border, int(width * ratio), height))
+        return surface
+
+
+class HUD:
+    """
+    Set of widgets composited into one cached layer.
+    """
+    def __init__(self, size):
+        """
+        Initialize an empty HUD
+
+        Args:
+            size (tuple): Screen size
+        """
+        self.layer = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+        self.widgets = []
+        self.bounds = pygame.Rect(0, 0, 0, 0)  # Area of the layer covered by widgets
+        self.needs_composite = True
+        self.composite_count = 0
+
+    def add(self, widget):
+        """Add a widget and return it"""
+        self.widgets.append(widget)
+        self.needs_composite = True
+        return widget
+
+    def remove(self, widget):
+        self.widgets.remove(widget)
+        self.needs_composite = True
+
+    def update(self):
+        """Refresh every widget and rebuild the layer if any of them changed"""
+        for widget in self.widgets:
+            if widget.refresh():
+                self.needs_composite = True
+        if self.needs_composite:
+            self.composite()
+
+    def composite(self):
+        """Redraw the cached layer from the widget surfaces"""
+        self.layer.fill((0, 0, 0, 0), self.bounds)
+        rects = []
+        for widget in self.widgets:
+            if widget.visible and widget.surface is not None:
+                rects.append(self.layer.blit(widget.surface, widget.position))
+        self.bounds = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+        self.needs_composite = False
+        self.composite_count += 1
+
+    def draw(self, surface):
+        """Draw the HUD with one blit of the covered part of the layer"""
+        if self.bounds:
+            surface.blit(self.layer, self.bounds, self.bounds)
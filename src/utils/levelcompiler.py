@@ -0,0 +1,308 @@
+"""
+Offline level compilation.
+Every text map of a folder (as saved by the map editor) is compiled into a JSON
+artifact holding what main.main otherwise works out at launch: spawns, merged
+collision and death zone rects and the platform segments enemies patrol on.
+The solid tiles are also baked into chunk images, so a level can be drawn with
+one blit per visible chunk instead of one per tile.
+
+Maps are compiled in parallel worker processes. Compilation is incremental:
+a manifest records a hash of every map (and of the compiler settings and the
+tile image) and unchanged maps are skipped. Each run writes a timing report.
+
+Run from the src folder:
+    python -m utils.levelcompiler [maps folder] [--out FOLDER] [--jobs N] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import get_file_path, FILETYPE
+from .levelgeometry import (SOLID, DEATH_ZONE, PLAYER_SPAWN, ENEMY_SPAWN, find_cells, merge_cells,
+                            platform_segments, validate_level)
+
+# Bump when the artifact layout changes to recompile every map
+COMPILER_VERSION = 1
+
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '../levels')
+TILE_IMAGE = 'stile.png'
+
+# Chunk size in cells
+CHUNK_CELLS = 16
+
+# Compilation stages, in order, as they appear in the timing report
+STAGES = ('parse', 'validate', 'geometry', 'patrol', 'chunks', 'write')
+
+# Tile image scaled to the tile size, per worker process
+_tile_images = {}
+
+
+def _hash_file(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def read_map(path):
+    """Rows of a text map, without line endings and trailing empty lines"""
+    with open(path, 'r') as f:
+        rows = [line.rstrip('\r\n') for line in f]
+    while rows and not rows[-1].strip():
+        rows.pop()
+    return rows
+
+
+def _get_tile_image(tile_size):
+    import pygame
+
+    image = _tile_images.get(tile_size)
+    if image is None:
+        # No display in the workers: plain surfaces only, no convert()
+        source = pygame.image.load(get_file_path(TILE_IMAGE, FILETYPE.IMAGE))
+        image = _tile_images[tile_size] = pygame.transform.scale(source, (tile_size, tile_size))
+    return image
+
+
+def bake_chunks(level_map, tile_size, out_dir, name):
+    """
+    Draw the solid tiles into chunk images of CHUNK_CELLS x CHUNK_CELLS cells.
+    Chunks without any solid cell are not written.
+
+    Returns:
+        list: {'x', 'y', 'image'} per chunk (pixel position and file name in out_dir)
+    """
+    import pygame
+
+    tile_image = _get_tile_image(tile_size)
+    height = len(level_map)
+    width = max(len(row) for row in level_map)
+    chunk_size = CHUNK_CELLS * tile_size
+    chunks = []
+    for chunk_row in range(0, height, CHUNK_CELLS):
+        for chunk_column in range(0, width, CHUNK_CELLS):
+            cells = [(column - chunk_column, row - chunk_row)
+                     for row in range(chunk_row, min(chunk_row + CHUNK_CELLS, height))
+                     for column in range(chunk_column, min(chunk_column + CHUNK_CELLS, len(level_map[row])))
+                     if level_map[row][column] == SOLID]
+            if not cells:
+                continue
+            surface = pygame.Surface((chunk_size, chunk_size), pygame.SRCALPHA)
+            surface.blits([(tile_image, (x * tile_size, y * tile_size)) for x, y in cells], doreturn=False)
+            filename = f"{name}.chunk_{chunk_column // CHUNK_CELLS}_{chunk_row // CHUNK_CELLS}.png"
+            pygame.image.save(surface, os.path.join(out_dir, filename))
+            chunks.append({'x': chunk_column * tile_size, 'y': chunk_row * tile_size, 'image': filename})
+    return chunks
+
+
+def compile_level(source_path, out_dir, tile_size):
+    """
+    Compile one map. Runs in a worker process.
+
+    Args:
+        source_path (str): Text map
+        out_dir (str): Folder for the artifact and chunk images
+        tile_size (int): Size of a cell in pixels
+
+    Returns:
+        dict: 'name', 'errors' (the artifact is not written if there are any), 'warnings',
+            'outputs' (file names in out_dir) and 'timings' (seconds per stage)
+    """
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    timings = {}
+    result = {'name': name, 'errors': [], 'warnings': [], 'outputs': [], 'timings': timings}
+
+    start = time.perf_counter()
+
+    def stage(stage_name):
+        nonlocal start
+        now = time.perf_counter()
+        timings[stage_name] = now - start
+        start = now
+
+    level_map = read_map(source_path)
+    stage('parse')
+
+    result['errors'], result['warnings'] = validate_level(level_map)
+    stage('validate')
+    if result['errors']:
+        return result
+
+    level = {
+        'version': COMPILER_VERSION,
+        'name': name,
+        'tile_size': tile_size,
+        'width': max(len(row) for row in level_map) * tile_size,
+        'height': len(level_map) * tile_size,
+        'rows': level_map,
+        'player_spawn': find_cells(level_map, PLAYER_SPAWN, tile_size)[-1],
+        'enemy_spawns': find_cells(level_map, ENEMY_SPAWN, tile_size),
+        'collision': merge_cells(level_map, SOLID, tile_size),
+        'death_zones': merge_cells(level_map, DEATH_ZONE, tile_size),
+    }
+    stage('geometry')
+
+    level['platforms'] = platform_segments(level_map, tile_size)
+    stage('patrol')
+
+    level['chunks'] = bake_chunks(level_map, tile_size, out_dir, name)
+    level['chunk_size'] = CHUNK_CELLS * tile_size
+    stage('chunks')
+
+    artifact = f"{name}.level.json"
+    temp_path = os.path.join(out_dir, artifact + '.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(level, f)
+    os.replace(temp_path, os.path.join(out_dir, artifact))
+    result['outputs'] = [artifact] + [chunk['image'] for chunk in level['chunks']]
+    stage('write')
+    return result
+
+
+def load_compiled_level(path):
+    """
+    Read a compiled level artifact.
+
+    Returns:
+        dict: The artifact, with spawns and rects as tuples, or None if it is missing or outdated
+    """
+    try:
+        with open(path, 'r') as f:
+            level = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if level.get('version') != COMPILER_VERSION:
+        return None
+    for key in ('player_spawn',):
+        level[key] = tuple(level[key])
+    for key in ('enemy_spawns', 'collision', 'death_zones', 'platforms'):
+        level[key] = [tuple(item) for item in level[key]]
+    return level
+
+
+def _load_manifest(path):
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def compile_levels(source_dir=LEVELS_DIR, out_dir=None, tile_size=32, jobs=None, force=False):
+    """
+    Compile every .txt map of a folder, skipping the ones that are up to date.
+
+    Args:
+        source_dir (str, optional): Folder of text maps. Defaults to the levels folder.
+        out_dir (str, optional): Artifact folder. Defaults to source_dir/compiled.
+        tile_size (int, optional): Size of a cell in pixels. Defaults to 32.
+        jobs (int, optional): Worker processes. Defaults to the core count.
+        force (bool, optional): Recompile every map. Defaults to False.
+
+    Returns:
+        dict: The timing report (also written to out_dir/report.json)
+    """
+    wall_start = time.perf_counter()
+    out_dir = out_dir or os.path.join(source_dir, 'compiled')
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    # Anything that changes every artifact is part of every map's key
+    settings = f"{COMPILER_VERSION}:{tile_size}:{CHUNK_CELLS}:{_hash_file(get_file_path(TILE_IMAGE, FILETYPE.IMAGE))}"
+    sources = sorted(name for name in os.listdir(source_dir) if name.endswith('.txt'))
+    keys = {}
+    dirty = []
+    for filename in sources:
+        path = os.path.join(source_dir, filename)
+        key = keys[filename] = hashlib.sha1(f"{settings}:{_hash_file(path)}".encode()).hexdigest()
+        entry = manifest.get(filename)
+        if (entry and entry['key'] == key
+                and all(os.path.exists(os.path.join(out_dir, output)) for output in entry['outputs'])):
+            continue
+        dirty.append(path)
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(dirty)))
+    if jobs > 1:
+        # Spawn instead of fork, like utils.decodepool
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(compile_level, dirty, [out_dir] * len(dirty), [tile_size] * len(dirty)))
+    else:
+        results = [compile_level(path, out_dir, tile_size) for path in dirty]
+
+    # Remove the outputs of deleted maps and outputs a recompiled map no longer has
+    compiled = {result['name'] + '.txt': result for result in results}
+    for filename, entry in list(manifest.items()):
+        if filename in compiled or filename not in keys:
+            kept = set(compiled[filename]['outputs']) if filename in compiled else set()
+            for output in set(entry['outputs']) - kept:
+                try:
+                    os.remove(os.path.join(out_dir, output))
+                except OSError:
+                    pass
+            if filename not in keys:
+                del manifest[filename]
+    for filename, result in compiled.items():
+        if result['errors']:
+            manifest.pop(filename, None)  # Retry on the next run
+        else:
+            manifest[filename] = {'key': keys[filename], 'outputs': result['outputs']}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+    report = {
+        'maps': len(sources),
+        'compiled': sum(1 for result in results if not result['errors']),
+        'failed': {result['name']: result['errors'] for result in results if result['errors']},
+        'warnings': {result['name']: result['warnings'] for result in results if result['warnings']},
+        'skipped': len(sources) - len(dirty),
+        'jobs': jobs,
+        'wall_time': time.perf_counter() - wall_start,
+        'stage_totals': {stage: sum(result['timings'].get(stage, 0.0) for result in results) for stage in STAGES},
+        'levels': {result['name']: result['timings'] for result in results},
+    }
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    return report
+
+
+def format_report(report, slowest=5):
+    """Readable summary of a compile_levels report"""
+    lines = [f"{report['maps']} maps: {report['compiled']} compiled, {report['skipped']} up to date, "
+             f"{len(report['failed'])} failed ({report['jobs']} processes, {report['wall_time'] * 1000:.0f} ms)"]
+    if report['compiled']:
+        lines.append("  time per stage (all maps): " + ", ".join(
+            f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in report['stage_totals'].items()))
+        totals = sorted(((sum(timings.values()), name) for name, timings in report['levels'].items()), reverse=True)
+        lines.append("  slowest: " + ", ".join(f"{name} {seconds * 1000:.1f} ms" for seconds, name in totals[:slowest]))
+    for name, errors in report['failed'].items():
+        lines.extend(f"  error {name}: {error}" for error in errors)
+    for name, warnings in report['warnings'].items():
+        lines.extend(f"  warning {name}: {warning}" for warning in warnings)
+    return "\n".join(lines)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Compile the text maps of a folder into level artifacts")
+    parser.add_argument('source', nargs='?', default=LEVELS_DIR, help="folder of .txt maps")
+    parser.add_argument('--out', help="artifact folder (default: <source>/compiled)")
+    parser.add_argument('--jobs', type=int, help="worker processes (default: core count)")
+    parser.add_argument('--tile-size', type=int, default=32)
+    parser.add_argument('--force', action='store_true', help="recompile unchanged maps")
+    options = parser.parse_args(args)
+
+    report = compile_levels(options.source, options.out, options.tile_size, options.jobs, options.force)
+    print(format_report(report))
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
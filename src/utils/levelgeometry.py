@@ -0,0 +1,151 @@
+"""
+Level geometry derived from a text map (see utils.utils.parse_map for the cell types).
+Everything here works on plain tuples in pixels so the results can be written to
+JSON by the level compiler and computed in worker processes:
+    rect     (x, y, width, height)
+    segment  (left, right, top)    walkable top surface of a platform
+"""
+
+SOLID = '#'
+DEATH_ZONE = 'X'
+PLAYER_SPAWN = 'S'
+ENEMY_SPAWN = 'E'
+EMPTY = '.'
+KNOWN_CELLS = {SOLID, DEATH_ZONE, PLAYER_SPAWN, ENEMY_SPAWN, EMPTY}
+
+
+def cell_at(level_map, column, row):
+    """Cell at a map position, EMPTY outside the map (rows may have different lengths)"""
+    if 0 <= row < len(level_map) and 0 <= column < len(level_map[row]):
+        return level_map[row][column]
+    return EMPTY
+
+
+def find_cells(level_map, cell, tile_size):
+    """Top left pixel position of every cell of one type, row by row"""
+    return [(column * tile_size, row_index * tile_size)
+            for row_index, row in enumerate(level_map)
+            for column, value in enumerate(row) if value == cell]
+
+
+def _runs(row, cell):
+    """(start, end) column ranges of consecutive cells of one type in a row, end exclusive"""
+    runs = []
+    start = None
+    for column, value in enumerate(row):
+        if value == cell:
+            if start is None:
+                start = column
+        elif start is not None:
+            runs.append((start, column))
+            start = None
+    if start is not None:
+        runs.append((start, len(row)))
+    return runs
+
+
+def merge_cells(level_map, cell, tile_size):
+    """
+    Cover every cell of one type with as few rects as a greedy merge finds: cells are
+    joined into horizontal runs, and a run grows downwards while the rows below have
+    exactly the same run.
+
+    Args:
+        level_map (list): Rows of the map
+        cell (str): Cell type, e.g. SOLID
+        tile_size (int): Size of a cell in pixels
+
+    Returns:
+        list: (x, y, width, height) rects in pixels, sorted by position
+    """
+    rects = []
+    open_runs = {}  # (start, end) -> [x, y, width, height] still growing downwards
+    for row_index, row in enumerate(level_map):
+        runs = _runs(row, cell)
+        next_open = {}
+        for run in runs:
+            rect = open_runs.pop(run, None)
+            if rect is None:
+                rect = [run[0] * tile_size, row_index * tile_size, (run[1] - run[0]) * tile_size, 0]
+            rect[3] += tile_size
+            next_open[run] = rect
+        rects.extend(open_runs.values())  # Runs that did not continue on this row
+        open_runs = next_open
+    rects.extend(open_runs.values())
+    return sorted((tuple(rect) for rect in rects), key=lambda rect: (rect[1], rect[0]))
+
+
+def platform_segments(level_map, tile_size):
+    """
+    Walkable surfaces: runs of solid cells with no solid cell directly above.
+
+    Returns:
+        list: (left, right, top) in pixels, sorted by top then left
+    """
+    segments = []
+    for row_index, row in enumerate(level_map):
+        start = None
+        for column in range(len(row) + 1):
+            walkable = (column < len(row) and row[column] == SOLID
+                        and cell_at(level_map, column, row_index - 1) != SOLID)
+            if walkable and start is None:
+                start = column
+            elif not walkable and start is not None:
+                segments.append((start * tile_size, column * tile_size, row_index * tile_size))
+                start = None
+    return segments
+
+
+def segment_under(segments, x, y, tolerance=0):
+    """
+    The platform segment directly under a point, e.g. the feet of an entity.
+
+    Args:
+        segments (list): Result of platform_segments
+        x (float): Horizontal position
+        y (float): Vertical position (the segment top must be at y or below it)
+        tolerance (int, optional): How far above y a segment top may be. Defaults to 0.
+
+    Returns:
+        tuple: The closest (left, right, top) segment below the point, or None
+    """
+    best = None
+    for segment in segments:
+        left, right, top = segment
+        if left <= x < right and top >= y - tolerance and (best is None or top < best[2]):
+            best = segment
+    return best
+
+
+def validate_level(level_map):
+    """
+    Check a map for problems.
+
+    Returns:
+        tuple: (errors, warnings) lists of descriptions. Errors make the level unplayable;
+            warnings are tolerated by parse_map but probably not intended.
+    """
+    if not level_map:
+        return ["map is empty"], []
+    errors = []
+    warnings = []
+    width = max(len(row) for row in level_map)
+    short_rows = [row_index for row_index, row in enumerate(level_map) if len(row) != width]
+    if short_rows:
+        warnings.append(f"rows {short_rows} are narrower than {width} cells")
+    for row_index, row in enumerate(level_map):
+        unknown = sorted(set(row) - KNOWN_CELLS)
+        if unknown:
+            errors.append(f"row {row_index} has unknown cells {''.join(unknown)!r}")
+
+    player_spawns = find_cells(level_map, PLAYER_SPAWN, 1)
+    if not player_spawns:
+        errors.append("no player spawn 'S'")
+    elif len(player_spawns) > 1:
+        warnings.append(f"{len(player_spawns)} player spawns 'S', only the last one is used")
+
+    # Enemies are placed standing on the cell below their marker
+    for column, row_index in find_cells(level_map, ENEMY_SPAWN, 1):
+        if cell_at(level_map, column, row_index + 1) != SOLID:
+            warnings.append(f"enemy spawn at column {column}, row {row_index} is not on a platform")
+    return errors, warnings
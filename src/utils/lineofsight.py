@@ -0,0 +1,143 @@
+"""
+Line of sight over the level's solid-cell grid.
+A ray is walked cell by cell with a grid DDA (Amanatides & Woo) between the
+centres of the source and target cells, so its cost grows with the distance in
+cells, not with the number of tiles in the level.
+
+Answers are cached for the current tick by (source cell, target cell): enemies
+standing in the same cell, or several checks against the same target, cast one
+ray. Call begin_tick once per simulation tick before querying.
+"""
+
+from .levelgeometry import SOLID
+
+
+class LineOfSight:
+    """
+    Ray queries against the solid cells of a map.
+    """
+    def __init__(self, level_map, tile_size):
+        """
+        Build the solid grid
+
+        Args:
+            level_map (list): Rows of the map
+            tile_size (int): Size of a cell in pixels
+        """
+        self.tile_size = tile_size
+        self.cache = {}
+        self.queries = 0
+        self.rays = 0
+        self.set_level(level_map)
+
+    def set_level(self, level_map):
+        """Rebuild the grid for a new or edited map"""
+        self.width = max((len(row) for row in level_map), default=0)
+        self.height = len(level_map)
+        # One byte per cell, row by row; 1 = blocks sight
+        self.solid = bytearray(self.width * self.height)
+        for row_index, row in enumerate(level_map):
+            offset = row_index * self.width
+            for column, cell in enumerate(row):
+                if cell == SOLID:
+                    self.solid[offset + column] = 1
+        self.cache.clear()
+
+    def begin_tick(self):
+        """Forget the answers of the previous tick (entities have moved since)"""
+        self.cache.clear()
+
+    def cell_of(self, point):
+        return int(point[0]) // self.tile_size, int(point[1]) // self.tile_size
+
+    def _is_solid(self, column, row):
+        # Outside the map nothing blocks sight
+        return 0 <= column < self.width and 0 <= row < self.height and self.solid[row * self.width + column]
+
+    def cast(self, source_cell, target_cell):
+        """
+        Walk the cells between two cell centres.
+
+        Returns:
+            bool: True if no solid cell lies strictly between the two cells
+        """
+        self.rays += 1
+        column, row = source_cell
+        target_column, target_row = target_cell
+        dx = target_column - column
+        dy = target_row - row
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # Ray parameter at the next vertical / horizontal cell border and its increment
+        # per cell, scaled by 2 * |dx| * |dy| so they are integers: corners compare exactly
+        delta_x = 2 * abs(dy) if dx else float('inf')
+        delta_y = 2 * abs(dx) if dy else float('inf')
+        next_x = abs(dy) if dx else float('inf')
+        next_y = abs(dx) if dy else float('inf')
+
+        for _ in range(abs(dx) + abs(dy) - 1):
+            if next_x < next_y:
+                column += step_x
+                next_x += delta_x
+            elif next_y < next_x:
+                row += step_y
+                next_y += delta_y
+            else:
+                # Exactly through a corner: blocked if either side is solid
+                if self._is_solid(column + step_x, row) or self._is_solid(column, row + step_y):
+                    return False
+                column += step_x
+                row += step_y
+                next_x += delta_x
+                next_y += delta_y
+            if (column, row) == (target_column, target_row):
+                break
+            if self._is_solid(column, row):
+                return False
+        return True
+
+    def can_see(self, source, target):
+        """
+        Whether a straight line from source to target (pixel positions) is free of solid cells,
+        cached for this tick.
+        """
+        self.queries += 1
+        key = (self.cell_of(source), self.cell_of(target))
+        visible = self.cache.get(key)
+        if visible is None:
+            visible = self.cache[key] = self.cast(*key)
+        return visible
+
+    def visible_from(self, sources, target, max_distance=None):
+        """
+        Batch query: which of many sources can see one target.
+
+        Args:
+            sources (iterable): Pixel positions, e.g. the centres of every enemy
+            target (tuple): Pixel position, e.g. the player's centre
+            max_distance (float, optional): Sources further away than this get False
+                without a ray. Defaults to None (no limit).
+
+        Returns:
+            list: One bool per source
+        """
+        size = self.tile_size
+        target_cell = self.cell_of(target)
+        target_x, target_y = target
+        limit = max_distance * max_distance if max_distance is not None else None
+        cache = self.cache
+        results = []
+        for x, y in sources:
+            if limit is not None and (x - target_x) ** 2 + (y - target_y) ** 2 > limit:
+                results.append(False)
+                continue
+            key = (int(x) // size, int(y) // size), target_cell
+            visible = cache.get(key)
+            if visible is None:
+                visible = cache[key] = self.cast(*key)
+            results.append(visible)
+        self.queries += len(results)
+        return results
+
+    def report(self):
+        return f"Line of sight: {self.queries} queries, {self.rays} rays cast"
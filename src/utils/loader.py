@@ -0,0 +1,187 @@
+"""
+Asynchronous asset loading.
+File reads and image / audio decoding run on a worker thread pool and hand back
+futures. Only the final step that needs the display (converting a decoded image
+to the screen format) runs on the main thread, a few assets per frame, so a
+loading screen can keep drawing and pumping events while the level loads.
+
+Finished assets are registered with the regular loaders (utils.load_image,
+audioplayer.get_sound, the asset bake cache), so game code keeps calling those
+and simply finds the asset already loaded.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from .utils import get_file_path, FILETYPE, preload_image
+from .displayformat import normalize_surface
+from .audioplayer import preload_sound
+from .decodepool import DecodePool, should_use_processes, open_shared_image, release_shared_image
+from . import assetbake
+
+
+class AssetLoader:
+    """
+    Thread pool backed asset loader with progress tracking.
+    """
+    def __init__(self, max_workers=4):
+        """
+        Initialize the loader
+
+        Args:
+            max_workers (int, optional): Number of worker threads. Defaults to 4.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asset-loader')
+        self.pending = []  # (future, finish callback, label)
+        self.total = 0
+        self.completed = 0
+        self.errors = []
+        self.current_label = ""
+        self.decode_pool = None  # Started on the first batch large enough for process decoding
+
+    def submit(self, work, *args, finish=None, label=""):
+        """
+        Run work(*args) on a worker thread.
+
+        Args:
+            work (callable): Runs on the worker; must not touch the display
+            finish (callable, optional): Called on the main thread with the result. Defaults to None.
+            label (str, optional): Shown on the loading screen. Defaults to "".
+
+        Returns:
+            concurrent.futures.Future: The result of work
+        """
+        return self._track(self.executor.submit(work, *args), finish, label)
+
+    def _track(self, future, finish, label):
+        self.pending.append((future, finish, label))
+        self.total += 1
+        return future
+
+    def load_image(self, filename, use_alpha=True):
+        """Decode an image (path relative to the assets folder) for utils.load_image"""
+        def decode(path):
+            return pygame.image.load(path)
+
+        def finish(surface):
+            preload_image(filename, normalize_surface(surface, use_alpha), use_alpha)
+
+        return self.submit(decode, get_file_path(filename, FILETYPE.IMAGE), finish=finish, label=filename)
+
+    def load_images(self, filenames, use_alpha=True):
+        """
+        Decode a batch of images, in worker processes when the batch is large enough
+        (decodepool.MIN_PROCESS_BATCH) and on the thread pool otherwise.
+
+        Returns:
+            list: One future per image
+        """
+        if not should_use_processes(len(filenames)):
+            return [self.load_image(filename, use_alpha) for filename in filenames]
+
+        if self.decode_pool is None:
+            self.decode_pool = DecodePool()
+        futures = []
+        for filename in filenames:
+            def finish(result, filename=filename):
+                # Wrap the shared pixels, convert (the only copy), then free the block
+                surface, block = open_shared_image(result)
+                converted = normalize_surface(surface, use_alpha)
+                del surface
+                release_shared_image(block)
+                preload_image(filename, converted, use_alpha)
+
+            future = self.decode_pool.submit(get_file_path(filename, FILETYPE.IMAGE))
+            futures.append(self._track(future, finish, filename))
+        return futures
+
+    def load_sound(self, filename):
+        """Decode a sound (path relative to the audio folder) for audioplayer.get_sound"""
+        path = get_file_path(filename, FILETYPE.AUDIO)
+        return self.submit(pygame.mixer.Sound, path, finish=lambda sound: preload_sound(path, sound),
+                           label=filename)
+
+    def load_baked(self, spec):
+        """Read (or bake) a sprite sheet bake so the atlas finds it in memory"""
+        return self.submit(assetbake.get_bake, spec, label=spec['image'])
+
+    def process(self, budget_ms=8):
+        """
+        Run the main thread step of finished loads, for at most budget_ms.
+
+        Returns:
+            bool: True once everything submitted so far has finished
+        """
+        deadline = time.perf_counter() + budget_ms / 1000
+        still_pending = []
+        for future, finish, label in self.pending:
+            if not future.done() or time.perf_counter() > deadline:
+                still_pending.append((future, finish, label))
+                continue
+            try:
+                result = future.result()
+                if finish is not None:
+                    finish(result)
+            except (pygame.error, OSError, ValueError) as e:
+                print(f"Could not load {label}: {e}")
+                self.errors.append((label, e))
+            self.completed += 1
+            self.current_label = label
+        self.pending = still_pending
+        return not self.pending
+
+    def progress(self):
+        """Fraction of submitted assets that finished loading"""
+        return self.completed / self.total if self.total else 1.0
+
+    def done(self):
+        return not self.pending
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+        if self.decode_pool is not None:
+            self.decode_pool.shutdown()
+
+
+def run_loading_screen(screen, clock, loader, title="Loading", present=pygame.display.flip):
+    """
+    Show a progress bar until the loader is done, keeping the window responsive.
+
+    Args:
+        screen (pygame.Surface): Display surface
+        clock (pygame.time.Clock): Frame clock
+        loader (AssetLoader): Loader with the assets already submitted
+        title (str, optional): Text above the bar. Defaults to "Loading".
+        present (callable, optional): Shows the frame. Defaults to pygame.display.flip.
+
+    Returns:
+        bool: False if the window was closed while loading
+    """
+    font = pygame.font.Font(None, 32)
+    small_font = pygame.font.Font(None, 20)
+    width, height = screen.get_size()
+    bar = pygame.Rect(0, 0, width // 2, 16)
+    bar.center = (width // 2, height // 2)
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                loader.shutdown()
+                return False
+        finished = loader.process()
+
+        screen.fill((0, 0, 0))
+        text = font.render(f"{title}... {loader.progress():.0%}", True, (255, 255, 255))
+        screen.blit(text, text.get_rect(midbottom=(bar.centerx, bar.top - 10)))
+        pygame.draw.rect(screen, (100, 100, 100), bar, 2)
+        pygame.draw.rect(screen, (200, 200, 200), (bar.x + 3, bar.y + 3, (bar.width - 6) * loader.progress(), bar.height - 6))
+        if loader.current_label:
+            label = small_font.render(loader.current_label, True, (150, 150, 150))
+            screen.blit(label, label.get_rect(midtop=(bar.centerx, bar.bottom + 10)))
+        present()
+
+        if finished:
+            return True
+        clock.tick(60)
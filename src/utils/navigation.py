@@ -0,0 +1,341 @@
+"""
+Platform navigation for chasing enemies.
+The walkable platform segments of a level (see utils.levelgeometry) are the
+nodes of a graph built once per level. Edges are the moves an entity with given
+physics constants can make between them:
+    walk   the next segment starts where this one ends, at the same height
+    drop   walk off an end and fall onto the highest segment below
+    jump   jump from an end (or from beside a higher, overhanging segment)
+           and land on another segment; every candidate jump arc is simulated
+           frame by frame against the solid cells, so walls and ceilings in
+           the way rule the edge out
+
+PathService answers "what is my next move towards that segment" with A* and
+caches the paths by (from segment, to segment), so any number of enemies chasing
+the same player share one search. Changing the level clears the cache.
+"""
+
+import heapq
+import math
+from collections import namedtuple
+
+from .levelgeometry import SOLID, platform_segments
+
+WALK = 'walk'
+DROP = 'drop'
+JUMP = 'jump'
+
+# Extra cost of leaving the ground, so paths prefer walking and dropping
+JUMP_PENALTY = 64
+
+# One move between segments. takeoff_x is where the entity's leading side
+# (its right side when direction is 1, left side when -1) leaves its segment
+NavEdge = namedtuple('NavEdge', 'target kind cost takeoff_x direction')
+
+# Cache value of a search that found no path (None means "not cached")
+_UNREACHABLE = 'unreachable'
+
+# Longest jump simulated, in frames
+MAX_JUMP_FRAMES = 240
+
+# Distances before the end of a segment tried as takeoff points, in pixels. Jumping
+# straight from the end runs into a step up; a short run-up clears it
+JUMP_RUN_UPS = (0, 8, 16, 32, 64)
+
+
+class NavGraph:
+    """
+    Platform segments and the moves between them for one set of physics constants.
+    """
+    def __init__(self, level_map, tile_size, gravity, jump_speed, move_speed, entity_width, entity_height):
+        """
+        Build the graph
+
+        Args:
+            level_map (list): Rows of the map
+            tile_size (int): Size of a map cell in pixels
+            gravity (float): Vertical acceleration per frame
+            jump_speed (float): Initial upward speed of a jump, per frame
+            move_speed (float): Horizontal speed while moving between segments, per frame
+            entity_width (int): Width of the moving entity
+            entity_height (int): Height of the moving entity
+        """
+        self.level_map = level_map
+        self.segments = platform_segments(level_map, tile_size)
+        self.tile_size = tile_size
+        self.gravity = gravity
+        self.jump_speed = jump_speed
+        self.move_speed = move_speed
+        self.entity_width = entity_width
+        self.entity_height = entity_height
+        self.max_jump_height = jump_speed * jump_speed / (2 * gravity)
+        self.level_bottom = len(level_map) * tile_size
+        # (column, row) of every solid cell, tested by every frame of every simulated jump
+        self.solid = frozenset((column, row) for row, cells in enumerate(level_map)
+                               for column, cell in enumerate(cells) if cell == SOLID)
+
+        # Segments overlapping each map column, to find the segment under a point quickly
+        self.columns = {}
+        for index, (left, right, top) in enumerate(self.segments):
+            for column in range(left // tile_size, (right - 1) // tile_size + 1):
+                self.columns.setdefault(column, []).append(index)
+
+        # Jump arcs by takeoff, shared by every target tried from the same takeoff while building
+        self.arcs = {}
+        self.edges = [self._build_edges(index) for index in range(len(self.segments))]
+        self.arcs = {}
+
+    def segment_at(self, x, y, tolerance=0, width=1):
+        """
+        Index of the closest segment at or below a point or a horizontal span
+        (e.g. the feet of an entity, from x to x + width).
+
+        Returns:
+            int: Segment index, or -1 if there is no segment under the point
+        """
+        best = -1
+        best_top = None
+        x = int(x)
+        for column in range(x // self.tile_size, (x + width - 1) // self.tile_size + 1):
+            for index in self.columns.get(column, ()):
+                left, right, top = self.segments[index]
+                if left < x + width and x < right and top >= y - tolerance and (best_top is None or top < best_top):
+                    best = index
+                    best_top = top
+        return best
+
+    def _air_time(self, rise):
+        """Frames from takeoff until the jump arc comes back down to `rise` above the takeoff height"""
+        discriminant = self.jump_speed * self.jump_speed - 2 * self.gravity * rise
+        if discriminant < 0:
+            return None
+        return (self.jump_speed + math.sqrt(discriminant)) / self.gravity
+
+    def _hits_solid(self, x, y):
+        """Whether the entity's box with its top left corner at (x, y) overlaps a solid cell"""
+        size = self.tile_size
+        solid = self.solid
+        columns = range(int(x) // size, (int(x) + self.entity_width - 1) // size + 1)
+        for row in range(int(y) // size, (int(y) + self.entity_height - 1) // size + 1):
+            for column in columns:
+                if (column, row) in solid:
+                    return True
+        return False
+
+    def _arc(self, top, takeoff_x, direction):
+        """
+        Follow the jump arc from the takeoff point the way Enemy.update moves: gravity,
+        then the horizontal step, then the vertical step (rounded to whole pixels like a Rect).
+
+        Returns:
+            list: (x, y, new_y, falling) per frame until the entity hits a solid cell
+        """
+        key = (top, takeoff_x, direction)
+        frames = self.arcs.get(key)
+        if frames is not None:
+            return frames
+        frames = self.arcs[key] = []
+        x = takeoff_x - self.entity_width if direction > 0 else takeoff_x
+        y = top - self.entity_height
+        vy = -self.jump_speed
+        for _ in range(MAX_JUMP_FRAMES):
+            vy += self.gravity
+            x += self.move_speed * direction
+            if self._hits_solid(x, y):
+                break
+            new_y = int(y + vy + 0.5)
+            frames.append((x, y, new_y, vy > 0))
+            y = new_y
+            if self._hits_solid(x, y):
+                break
+        return frames
+
+    def _simulate_jump(self, top, target, takeoff_x, direction):
+        """
+        Whether the jump arc from the takeoff point lands on the target segment without
+        hitting anything first
+        """
+        target_left, target_right, target_top = self.segments[target]
+        height = self.entity_height
+        for x, y, new_y, falling in self._arc(top, takeoff_x, direction):
+            if falling and y + height <= target_top < new_y + height:
+                # Crossing the target's top this frame: standing on any part of it counts,
+                # like the tile collisions (PathService.locate picks the highest segment under the feet)
+                return target_left < x + self.entity_width and x < target_right
+        return False
+
+    def _cost(self, index, target, penalty=0):
+        left, right, top = self.segments[index]
+        target_left, target_right, target_top = self.segments[target]
+        return abs((left + right) - (target_left + target_right)) / 2 + abs(top - target_top) + penalty
+
+    def _build_edges(self, index):
+        left, right, top = self.segments[index]
+        edges = []
+        reached = set()
+
+        # Walk onto a segment continuing at the same height, otherwise drop off the end
+        for direction, edge_x in ((-1, left), (1, right)):
+            probe_x = edge_x if direction > 0 else edge_x - 1  # First pixel past the end
+            target = self.segment_at(probe_x, top, 0)
+            if target == -1 or target == index:
+                continue
+            kind = WALK if self.segments[target][2] == top else DROP
+            edges.append(NavEdge(target, kind, self._cost(index, target), edge_x, direction))
+            reached.add(target)
+
+        # Jumps within reach of the arc: only the segments in the columns the longest
+        # arc (down to the bottom of the level) can cover are candidates
+        longest = self._air_time(top - self.level_bottom)
+        max_reach = self.move_speed * min(longest, MAX_JUMP_FRAMES) + self.entity_width
+        candidates = set()
+        for column in range(int(left - max_reach) // self.tile_size, int(right + max_reach) // self.tile_size + 1):
+            candidates.update(self.columns.get(column, ()))
+        for target in sorted(candidates):
+            if target == index or target in reached:
+                continue
+            target_left, target_right, target_top = self.segments[target]
+            rise = top - target_top  # Positive when the target is higher
+            if rise > self.max_jump_height:
+                continue
+            air_time = self._air_time(rise)
+            if air_time is None:
+                continue
+            reach = self.move_speed * air_time
+
+            if target_left >= right:
+                gap, takeoff_x, direction = target_left - right, right, 1
+            elif target_right <= left:
+                gap, takeoff_x, direction = left - target_right, left, -1
+            elif rise > 0 and left < target_left:
+                # Target overhangs this segment: jump from beside it and move on top
+                gap, takeoff_x, direction = self.entity_width, target_left, 1
+            elif rise > 0 and right > target_right:
+                gap, takeoff_x, direction = self.entity_width, target_right, -1
+            else:
+                continue  # Directly above with no way around, or below (a drop)
+            if gap > reach:
+                continue
+            for run_up in JUMP_RUN_UPS:
+                start_x = takeoff_x - run_up * direction
+                # The jump must also work when taken off a step early or a couple of steps late
+                if left <= start_x <= right and all(
+                        self._simulate_jump(top, target, start_x + step * self.move_speed * direction, direction)
+                        for step in (-1, 0, 1, 2)):
+                    edges.append(NavEdge(target, JUMP, self._cost(index, target, JUMP_PENALTY), start_x, direction))
+                    break
+        return edges
+
+    def find_path(self, start, goal):
+        """
+        A* search between two segments.
+
+        Returns:
+            list: NavEdges to follow in order (empty if start == goal), or None if there is no path
+        """
+        if start == goal:
+            return []
+        goal_left, goal_right, _ = self.segments[goal]
+        goal_center = (goal_left + goal_right) / 2
+
+        def heuristic(index):
+            left, right, _ = self.segments[index]
+            return abs((left + right) / 2 - goal_center)
+
+        came_from = {start: None}
+        best_cost = {start: 0}
+        frontier = [(heuristic(start), 0, start)]
+        counter = 0
+        while frontier:
+            _, _, node = heapq.heappop(frontier)
+            if node == goal:
+                path = []
+                while came_from[node] is not None:
+                    previous, edge = came_from[node]
+                    path.append(edge)
+                    node = previous
+                path.reverse()
+                return path
+            for edge in self.edges[node]:
+                cost = best_cost[node] + edge.cost
+                if cost < best_cost.get(edge.target, math.inf):
+                    best_cost[edge.target] = cost
+                    came_from[edge.target] = (node, edge)
+                    counter += 1
+                    heapq.heappush(frontier, (cost + heuristic(edge.target), counter, edge.target))
+        return None
+
+
+class PathService:
+    """
+    Cached path queries over a NavGraph, shared by every enemy of a level.
+    """
+    def __init__(self, level_map, tile_size, gravity, jump_speed, move_speed, entity_width, entity_height):
+        """
+        Build the graph for a level (see NavGraph for the physics arguments)
+
+        Args:
+            level_map (list): Rows of the map
+            tile_size (int): Size of a map cell in pixels
+        """
+        self.physics = (gravity, jump_speed, move_speed, entity_width, entity_height)
+        self.tile_size = tile_size
+        self.paths = {}
+        self.version = 0  # Incremented whenever the graph is rebuilt
+        self.hits = 0
+        self.misses = 0
+        self.set_level(level_map)
+
+    def set_level(self, level_map):
+        """Rebuild the graph for a new or edited map and drop every cached path"""
+        self.graph = NavGraph(level_map, self.tile_size, *self.physics)
+        self.invalidate()
+
+    def invalidate(self):
+        """Drop every cached path"""
+        self.paths.clear()
+        self.version += 1
+
+    def locate(self, rect, tolerance=4):
+        """Segment an entity stands on, or will land on if it is in the air (-1 if none)"""
+        return self.graph.segment_at(rect.left, rect.bottom, tolerance, rect.width)
+
+    def path(self, start, goal):
+        """
+        Path between two segments, searched once per (start, goal) until the next invalidate.
+
+        Returns:
+            list: NavEdges, or None if there is no path
+        """
+        key = (start, goal)
+        path = self.paths.get(key)
+        if path is not None:
+            self.hits += 1
+            return None if path is _UNREACHABLE else path
+        self.misses += 1
+        path = self.graph.find_path(start, goal)
+        self.paths[key] = _UNREACHABLE if path is None else path
+        return path
+
+    def next_edge(self, rect, target_rect):
+        """
+        First move from the segment under rect towards the segment under target_rect.
+
+        Returns:
+            tuple: (NavEdge or None, reachable). The edge is None when both are on the
+                same segment; reachable is False when either is off the graph or no path exists.
+        """
+        start = self.locate(rect)
+        goal = self.locate(target_rect)
+        if start == -1 or goal == -1:
+            return None, False
+        path = self.path(start, goal)
+        if path is None:
+            return None, False
+        return (path[0] if path else None), True
+
+    def report(self):
+        graph = self.graph
+        edge_count = sum(len(edges) for edges in graph.edges)
+        return (f"Navigation: {len(graph.segments)} segments, {edge_count} edges, "
+                f"{len(self.paths)} cached paths, {self.hits} hits / {self.misses} searches")
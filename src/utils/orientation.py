@@ -0,0 +1,54 @@
+"""
+Orientation variant cache.
+Sprites that face left or right keep one set of frames per direction, built once
+at load time, so drawing a left facing sprite is a dictionary lookup instead of a
+pygame.transform.flip (and a new surface) every frame. The mirrored frames are
+packed into the texture atlas next to the originals and shared by every entity
+using the same frames.
+"""
+
+import pygame
+
+from .atlas import get_atlas
+
+# Right facing frame -> its horizontally mirrored frame
+_mirrors = {}
+
+
+def mirror_frames(name, frames):
+    """
+    Build (or reuse) the mirrored frames of an atlas group and register them.
+
+    Args:
+        name (str): Atlas group of the frames; the mirrored group is name + '/flip_x'
+            (baked strips already have it, see TextureAtlas.load_strip)
+        frames (list): The right facing frames
+
+    Returns:
+        list: The left facing frames, in the same order
+    """
+    mirrored = get_atlas().get_or_add_group(
+        name + '/flip_x', lambda: [pygame.transform.flip(frame, True, False) for frame in frames])
+    for frame, mirror in zip(frames, mirrored):
+        _mirrors[frame] = mirror
+    return mirrored
+
+
+def facing(frame, facing_right):
+    """
+    Get a frame in the requested orientation.
+
+    Args:
+        frame (pygame.Surface): A right facing frame
+        facing_right (bool): Orientation to draw
+
+    Returns:
+        pygame.Surface: The frame itself, or its mirrored variant
+    """
+    if facing_right:
+        return frame
+    mirror = _mirrors.get(frame)
+    if mirror is None:
+        # Frame was never registered: mirror it once and keep it
+        mirror = _mirrors[frame] = pygame.transform.flip(frame, True, False)
+    return mirror
@@ -0,0 +1,183 @@
+"""
+Entity registry with pooled objects and generational handles.
+Live entities are kept in a dense list that can be iterated without copying.
+Despawning is deferred until flush() and removes entities by swapping them with
+the last live entity, so removal is O(1). Despawned objects go back to a pool and
+are reused by the next spawn() through their reset() method.
+"""
+
+# Handles pack a slot index in the low bits and the slot generation above it
+SLOT_BITS = 20
+SLOT_MASK = (1 << SLOT_BITS) - 1
+
+
+class EntityRegistry:
+    """
+    Pooled storage for one kind of entity (enemies, hit effects, ...).
+
+    Every live entity gets a `handle` attribute. A handle stays valid until the
+    entity is despawned; after that the slot generation changes and old handles
+    no longer resolve, even when the slot and the object are reused.
+    """
+    def __init__(self, factory):
+        """
+        Initialize the registry
+
+        Args:
+            factory (callable): Builds a new entity when the pool is empty.
+                Pooled entities are recycled with entity.reset(*args, **kwargs)
+                using the same arguments.
+        """
+        self.factory = factory
+
+        # Dense storage - iterate this directly
+        self.entities = []
+        self._dense_slots = []  # dense index -> slot
+
+        # Sparse slot storage
+        self._slot_index = []  # slot -> dense index, -1 when free
+        self._slot_generation = []
+        self._free_slots = []
+
+        # Despawned objects waiting for reuse, keyed by id() for O(1) removal
+        self._pool = {}
+        self._pending = []
+        self._pending_slots = set()
+
+        # Counters for profiling
+        self.spawned = 0
+        self.reused = 0
+        self.despawned = 0
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def spawn(self, *args, **kwargs):
+        """
+        Spawn an entity, reusing a pooled object when one is available.
+
+        Returns:
+            object: The live entity; its handle is in entity.handle
+        """
+        if self._pool:
+            _, entity = self._pool.popitem()
+            entity.reset(*args, **kwargs)
+            self.reused += 1
+        else:
+            entity = self.factory(*args, **kwargs)
+        self.spawned += 1
+        self.add(entity)
+        return entity
+
+    def add(self, entity):
+        """
+        Register an already constructed entity.
+
+        Returns:
+            int: The entity's new handle
+        """
+        self._pool.pop(id(entity), None)
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = len(self._slot_index)
+            self._slot_index.append(-1)
+            self._slot_generation.append(0)
+
+        self._slot_index[slot] = len(self.entities)
+        self.entities.append(entity)
+        self._dense_slots.append(slot)
+
+        entity.handle = (self._slot_generation[slot] << SLOT_BITS) | slot
+        return entity.handle
+
+    def _resolve(self, handle):
+        """Return the slot of a valid handle, or -1."""
+        if handle is None:
+            return -1
+        slot = handle & SLOT_MASK
+        if slot >= len(self._slot_index) or self._slot_index[slot] < 0:
+            return -1
+        if self._slot_generation[slot] != handle >> SLOT_BITS:
+            return -1
+        return slot
+
+    def get(self, handle):
+        """
+        Look up a live entity by handle.
+
+        Returns:
+            object: The entity, or None if the handle is stale
+        """
+        slot = self._resolve(handle)
+        if slot < 0:
+            return None
+        return self.entities[self._slot_index[slot]]
+
+    def is_alive(self, handle):
+        """Check if a handle refers to a live entity that is not about to be despawned."""
+        slot = self._resolve(handle)
+        return slot >= 0 and slot not in self._pending_slots
+
+    def despawn(self, handle):
+        """
+        Schedule an entity for removal at the next flush().
+        Safe to call while iterating; stale or repeated handles are ignored.
+        """
+        slot = self._resolve(handle)
+        if slot < 0 or slot in self._pending_slots:
+            return
+        self._pending_slots.add(slot)
+        self._pending.append(slot)
+
+    def flush(self):
+        """Apply pending despawns with swap-remove and return the objects to the pool."""
+        if not self._pending:
+            return
+        for slot in self._pending:
+            self._remove_slot(slot)
+        self._pending.clear()
+        self._pending_slots.clear()
+
+    def _remove_slot(self, slot):
+        index = self._slot_index[slot]
+        entity = self.entities[index]
+
+        # Move the last live entity into the hole
+        last = len(self.entities) - 1
+        if index != last:
+            moved_slot = self._dense_slots[last]
+            self.entities[index] = self.entities[last]
+            self._dense_slots[index] = moved_slot
+            self._slot_index[moved_slot] = index
+        self.entities.pop()
+        self._dense_slots.pop()
+
+        # Invalidate outstanding handles and recycle the slot
+        self._slot_index[slot] = -1
+        self._slot_generation[slot] += 1
+        self._free_slots.append(slot)
+
+        entity.handle = None
+        self._pool[id(entity)] = entity
+        self.despawned += 1
+
+    def clear(self):
+        """Despawn every entity immediately."""
+        self._pending.clear()
+        self._pending_slots.clear()
+        while self.entities:
+            self._remove_slot(self._dense_slots[-1])
+
+    def replace(self, entities):
+        """
+        Make exactly the given entities live, e.g. when restoring a snapshot.
+        Entities that are currently live or pooled are reused as they are.
+        """
+        self.clear()
+        for entity in entities:
+            self.add(entity)
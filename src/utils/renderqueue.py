@@ -0,0 +1,178 @@
+"""
+Batched blit submission.
+Draw code blits into RenderLayer objects instead of the screen. A layer looks like
+a surface to the code drawing into it (it has a blit method) but only records the
+command. At the end of the frame each layer is sorted by source surface and
+submitted to the real target with a single Surface.blits (or fblits) call.
+"""
+
+import pygame
+
+from .displayformat import COLORKEY
+
+
+def source_key(command):
+    """Sort key grouping commands by the surface their pixels come from (atlas page for subsurfaces)"""
+    return id(command[0].get_abs_parent())
+
+
+class RenderLayer:
+    """
+    Command list for one draw layer.
+    """
+    def __init__(self, name, sort_by_source=True):
+        """
+        Initialize a layer
+
+        Args:
+            name (str): Layer name
+            sort_by_source (bool, optional): Group commands by source surface before submitting.
+                Only disable this for layers whose sprites overlap and need painter's order.
+                Defaults to True.
+        """
+        self.name = name
+        self.sort_by_source = sort_by_source
+        self.commands = []
+        self.simple = True  # True while no command uses an area rect or blend flags
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        """Record a blit (same arguments as pygame.Surface.blit)"""
+        if area is None and not special_flags:
+            self.commands.append((source, dest))
+        else:
+            self.commands.append((source, dest, area, special_flags))
+            self.simple = False
+
+    def blits(self, blit_sequence, doreturn=False):
+        """Record several blits (same arguments as pygame.Surface.blits; nothing is returned)"""
+        for command in blit_sequence:
+            self.blit(*command)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def submit(self, target, audit=None):
+        """
+        Blit every recorded command to the target in one call and clear the layer.
+
+        Args:
+            target (pygame.Surface): Surface to draw on
+            audit (BlitAudit, optional): Audit to count the blits in. Defaults to None.
+
+        Returns:
+            int: Number of commands submitted
+        """
+        commands = self.commands
+        count = len(commands)
+        if count:
+            if self.sort_by_source and count > 1:
+                commands.sort(key=source_key)
+            if audit is not None and audit.enabled:
+                for command in commands:
+                    audit.record(command[0], target, command[3] if len(command) > 3 else 0)
+
+            # fblits (pygame-ce) is the fastest path but only takes (source, dest) pairs
+            fblits = getattr(target, 'fblits', None)
+            if fblits is not None and self.simple:
+                fblits(commands)
+            else:
+                target.blits(commands, doreturn=False)
+        self.commands = []
+        self.simple = True
+        return count
+
+
+class RenderQueue:
+    """
+    Ordered set of render layers submitted once per frame.
+    """
+    def __init__(self, layers):
+        """
+        Initialize the queue
+
+        Args:
+            layers (list): Layer names in draw order, or (name, sort_by_source) tuples
+        """
+        self.layers = {}
+        self.order = []
+        for layer in layers:
+            name, sort_by_source = (layer, True) if isinstance(layer, str) else layer
+            self.layers[name] = RenderLayer(name, sort_by_source)
+            self.order.append(name)
+
+        # Statistics for the current and the last completed frame
+        self.command_count = 0
+        self.submit_calls = 0
+        self.layer_counts = {}
+        self.last_frame = {'commands': 0, 'submits': 0, 'layers': {}}
+        self.audit = None  # Optional utils.displayformat.BlitAudit
+
+    def layer(self, name):
+        """Get a layer to draw into"""
+        return self.layers[name]
+
+    def flush(self, target, *names):
+        """
+        Submit layers to the target in draw order.
+
+        Args:
+            target (pygame.Surface): Surface to draw on
+            *names (str): Layers to submit; all layers if none are given
+
+        Returns:
+            int: Number of commands submitted
+        """
+        submitted = 0
+        for name in names or self.order:
+            count = self.layers[name].submit(target, self.audit)
+            if count:
+                submitted += count
+                self.submit_calls += 1
+                self.layer_counts[name] = self.layer_counts.get(name, 0) + count
+        self.command_count += submitted
+        return submitted
+
+    def end_frame(self):
+        """Close the frame statistics (call once per frame after the last flush)"""
+        self.last_frame = {'commands': self.command_count, 'submits': self.submit_calls,
+                           'layers': self.layer_counts}
+        self.command_count = 0
+        self.submit_calls = 0
+        self.layer_counts = {}
+
+    def report(self):
+        """Describe the last frame's submission, e.g. 'tiles=300 enemies=3 (2 submits, 303 commands)'"""
+        frame = self.last_frame
+        layers = " ".join(f"{name}={count}" for name, count in frame['layers'].items())
+        return f"{layers} ({frame['submits']} submits, {frame['commands']} commands)"
+
+
+# Pre-rendered particle dots, shared by every particle system
+_circle_sprites = {}
+
+
+def circle_sprite(color, radius):
+    """
+    Get a cached surface with a filled circle, to blit instead of calling pygame.draw.circle.
+
+    Args:
+        color (tuple): RGB or RGBA color
+        radius (int): Circle radius in pixels
+
+    Returns:
+        pygame.Surface: A (2 * radius) x (2 * radius) surface; colorkeyed if the color
+            is opaque, with per-pixel alpha otherwise
+    """
+    key = (tuple(color), radius)
+    sprite = _circle_sprites.get(key)
+    if sprite is None:
+        if len(color) == 3 or color[3] == 255:
+            sprite = pygame.Surface((radius * 2, radius * 2)).convert()
+            sprite.fill(COLORKEY)
+            sprite.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        else:
+            sprite = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA).convert_alpha()
+            sprite.fill((0, 0, 0, 0))
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        _circle_sprites[key] = sprite
+    return sprite
@@ -0,0 +1,143 @@
+"""
+World snapshots for instant respawns and checkpoints.
+A snapshot packs the mutable state of the players, enemies, hit effects and
+game timers into one preallocated array of doubles. Restoring writes that state
+back into the same entity objects, so no entity is rebuilt and no asset is loaded.
+"""
+
+from array import array
+
+
+class WorldSnapshot:
+    """
+    Compact, reusable capture of the world state.
+
+    Layout of the buffer:
+        [enemy count, effect count, timers..., player state * player count,
+         enemy state * enemy count, effect state * effect count]
+    Each entity class describes its own state through SNAPSHOT_SIZE,
+    snapshot_state() and restore_state(values).
+    """
+    HEADER_SIZE = 2
+
+    def __init__(self, player_class, enemy_class, effect_class, timer_names=(),
+                 max_enemies=256, max_effects=64, player_count=1):
+        """
+        Preallocate the snapshot buffer.
+
+        Args:
+            player_class (type): Player class, used for its SNAPSHOT_SIZE
+            enemy_class (type): Enemy class, used for its SNAPSHOT_SIZE
+            effect_class (type): Hit effect class, used for its SNAPSHOT_SIZE
+            timer_names (tuple, optional): Names of the integer timers to store. Defaults to ().
+            max_enemies (int, optional): Enemy slots to preallocate. Defaults to 256.
+            max_effects (int, optional): Effect slots to preallocate. Defaults to 64.
+            player_count (int, optional): Number of players (split-screen co-op). Defaults to 1.
+        """
+        self.player_count = player_count
+        self.player_size = player_class.SNAPSHOT_SIZE
+        self.enemy_size = enemy_class.SNAPSHOT_SIZE
+        self.effect_size = effect_class.SNAPSHOT_SIZE
+        self.timer_names = tuple(timer_names)
+
+        self.max_enemies = max_enemies
+        self.max_effects = max_effects
+        self.buffer = array('d', bytes(8 * self._required_size(max_enemies, max_effects)))
+
+        # The entity objects that were alive at capture time.
+        # Restoring brings exactly these objects back.
+        self.enemies = []
+        self.effects = []
+        self.is_empty = True
+
+    def _required_size(self, enemy_count, effect_count):
+        return (self.HEADER_SIZE + len(self.timer_names) + self.player_count * self.player_size
+                + enemy_count * self.enemy_size + effect_count * self.effect_size)
+
+    def _ensure_capacity(self, enemy_count, effect_count):
+        """Grow the buffer if the world outgrew the preallocated slots."""
+        if enemy_count <= self.max_enemies and effect_count <= self.max_effects:
+            return
+        self.max_enemies = max(self.max_enemies, enemy_count)
+        self.max_effects = max(self.max_effects, effect_count)
+        extra = self._required_size(self.max_enemies, self.max_effects) - len(self.buffer)
+        self.buffer.extend(array('d', bytes(8 * extra)))
+        print(f"Snapshot buffer grown to {self.max_enemies} enemies / {self.max_effects} effects")
+
+    def _write(self, offset, values):
+        buffer = self.buffer
+        for value in values:
+            buffer[offset] = value
+            offset += 1
+        return offset
+
+    def capture(self, players, enemies, effects, timers=None):
+        """
+        Capture the current world state.
+
+        Args:
+            players (list): The players (player_count of them)
+            enemies (iterable): Live enemies
+            effects (iterable): Active hit effects
+            timers (dict, optional): Timer values keyed by the names given at construction
+        """
+        self.enemies[:] = enemies
+        self.effects[:] = effects
+        self._ensure_capacity(len(self.enemies), len(self.effects))
+
+        buffer = self.buffer
+        buffer[0] = len(self.enemies)
+        buffer[1] = len(self.effects)
+        offset = self.HEADER_SIZE
+        for name in self.timer_names:
+            buffer[offset] = timers.get(name, 0) if timers else 0
+            offset += 1
+
+        for player in players:
+            offset = self._write(offset, player.snapshot_state())
+        for enemy in self.enemies:
+            offset = self._write(offset, enemy.snapshot_state())
+        for effect in self.effects:
+            offset = self._write(offset, effect.snapshot_state())
+        self.is_empty = False
+
+    def restore(self, players, enemies, effects):
+        """
+        Restore the captured state in place.
+
+        The enemy and effect registries are refilled with the captured objects,
+        whose state is then overwritten from the buffer.
+
+        Args:
+            players (list): The players to restore
+            enemies (EntityRegistry): Live enemies, modified in place
+            effects (EntityRegistry): Active effects, modified in place
+
+        Returns:
+            dict: Timer values keyed by name
+        """
+        if self.is_empty:
+            raise RuntimeError("Cannot restore a snapshot that was never captured")
+
+        buffer = self.buffer
+        offset = self.HEADER_SIZE
+        timers = {}
+        for name in self.timer_names:
+            timers[name] = int(buffer[offset])
+            offset += 1
+
+        for player in players:
+            player.restore_state(buffer[offset:offset + self.player_size])
+            offset += self.player_size
+
+        enemies.replace(self.enemies)
+        for enemy in enemies:
+            enemy.restore_state(buffer[offset:offset + self.enemy_size])
+            offset += self.enemy_size
+
+        effects.replace(self.effects)
+        for effect in effects:
+            effect.restore_state(buffer[offset:offset + self.effect_size])
+            offset += self.effect_size
+
+        return timers
@@ -0,0 +1,77 @@
+"""
+Uniform grid spatial index.
+Items are bucketed by the grid cells their rect overlaps, so a query only looks
+at the items near the queried area. Built once per tick and queried by every
+viewport (see utils.viewport), instead of every viewport testing every entity.
+"""
+
+
+class SpatialGrid:
+    """
+    Buckets of items by grid cell.
+    """
+    def __init__(self, cell_size=256):
+        """
+        Initialize an empty grid
+
+        Args:
+            cell_size (int, optional): Size of a grid cell in pixels; around the size of a
+                viewport keeps both the buckets and the cells per query small. Defaults to 256.
+        """
+        self.cell_size = cell_size
+        self.cells = {}
+        self.items = {}  # item -> (rect, cells it is in)
+
+    def _cells(self, rect):
+        size = self.cell_size
+        return [(column, row)
+                for row in range(rect.top // size, (rect.bottom - 1) // size + 1)
+                for column in range(rect.left // size, (rect.right - 1) // size + 1)]
+
+    def insert(self, item, rect):
+        """Add an item, or move it if it is already in the grid (rect is copied)"""
+        entry = self.items.get(item)
+        cells = self._cells(rect)
+        if entry is not None:
+            if entry[1] == cells:
+                entry[0].update(rect)
+                return
+            self.remove(item)
+        self.items[item] = (rect.copy(), cells)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(item)
+
+    def remove(self, item):
+        entry = self.items.pop(item, None)
+        if entry is None:
+            return
+        for cell in entry[1]:
+            bucket = self.cells[cell]
+            bucket.remove(item)
+            if not bucket:
+                del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.items.clear()
+
+    def query(self, rect):
+        """
+        Items whose rect overlaps a rect
+
+        Returns:
+            list: Each overlapping item once
+        """
+        found = []
+        seen = set()
+        items = self.items
+        for cell in self._cells(rect):
+            for item in self.cells.get(cell, ()):
+                if item not in seen:
+                    seen.add(item)
+                    if items[item][0].colliderect(rect):
+                        found.append(item)
+        return found
+
+    def __len__(self):
+        return len(self.items)
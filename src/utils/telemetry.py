@@ -0,0 +1,342 @@
+"""
+Per-frame telemetry.
+Every frame appends one fixed-size binary record to a memory-mapped ring file:
+the tick, the frame time, the time of each phase of the game loop, entity,
+particle and blit counts, garbage collections and gameplay events. Writing a
+record is one struct.pack_into into the mapping (the OS writes the pages out
+in the background), so telemetry can stay on all the time. Once the ring is
+full the oldest records are overwritten.
+
+File layout (little endian):
+    header      HEADER, then PHASE_NAME_SIZE bytes per phase name
+    records     capacity * RECORD, slot = record number % capacity
+
+Analyze a file from the src folder:
+    python -m utils.telemetry [FILE] [--spike-factor F] [--top N]
+"""
+
+import argparse
+import gc
+import mmap
+import os
+import struct
+import sys
+import time
+
+TELEMETRY_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              '../telemetry/frames.mktl')
+
+MAGIC = b'MKTL'
+VERSION = 1
+
+# Phases of the game loop in main.py, in order
+PHASES = ('events', 'players', 'enemies', 'effects', 'draw', 'hud', 'present')
+PHASE_NAME_SIZE = 16
+PHASE_EVENTS, PHASE_PLAYERS, PHASE_ENEMIES, PHASE_EFFECTS, PHASE_DRAW, PHASE_HUD, PHASE_PRESENT = range(len(PHASES))
+
+# Gameplay events, as bits of a record's event mask
+EVENT_PLAYER_HIT = 1
+EVENT_PLAYER_DIED = 2
+EVENT_RESPAWN = 4
+EVENT_ENEMY_REMOVED = 8
+EVENT_CAPTURING = 16  # Frame capture (utils.capture) was on
+EVENT_NAMES = {
+    EVENT_PLAYER_HIT: 'player hit',
+    EVENT_PLAYER_DIED: 'player died',
+    EVENT_RESPAWN: 'respawn',
+    EVENT_ENEMY_REMOVED: 'enemy removed',
+    EVENT_CAPTURING: 'capturing',
+}
+
+# magic, version, record size, phase count, capacity, records written so far
+HEADER = struct.Struct('<4sHHII Q')
+# tick, frame time (ms), phase times (ms), enemies, effects, particles, blits,
+# collections of each GC generation, GC pause (ms), event mask
+RECORD = struct.Struct(f'<If{len(PHASES)}fHHHIBBBxfI')
+
+# Ten minutes at 60 FPS
+DEFAULT_CAPACITY = 36000
+
+
+def _header_size(phase_count):
+    return HEADER.size + phase_count * PHASE_NAME_SIZE
+
+
+class TelemetryWriter:
+    """
+    Collects the measurements of the current frame and writes them as one record.
+    """
+    def __init__(self, path=TELEMETRY_FILE, capacity=DEFAULT_CAPACITY):
+        """
+        Create (or overwrite) the ring file and map it
+
+        Args:
+            path (str, optional): Ring file, or None to measure nothing and write nothing.
+                Defaults to the telemetry folder.
+            capacity (int, optional): Records kept. Defaults to DEFAULT_CAPACITY.
+        """
+        self.path = path
+        self.written = 0
+        self.overhead = 0.0
+        self.map = None
+
+        # Current frame
+        self.phases = [0.0] * len(PHASES)
+        self.events = 0
+        self.frame_start = None
+        self.mark_time = None
+        self.collections = [0, 0, 0]
+        self.gc_pause = 0.0
+        self.gc_start = None
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.capacity = capacity
+        self.header_size = _header_size(len(PHASES))
+        size = self.header_size + capacity * RECORD.size
+        self.file = open(path, 'w+b')
+        # Written out rather than truncated, so the first pass over the ring does not fault in new pages
+        self.file.write(bytes(size))
+        self.file.flush()
+        self.map = mmap.mmap(self.file.fileno(), size)
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, RECORD.size, len(PHASES), capacity, 0)
+        for index, name in enumerate(PHASES):
+            self.map[HEADER.size + index * PHASE_NAME_SIZE:HEADER.size + (index + 1) * PHASE_NAME_SIZE] = \
+                name.encode().ljust(PHASE_NAME_SIZE, b'\0')
+        gc.callbacks.append(self._gc_callback)
+
+    def _gc_callback(self, phase, info):
+        if phase == 'start':
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            self.collections[info['generation']] += 1
+            self.gc_pause += time.perf_counter() - self.gc_start
+            self.gc_start = None
+
+    def begin_frame(self):
+        """Start timing a frame's phases"""
+        if self.map is None:
+            return
+        now = time.perf_counter()
+        self.mark_time = now
+        if self.frame_start is None:
+            self.frame_start = now
+
+    def end_phase(self, phase):
+        """
+        Add the time since the last mark to a phase
+
+        Args:
+            phase (int): Index in PHASES (PHASE_*)
+        """
+        if self.map is None:
+            return
+        now = time.perf_counter()
+        self.phases[phase] += now - self.mark_time
+        self.mark_time = now
+
+    def event(self, event):
+        """Flag a gameplay event (EVENT_*) in the current frame"""
+        if self.map is None:
+            return
+        self.events |= event
+
+    def end_frame(self, tick, enemies=0, effects=0, particles=0, blits=0):
+        """
+        Write the frame's record. The frame time runs from the previous end_frame
+        (or the first begin_frame), so it includes waiting for the frame rate.
+
+        Args:
+            tick (int): Frame number
+            enemies (int, optional): Live enemies. Defaults to 0.
+            effects (int, optional): Active hit effects. Defaults to 0.
+            particles (int, optional): Live particles. Defaults to 0.
+            blits (int, optional): Blits submitted this frame. Defaults to 0.
+        """
+        if self.map is None:
+            return
+        now = time.perf_counter()
+        frame_ms = (now - self.frame_start) * 1000 if self.frame_start is not None else 0.0
+        self.frame_start = now
+        offset = self.header_size + (self.written % self.capacity) * RECORD.size
+        RECORD.pack_into(self.map, offset, tick & 0xFFFFFFFF, frame_ms,
+                         *[seconds * 1000 for seconds in self.phases],
+                         min(enemies, 0xFFFF), min(effects, 0xFFFF), min(particles, 0xFFFF), blits,
+                         *[min(count, 0xFF) for count in self.collections], self.gc_pause * 1000, self.events)
+        self.written += 1
+        struct.pack_into('<Q', self.map, HEADER.size - 8, self.written)
+
+        for index in range(len(self.phases)):
+            self.phases[index] = 0.0
+        self.events = 0
+        self.collections = [0, 0, 0]
+        self.gc_pause = 0.0
+        self.overhead += time.perf_counter() - now
+
+    @property
+    def enabled(self):
+        return self.map is not None
+
+    def close(self):
+        if self.map is None:
+            return
+        if self._gc_callback in gc.callbacks:
+            gc.callbacks.remove(self._gc_callback)
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+        self.map = None
+
+    def report(self):
+        average = self.overhead / self.written * 1000 if self.written else 0.0
+        return (f"Telemetry: {self.written} frames recorded to {os.path.normpath(self.path)} "
+                f"({average * 1000:.1f} us per frame to write)")
+
+
+def read_records(path=TELEMETRY_FILE):
+    """
+    Read a ring file, oldest record first
+
+    Returns:
+        tuple: (phase names, list of record dicts with 'tick', 'frame_ms', 'phases' (list),
+            'enemies', 'effects', 'particles', 'blits', 'gc' (collections per generation),
+            'gc_ms' and 'events')
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, record_size, phase_count, capacity, written = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} telemetry file")
+    names = [data[HEADER.size + index * PHASE_NAME_SIZE:HEADER.size + (index + 1) * PHASE_NAME_SIZE]
+             .rstrip(b'\0').decode() for index in range(phase_count)]
+    record = struct.Struct(f'<If{phase_count}fHHHIBBBxfI')
+    if record.size != record_size:
+        raise ValueError(f"{path} has {record_size} byte records, expected {record.size}")
+
+    header_size = _header_size(phase_count)
+    records = []
+    for number in range(max(0, written - capacity), written):
+        values = record.unpack_from(data, header_size + (number % capacity) * record_size)
+        phases = list(values[2:2 + phase_count])
+        enemies, effects, particles, blits, gc0, gc1, gc2, gc_ms, events = values[2 + phase_count:]
+        records.append({'tick': values[0], 'frame_ms': values[1], 'phases': phases,
+                        'enemies': enemies, 'effects': effects, 'particles': particles, 'blits': blits,
+                        'gc': (gc0, gc1, gc2), 'gc_ms': gc_ms, 'events': events})
+    return names, records
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _distribution(values):
+    ordered = sorted(values)
+    return {'p50': percentile(ordered, 0.5), 'p90': percentile(ordered, 0.9),
+            'p99': percentile(ordered, 0.99), 'max': ordered[-1] if ordered else 0.0}
+
+
+def analyze(names, records, spike_factor=2.0, window=1):
+    """
+    Percentiles, spikes and what the spikes coincide with.
+
+    A spike is a frame at least spike_factor times the median frame time. Each spike
+    is blamed on the phase furthest above its own median, and checked for garbage
+    collections and gameplay events within window frames before it. Time outside
+    every phase (mostly waiting for the frame rate) counts as the phase 'wait'.
+
+    Returns:
+        dict: 'frames', 'frame_ms' and 'phases' (percentiles), 'spikes' (per spike frame),
+            'correlations' (condition -> share of spikes vs share of all frames)
+    """
+    if not records:
+        return {'frames': 0, 'frame_ms': _distribution([]), 'phases': {}, 'spikes': [], 'correlations': {}}
+    names = list(names) + ['wait']
+    timings = [record['phases'] + [max(0.0, record['frame_ms'] - sum(record['phases']))] for record in records]
+    frame_stats = _distribution([record['frame_ms'] for record in records])
+    phase_stats = {name: _distribution([timing[index] for timing in timings]) for index, name in enumerate(names)}
+    threshold = frame_stats['p50'] * spike_factor
+
+    def conditions(position):
+        """Names of what happened in a frame or the window before it"""
+        found = set()
+        for record in records[max(0, position - window):position + 1]:
+            if any(record['gc']):
+                found.add(f"gc gen {max(generation for generation, count in enumerate(record['gc']) if count)}")
+            for bit, name in EVENT_NAMES.items():
+                if record['events'] & bit:
+                    found.add(name)
+        return found
+
+    spikes = []
+    for position, record in enumerate(records):
+        if record['frame_ms'] < threshold:
+            continue
+        excess = [(timings[position][index] - phase_stats[name]['p50'], name) for index, name in enumerate(names)]
+        extra, phase = max(excess)
+        spikes.append({'tick': record['tick'], 'frame_ms': record['frame_ms'], 'phase': phase,
+                       'phase_excess_ms': extra, 'gc_ms': record['gc_ms'],
+                       'with': sorted(conditions(position))})
+
+    # How much more often each condition comes with a spike than with any frame
+    correlations = {}
+    if spikes:
+        all_counts = {}
+        for position in range(len(records)):
+            for condition in conditions(position):
+                all_counts[condition] = all_counts.get(condition, 0) + 1
+        for condition, count in all_counts.items():
+            in_spikes = sum(1 for spike in spikes if condition in spike['with'])
+            correlations[condition] = (in_spikes / len(spikes), count / len(records))
+    return {'frames': len(records), 'frame_ms': frame_stats, 'phases': phase_stats,
+            'spike_threshold_ms': threshold, 'spikes': spikes, 'correlations': correlations}
+
+
+def format_analysis(result, top=10):
+    """Readable summary of an analyze result"""
+    def row(name, stats):
+        return (f"  {name:<10} p50 {stats['p50']:7.2f}  p90 {stats['p90']:7.2f}  "
+                f"p99 {stats['p99']:7.2f}  max {stats['max']:7.2f} ms")
+
+    lines = [f"{result['frames']} frames", row('frame', result['frame_ms'])]
+    lines.extend(row(name, stats) for name, stats in result['phases'].items())
+    spikes = result['spikes']
+    if not result['frames']:
+        return "\n".join(lines)
+    lines.append(f"{len(spikes)} spikes over {result['spike_threshold_ms']:.2f} ms "
+                 f"({len(spikes) / result['frames']:.1%} of frames)")
+    if spikes:
+        blamed = {}
+        for spike in spikes:
+            blamed[spike['phase']] = blamed.get(spike['phase'], 0) + 1
+        lines.append("  slowest phase in spikes: " + ", ".join(
+            f"{phase} {count}" for phase, count in sorted(blamed.items(), key=lambda item: -item[1])))
+        for condition, (in_spikes, overall) in sorted(result['correlations'].items(), key=lambda item: -item[1][0]):
+            lift = in_spikes / overall if overall else 0.0
+            lines.append(f"  {condition:<14} in {in_spikes:5.1%} of spikes vs {overall:5.1%} of frames ({lift:.1f}x)")
+        lines.append(f"  worst {min(top, len(spikes))}:")
+        for spike in sorted(spikes, key=lambda spike: -spike['frame_ms'])[:top]:
+            detail = f", with {', '.join(spike['with'])}" if spike['with'] else ""
+            lines.append(f"    tick {spike['tick']}: {spike['frame_ms']:.2f} ms, {spike['phase']} "
+                         f"+{spike['phase_excess_ms']:.2f} ms, gc {spike['gc_ms']:.2f} ms{detail}")
+    return "\n".join(lines)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Analyze a telemetry ring file")
+    parser.add_argument('file', nargs='?', default=TELEMETRY_FILE)
+    parser.add_argument('--spike-factor', type=float, default=2.0, help="spike = this many times the median frame")
+    parser.add_argument('--window', type=int, default=1, help="frames before a spike checked for events")
+    parser.add_argument('--top', type=int, default=10, help="worst spikes listed")
+    options = parser.parse_args(args)
+
+    names, records = read_records(options.file)
+    print(format_analysis(analyze(names, records, options.spike_factor, options.window), options.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+"""
+Runtime tile chunks.
+The level's tiles are drawn once into chunk surfaces of chunk_size pixels, the
+first time a chunk is seen, and drawing a view is then one blit per visible
+chunk instead of one per tile. The chunks are shared by every viewport (see
+utils.viewport), so a second view of the same area costs a few blits more, not
+another pass over the tiles. Offline, utils.levelcompiler bakes the same chunks to disk.
+
+Chunks keep the cheapest display format their tiles allow (see utils.displayformat):
+the empty space around opaque or colorkeyed tiles is an RLE colorkey, and only
+chunks with tiles that need per-pixel alpha are baked with it.
+"""
+
+import pygame
+
+from .displayformat import COLORKEY, PER_PIXEL_ALPHA, alpha_kind
+
+
+class TileChunkCache:
+    """
+    Lazily baked chunk surfaces of the static tiles.
+    """
+    def __init__(self, tiles, chunk_size=512):
+        """
+        Sort the tiles into chunks (nothing is drawn yet)
+
+        Args:
+            tiles (list): Tiles with a rect, an image (or None) and a fallback color
+            chunk_size (int, optional): Chunk width and height in pixels. Defaults to 512.
+        """
+        self.chunk_size = chunk_size
+        self.surfaces = {}
+        self.kinds = {}  # Tile image -> alpha kind
+        self.set_tiles(tiles)
+
+    def set_tiles(self, tiles):
+        """Use new or edited tiles; every chunk is baked again when next drawn"""
+        size = self.chunk_size
+        self.tiles = {}
+        for tile in tiles:
+            rect = tile.rect
+            for row in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                for column in range(rect.left // size, (rect.right - 1) // size + 1):
+                    self.tiles.setdefault((column, row), []).append(tile)
+        self.surfaces.clear()
+        self.kinds.clear()
+
+    def _needs_alpha(self, tiles):
+        """Whether any tile image has partially transparent pixels"""
+        for tile in tiles:
+            if tile.image:
+                kind = self.kinds.get(tile.image)
+                if kind is None:
+                    kind = self.kinds[tile.image] = alpha_kind(tile.image)
+                if kind == PER_PIXEL_ALPHA:
+                    return True
+        return False
+
+    def _bake(self, key):
+        size = self.chunk_size
+        left, top = key[0] * size, key[1] * size
+        tiles = self.tiles[key]
+        alpha = self._needs_alpha(tiles)
+        if alpha:
+            surface = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+            surface.fill((0, 0, 0, 0))
+        else:
+            surface = pygame.Surface((size, size)).convert()
+            surface.fill(COLORKEY)
+        for tile in tiles:
+            position = (tile.rect.x - left, tile.rect.y - top)
+            if tile.image:
+                surface.blit(tile.image, position)
+            else:
+                pygame.draw.rect(surface, tile.color, pygame.Rect(position, tile.rect.size))
+        if not alpha:
+            surface.set_colorkey(COLORKEY, pygame.RLEACCEL)
+        return surface
+
+    def draw(self, surface, view):
+        """
+        Draw the chunks overlapping a view
+
+        Args:
+            surface (pygame.Surface): Target (or a render layer) the size of the view
+            view (pygame.Rect): Area of the level shown, in level pixels
+        """
+        size = self.chunk_size
+        blits = []
+        for row in range(view.top // size, (view.bottom - 1) // size + 1):
+            for column in range(view.left // size, (view.right - 1) // size + 1):
+                key = (column, row)
+                if key not in self.tiles:
+                    continue
+                chunk = self.surfaces.get(key)
+                if chunk is None:
+                    chunk = self.surfaces[key] = self._bake(key)
+                blits.append((chunk, (column * size - view.x, row * size - view.y)))
+        surface.blits(blits, doreturn=False)
+
+    def report(self):
+        return f"Tile chunks: {len(self.surfaces)}/{len(self.tiles)} baked ({self.chunk_size} px)"
@@ -2,6 +2,8 @@ import pygame
 import os
 from enum import Enum
 
+from .displayformat import normalize_surface
+
 class FILETYPE(Enum):
     IMAGE = 0
     AUDIO = 1
@@ -15,11 +17,22 @@ def get_file_path(filename, type: FILETYPE):
         return os.path.join(base_dir, '../assets/audio', filename)
 
 # ======================= IMPROVED IMAGE LOADING =======================
+# Images decoded ahead of time by the asset loader, by (filename, use_alpha)
+_preloaded_images = {}
+
+def preload_image(filename, surface, use_alpha=True):
+    """Register an already converted image so load_image returns it without touching the disk"""
+    _preloaded_images[(filename, use_alpha)] = surface
+
 def load_image(filename, use_alpha=True):
     """
     Helper function to load images with proper error handling.
     Returns the loaded image or None if loading failed.
     """
+    preloaded = _preloaded_images.get((filename, use_alpha))
+    if preloaded is not None:
+        return preloaded
+
     try:
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         filepath = os.path.join(base_dir, '../assets', filename)
@@ -36,10 +49,8 @@ def load_image(filename, use_alpha=True):
                 print(f"Note: Assets directory structure does not exist: {assets_dir}")
             return None
 
-        if use_alpha:
-            return pygame.image.load(filepath).convert_alpha()
-        else:
-            return pygame.image.load(filepath).convert()
+        # Display format, with per-pixel alpha only if the image actually needs it
+        return normalize_surface(pygame.image.load(filepath), use_alpha)
     except (pygame.error, FileNotFoundError) as e:
         print(f"Could not load image {filename}: {e}")
         return None
@@ -0,0 +1,83 @@
+"""
+Split-screen viewports.
+Each viewport is an area of the back buffer (a subsurface, so drawing into it
+clips and offsets for free) with its own camera following one player. The
+caches behind the drawing are shared by every viewport: tile chunks
+(utils.tilechunks), the texture atlas, the light map's shadow sprites
+(fx.lighting) and the spatial index the entities are culled against
+(utils.spatialgrid), which is built once per tick.
+"""
+
+import pygame
+
+from camera import Camera
+
+# Pixels between viewports
+DIVIDER = 2
+
+
+def split_rects(size, count):
+    """
+    Screen areas for count viewports: full screen, top and bottom halves
+    (platforming needs width more than height), or a 2 x 2 grid.
+
+    Returns:
+        list: pygame.Rect per viewport, in player order
+    """
+    width, height = size
+    if count == 1:
+        return [pygame.Rect(0, 0, width, height)]
+    if count == 2:
+        half = (height - DIVIDER) // 2
+        return [pygame.Rect(0, 0, width, half), pygame.Rect(0, height - half, width, half)]
+    if count <= 4:
+        half_width = (width - DIVIDER) // 2
+        half_height = (height - DIVIDER) // 2
+        return [pygame.Rect(x, y, half_width, half_height)
+                for y in (0, height - half_height) for x in (0, width - half_width)][:count]
+    raise ValueError(f"At most 4 viewports are supported, not {count}")
+
+
+class Viewport:
+    """
+    One player's view: a screen area and the camera drawn through it.
+    """
+    def __init__(self, screen, rect, level_size):
+        """
+        Initialize a viewport
+
+        Args:
+            screen (pygame.Surface): Back buffer
+            rect (pygame.Rect): Area of the back buffer
+            level_size (tuple): Level width and height, to clamp the camera
+        """
+        self.rect = rect
+        self.surface = screen.subsurface(rect)
+        self.camera = Camera(rect.width, rect.height, *level_size)
+
+    @property
+    def size(self):
+        return self.rect.size
+
+    @property
+    def view(self):
+        """Area of the level this viewport shows, in level pixels"""
+        return pygame.Rect(self.camera.x, self.camera.y, self.rect.width, self.rect.height)
+
+    def follow(self, target):
+        self.camera.update(target)
+
+
+def split_screen(screen, count, level_size):
+    """
+    Viewports for count players over the whole back buffer
+
+    Args:
+        screen (pygame.Surface): Back buffer
+        count (int): Number of players (1 to 4)
+        level_size (tuple): Level width and height
+
+    Returns:
+        list: Viewports in player order
+    """
+    return [Viewport(screen, rect, level_size) for rect in split_rects(screen.get_size(), count)]